@@ -0,0 +1,358 @@
+"""
+Stand-in for node_server/index.js, stdlib only: same routes and response
+shapes, with a configurable sendText latency and failure rate and no
+WhatsApp behind it.
+
+    python benchmarks/fake_bridge.py --port 3000 --latency 0.2 --fail-rate 0.05
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+SEND_PATH = re.compile(r"^(?:/sessions/([^/]+))?/(send-message|send-batch|jobs|check-numbers)$")
+MEDIA_PATH = re.compile(r"^/media/([0-9a-f]{64})$")
+
+class FakeBridge:
+    """
+    latency: mean seconds per sendText, jitter: +/- fraction of it,
+    fail_rate: probability that a sendText fails (HTTP 500 on
+    /send-message, ok:false on /send-batch, like the real bridge),
+    honor_delays: apply the delayMin/delayMax spacing of /send-batch
+    and /jobs (off by default, benchmarks measure throughput),
+    max_queued_jobs: /jobs backpressure limit per session,
+    unregistered: share of numbers /check-numbers reports as not on
+    WhatsApp (decided by the number, so repeated checks agree),
+    check_latency: seconds per number checked,
+    media_capacity: bytes of attachments kept (least recently used
+    evicted first); forget_media() empties the cache, like a restart.
+    """
+    def __init__(self, port=0, latency=0.0, jitter=0.0, fail_rate=0.0, sessions=("default",),
+                 honor_delays=False, seed=None, max_queued_jobs=500, unregistered=0.0, check_latency=0.0,
+                 media_capacity=256 * 1024 * 1024):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.sessions = list(sessions)
+        self.honor_delays = honor_delays
+        self.random = random.Random(seed)
+        self.sent = 0
+        self.failed = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        # One send at a time per session, like the bridge's promise chain.
+        self._session_locks = {name: threading.Lock() for name in self.sessions}
+        self.max_queued_jobs = max_queued_jobs
+        self.unregistered = unregistered
+        self.check_latency = check_latency
+        self.checked = 0
+        self.jobs = {}
+        self._job_ids = itertools.count(1)
+        self._job_queues = {name: queue.Queue() for name in self.sessions}
+        self._job_done = threading.Condition(self._lock)
+        self.inbound = []  # replies added with receive()
+        self.media = OrderedDict()  # sha256 -> size, in LRU order
+        self.media_capacity = media_capacity
+        self.uploads = 0
+        self.boot_id = format(int(time.time() * 1000), 'x')
+
+        bridge = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, as with Express
+            disable_nagle_algorithm = True  # headers and body go out in two writes
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                if path == "/sessions":
+                    self._reply(200, {'status': 'success',
+                                      'sessions': [{'name': n, 'ready': True} for n in bridge.sessions]})
+                elif path == "/jobs":
+                    self._reply(*bridge.job_status(parse_qs(query)))
+                elif path == "/inbound":
+                    self._reply(*bridge.inbound_since(parse_qs(query)))
+                elif MEDIA_PATH.match(path):
+                    sha256 = MEDIA_PATH.match(path).group(1)
+                    with bridge._lock:
+                        cached = sha256 in bridge.media
+                    self._reply(200, {'status': 'success', 'sha256': sha256, 'cached': cached})
+                else:
+                    self._reply(404, {'status': 'error', 'message': 'Not found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._reply(400, {'status': 'error', 'message': 'Invalid JSON'})
+                    return
+                match = SEND_PATH.match(self.path)
+                if not match:
+                    self._reply(404, {'status': 'error', 'message': 'Not found'})
+                    return
+                session = match.group(1) or bridge.sessions[0]
+                if session not in bridge._session_locks:
+                    self._reply(404, {'status': 'error', 'message': f'Unknown session "{session}"'})
+                    return
+                with bridge._lock:
+                    bridge.requests += 1
+                if match.group(2) == "send-message":
+                    self._reply(*bridge.send_message(session, body))
+                elif match.group(2) == "jobs":
+                    self._reply(*bridge.submit_jobs(session, body))
+                elif match.group(2) == "check-numbers":
+                    self._reply(*bridge.check_numbers(body))
+                else:
+                    self._reply(*bridge.send_batch(session, body))
+
+            def do_DELETE(self):
+                path, _, query = self.path.partition("?")
+                if path == "/jobs":
+                    self._reply(*bridge.cancel_jobs(parse_qs(query)))
+                else:
+                    self._reply(404, {'status': 'error', 'message': 'Not found'})
+
+            def do_PUT(self):
+                match = MEDIA_PATH.match(self.path.partition("?")[0])
+                data = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if not match:
+                    self._reply(404, {'status': 'error', 'message': 'Not found'})
+                else:
+                    self._reply(*bridge.upload_media(match.group(1), data))
+
+            def _reply(self, status, payload, headers=None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        for name in self.sessions:
+            threading.Thread(target=self._run_jobs, args=(name,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _send_text(self):
+        # Returns True if the simulated sendText succeeded.
+        if self.latency:
+            spread = self.latency * self.jitter
+            time.sleep(max(0.0, self.latency + self.random.uniform(-spread, spread)))
+        ok = self.random.random() >= self.fail_rate
+        with self._lock:
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+        return ok
+
+    def upload_media(self, sha256, data):
+        if hashlib.sha256(data).hexdigest() != sha256:
+            return 400, {'status': 'error', 'message': 'Content does not match its sha256'}
+        with self._lock:
+            self.uploads += 1
+            self.media[sha256] = len(data)
+            self.media.move_to_end(sha256)
+            while sum(self.media.values()) > self.media_capacity and len(self.media) > 1:
+                self.media.popitem(last=False)
+        return 200, {'status': 'success', 'sha256': sha256, 'cached': True}
+
+    def forget_media(self):
+        with self._lock:
+            self.media.clear()
+
+    def _missing_media(self, items):
+        with self._lock:
+            missing = sorted({item['media'] for item in items if item.get('media')} - set(self.media))
+            for item in items:
+                if item.get('media') in self.media:
+                    self.media.move_to_end(item['media'])
+        if missing:
+            return 409, {'status': 'error', 'message': 'Media not cached, upload it again', 'missing': missing}
+        return None
+
+    def send_message(self, session, body):
+        if not body.get('number') or not (body.get('message') or body.get('media')):
+            return 400, {'status': 'error', 'message': 'Missing "number" or "message" in request body'}
+        missing = self._missing_media([body])
+        if missing:
+            return missing
+        with self._session_locks[session]:
+            ok = self._send_text()
+        if ok:
+            return 200, {'status': 'success', 'response': {'id': f"fake_{body['number']}"}}
+        return 500, {'status': 'error', 'message': 'Error sending message', 'error': 'Simulated failure'}
+
+    def send_batch(self, session, body):
+        items = body.get('items')
+        if not isinstance(items, list) or not items:
+            return 400, {'status': 'error', 'message': 'Missing "items" array in request body'}
+        missing = self._missing_media(items)
+        if missing:
+            return missing
+        results = []
+        with self._session_locks[session]:
+            for index, item in enumerate(items):
+                if not item.get('number') or not (item.get('message') or item.get('media')):
+                    results.append({'id': item.get('id'), 'ok': False, 'error': 'Missing "number" or "message"'})
+                    continue
+                if self.honor_delays and index:
+                    low = float(body.get('delayMin') or 0)
+                    time.sleep(self.random.uniform(low, max(low, float(body.get('delayMax') or 0))))
+                if self._send_text():
+                    results.append({'id': item.get('id'), 'ok': True, 'msgId': f"fake_{item['number']}"})
+                else:
+                    results.append({'id': item.get('id'), 'ok': False, 'error': 'Simulated failure'})
+        return 200, {'status': 'success', 'results': results}
+
+    def check_numbers(self, body):
+        numbers = body.get('numbers')
+        if not isinstance(numbers, list) or not numbers or len(numbers) > 200:
+            return 400, {'status': 'error', 'message': '"numbers" must be an array of 1 to 200 numbers'}
+        if self.check_latency:
+            time.sleep(self.check_latency * len(numbers))
+        with self._lock:
+            self.checked += len(numbers)
+        # Multiplicative hash, so sequential test numbers don't fall into one bucket.
+        results = [{'number': str(n), 'exists': int(n) * 2654435761 % 2**32 / 2**32 >= self.unregistered}
+                   for n in numbers]
+        return 200, {'status': 'success', 'results': results}
+
+    def submit_jobs(self, session, body):
+        items = body.get('items')
+        if not isinstance(items, list) or not items:
+            return 400, {'status': 'error', 'message': 'Missing "items" array in request body'}
+        if any(not item.get('number') or not (item.get('message') or item.get('media')) for item in items):
+            return 400, {'status': 'error', 'message': 'Every item needs "number" and "message"'}
+        missing = self._missing_media(items)
+        if missing:
+            return missing
+        jobs = self._job_queues[session]
+        if jobs.qsize() + len(items) > self.max_queued_jobs:
+            return 429, {'status': 'error', 'message': 'Send queue is full', 'queued': jobs.qsize(),
+                         'capacity': self.max_queued_jobs}, {'Retry-After': '1'}
+
+        accepted = []
+        with self._lock:
+            for item in items:
+                job = {'jobId': f"{session}-{next(self._job_ids)}", 'id': item.get('id'), 'state': 'queued',
+                       'error': None, 'msgId': None}
+                self.jobs[job['jobId']] = job
+                jobs.put((job, item['number'], body.get('delayMin'), body.get('delayMax')))
+                accepted.append({'id': job['id'], 'jobId': job['jobId']})
+        return 202, {'status': 'accepted', 'jobs': accepted}
+
+    def job_status(self, query):
+        ids = [i for i in (query.get('ids') or [''])[0].split(',') if i]
+        if not ids:
+            return 400, {'status': 'error', 'message': 'Missing "ids" query parameter'}
+        wait = min(60.0, float((query.get('wait') or ['0'])[0] or 0))
+        deadline = time.monotonic() + wait
+
+        def settled():
+            return any(self.jobs.get(i, {'state': 'unknown'})['state'] in ('sent', 'failed', 'cancelled', 'unknown')
+                       for i in ids)
+
+        with self._job_done:
+            while not settled() and time.monotonic() < deadline:
+                self._job_done.wait(deadline - time.monotonic())
+            view = [dict(self.jobs[i]) if i in self.jobs else {'jobId': i, 'state': 'unknown'} for i in ids]
+        return 200, {'status': 'success', 'jobs': view}
+
+    def cancel_jobs(self, query):
+        ids = [i for i in (query.get('ids') or [''])[0].split(',') if i]
+        if not ids:
+            return 400, {'status': 'error', 'message': 'Missing "ids" query parameter'}
+        with self._job_done:
+            for i in ids:
+                if self.jobs.get(i, {}).get('state') == 'queued':
+                    self.jobs[i]['state'] = 'cancelled'
+            self._job_done.notify_all()
+            view = [dict(self.jobs[i]) if i in self.jobs else {'jobId': i, 'state': 'unknown'} for i in ids]
+        return 200, {'status': 'success', 'jobs': view}
+
+    def receive(self, phone, body, session=None):
+        """Simulates an incoming WhatsApp message, served by GET /inbound."""
+        with self._lock:
+            self.inbound.append({'seq': len(self.inbound) + 1, 'session': session or self.sessions[0],
+                                 'from': str(phone), 'body': body, 'timestamp': int(time.time())})
+
+    def inbound_since(self, query):
+        boot = (query.get('boot') or [None])[0]
+        after = 0 if boot and boot != self.boot_id else int((query.get('after') or ['0'])[0] or 0)
+        limit = max(1, min(1000, int((query.get('limit') or ['500'])[0] or 500)))
+        with self._lock:
+            messages = self.inbound[after:after + limit]
+            last = len(self.inbound)
+        return 200, {'status': 'success', 'bootId': self.boot_id, 'last': last, 'messages': messages}
+
+    def _run_jobs(self, session):
+        jobs = self._job_queues[session]
+        while True:
+            job, number, delay_min, delay_max = jobs.get()
+            with self._session_locks[session]:
+                with self._lock:
+                    if job['state'] == 'cancelled':
+                        continue
+                    job['state'] = 'sending'
+                ok = self._send_text()
+                if self.honor_delays:
+                    low = float(delay_min or 0)
+                    time.sleep(self.random.uniform(low, max(low, float(delay_max or 0))))
+            with self._job_done:
+                if ok:
+                    job.update(state='sent', msgId=f"fake_{number}")
+                else:
+                    job.update(state='failed', error='Simulated failure')
+                self._job_done.notify_all()
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Node.js WhatsApp bridge")
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--latency', type=float, default=0.0, help="mean seconds per sendText")
+    parser.add_argument('--jitter', type=float, default=0.0, help="latency spread, fraction of --latency")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="probability that a send fails")
+    parser.add_argument('--sessions', default="default", help="comma separated session names")
+    parser.add_argument('--honor-delays', action='store_true', help="apply /send-batch and /jobs spacing")
+    parser.add_argument('--unregistered', type=float, default=0.0, help="share of numbers not on WhatsApp")
+    args = parser.parse_args()
+
+    bridge = FakeBridge(args.port, args.latency, args.jitter, args.fail_rate,
+                        [s.strip() for s in args.sessions.split(',') if s.strip()], args.honor_delays,
+                        unregistered=args.unregistered)
+    bridge.start()
+    print(f"Fake bridge listening on {bridge.url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    print(f"{bridge.requests} requests, {bridge.sent} sent, {bridge.failed} failed")
+
+if __name__ == "__main__":
+    main()
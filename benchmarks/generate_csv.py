@@ -0,0 +1,56 @@
+"""
+Synthetic contact lists for the benchmarks.
+
+    python benchmarks/generate_csv.py 1000000 contacts_1m.csv --duplicates 0.05 --invalid 0.01
+"""
+import argparse
+import csv
+import random
+
+FIRST_NAMES = ["Ahmed", "Sara", "Omar", "Laila", "Youssef", "Mona", "Karim", "Nour", "Hassan", "Dina"]
+CITIES = ["Cairo", "Giza", "Alexandria", "Madrid", "Berlin", "Dubai"]
+
+def generate(path, rows, duplicates=0.02, invalid=0.01, national=0.2, seed=1):
+    """
+    Writes `rows` contacts with name, phone and city columns. Phones mix
+    international (+20 / 0020) and national (0...) formats; a share of
+    rows repeats an earlier number or carries an unusable one.
+    Streams the rows, so 10M-row files need no memory.
+    """
+    rng = random.Random(seed)
+    recent = []
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'phone', 'city'])
+        for i in range(rows):
+            roll = rng.random()
+            if roll < invalid:
+                phone = rng.choice(["", "n/a", "12345", "+20 10 abc"])
+            elif roll < invalid + duplicates and recent:
+                phone = rng.choice(recent)
+            else:
+                subscriber = 1000000000 + i  # unique per row
+                if rng.random() < national:
+                    phone = f"0{subscriber}"
+                else:
+                    phone = rng.choice(["+20 ", "0020", "20"]) + str(subscriber)
+                if len(recent) < 1000:
+                    recent.append(phone)
+                else:
+                    recent[rng.randrange(1000)] = phone
+            writer.writerow([f"{rng.choice(FIRST_NAMES)} {i}", phone, rng.choice(CITIES)])
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic contacts CSV")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--duplicates', type=float, default=0.02, help="share of repeated numbers")
+    parser.add_argument('--invalid', type=float, default=0.01, help="share of unusable numbers")
+    parser.add_argument('--national', type=float, default=0.2, help="share of numbers without country code")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    generate(args.path, args.rows, args.duplicates, args.invalid, args.national, args.seed)
+
+if __name__ == "__main__":
+    main()
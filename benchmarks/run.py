@@ -0,0 +1,346 @@
+"""
+Offline benchmark suite. Needs no network and no WhatsApp: the Node
+bridge is replaced by fake_bridge.FakeBridge.
+
+    python benchmarks/run.py                              # quick sizes
+    python benchmarks/run.py --rows 10000 1000000 10000000 --output results.json
+    python benchmarks/run.py --only worker --compare results.json
+    python benchmarks/run.py --only memory --rows 5000000
+
+Results are JSON (one entry per scenario and size) so runs of different
+commits can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, HERE)
+
+from generate_csv import generate
+from fake_bridge import FakeBridge
+
+FULL_WEEK = {day: [{'start': '00:00', 'end': '23:59'}] for day in ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")}
+OFFICE_HOURS = {day: [{'start': '09:00', 'end': '12:00'}, {'start': '14:00', 'end': '18:00'}]
+                for day in ("Mon", "Tue", "Wed", "Thu", "Fri")}
+
+class Bench:
+    """Shared state of one benchmark run: scratch directory and cached input files."""
+    def __init__(self, work_dir, data_dir):
+        self.work_dir = work_dir
+        self.data_dir = data_dir
+        self._case = 0
+
+    def input_csv(self, rows):
+        path = os.path.join(self.data_dir, f"contacts_{rows}.csv")
+        if not os.path.exists(path):
+            generate(path, rows)
+        return path
+
+    def case_dir(self):
+        # Fresh directory per case, so worked.csv / worked.db never leak between cases.
+        self._case += 1
+        path = os.path.join(self.work_dir, f"case{self._case}")
+        os.makedirs(path)
+        return path
+
+    def csv_manager(self, durability="flush"):
+        from csv_manager import CSVManager
+        d = self.case_dir()
+        return CSVManager(
+            worked_file=os.path.join(d, "worked.csv"), failed_file=os.path.join(d, "failed.csv"),
+            spool_file=os.path.join(d, "queue.spool"), sent_db=os.path.join(d, "worked.db"),
+            rejects_file=os.path.join(d, "rejects.csv"), suppressed_db=os.path.join(d, "suppressed.db"),
+            results_db=os.path.join(d, "results.db"),
+            durability=durability
+        )
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+# --- Scenarios: each returns a list of result dicts ---
+
+def bench_load_and_filter(bench, rows):
+    import pandas  # imported up front so the first case doesn't pay for it
+    path = bench.input_csv(rows)
+    manager = bench.csv_manager()
+    seconds, (stream, skipped) = timed(lambda: manager.load_and_filter(path, default_country_code="20"))
+    results = [{'scenario': 'load_and_filter', 'rows': rows, 'seconds': seconds,
+                'rows_per_sec': rows / seconds, 'stats': stream.stats}]
+
+    # Second load of the same file with half of it already worked.
+    phones = [(None, c['phone'], None) for i, c in enumerate(stream) if i % 2 == 0]
+    manager.sent_store.add_many(phones)
+    seconds, (stream, skipped) = timed(lambda: manager.load_and_filter(path, default_country_code="20"))
+    results.append({'scenario': 'load_and_filter_half_worked', 'rows': rows, 'seconds': seconds,
+                    'rows_per_sec': rows / seconds, 'stats': stream.stats})
+    manager.close()
+    manager.sent_store.close()
+    return results
+
+def bench_result_logging(bench, rows):
+    results = []
+    for durability in ("flush", "fsync"):
+        manager = bench.csv_manager(durability)
+        contacts = [{'name': f"Name {i}", 'phone': str(201000000000 + i)} for i in range(rows)]
+
+        def log_all():
+            for i, contact in enumerate(contacts):
+                if i % 10:
+                    manager.log_worked(contact)
+                else:
+                    manager.log_failed(contact, "Simulated failure")
+
+        enqueue_seconds, _ = timed(log_all)
+        close_seconds, _ = timed(manager.close)
+        total = enqueue_seconds + close_seconds
+        results.append({'scenario': f'result_logging_{durability}', 'rows': rows, 'seconds': total,
+                        'rows_per_sec': rows / total, 'enqueue_us_per_row': enqueue_seconds / rows * 1e6})
+        manager.sent_store.close()
+    return results
+
+def bench_format_message(bench, rows):
+    from utils import format_message
+    from templates import CompiledTemplate
+
+    source = "Hello {name}, your order for {city} is ready. Reply STOP to opt out. {{ref}}"
+    contacts = [{'name': f"Name {i}", 'phone': str(i), 'city': "Cairo"} for i in range(rows)]
+
+    seconds, _ = timed(lambda: [format_message(source, c) for c in contacts])
+    results = [{'scenario': 'format_message', 'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds}]
+
+    template = CompiledTemplate(source, ['name', 'phone', 'city'])
+    seconds, _ = timed(lambda: [template.render(c) for c in contacts])
+    results.append({'scenario': 'compiled_template_render', 'rows': rows, 'seconds': seconds,
+                    'rows_per_sec': rows / seconds})
+    return results
+
+def bench_scheduler(bench, rows):
+    from scheduler import Scheduler
+
+    scheduler = Scheduler()
+    scheduler.update_config(OFFICE_HOURS)
+    # Spread the lookups over one week, minute by minute.
+    base = datetime(2024, 1, 1).timestamp()
+    moments = [datetime.fromtimestamp(base + (i * 61) % (7 * 86400)) for i in range(rows)]
+
+    seconds, _ = timed(lambda: [scheduler.is_allowed(now) for now in moments])
+    results = [{'scenario': 'scheduler_is_allowed', 'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds}]
+    seconds, _ = timed(lambda: [scheduler.seconds_until_open(now) for now in moments])
+    results.append({'scenario': 'scheduler_seconds_until_open', 'rows': rows, 'seconds': seconds,
+                    'rows_per_sec': rows / seconds})
+    return results
+
+def bench_worker(bench, rows, batch_sizes=(1, 20), latency=0.0):
+    """
+    End-to-end AutomationWorker throughput against the fake bridge, zero
+    delay, through the async job queue and through the blocking routes.
+    """
+    from node_client import NodeClient
+    from scheduler import Scheduler
+    from worker import AutomationWorker
+
+    path = bench.input_csv(rows)
+    bridge = FakeBridge(latency=latency).start()
+    results = []
+    try:
+        for batch_size, async_jobs in [(b, a) for b in batch_sizes for a in (True, False)]:
+            manager = bench.csv_manager()
+            stream, _ = manager.load_and_filter(path, default_country_code="20")
+            scheduler = Scheduler()
+            scheduler.update_config(FULL_WEEK)
+            config = {'delay_min': 0, 'delay_max': 0, 'done_number': '', 'batch_size': batch_size,
+                      'async_jobs': async_jobs}
+            callbacks = {'on_log': None, 'on_progress': lambda value: None, 'on_finish': lambda: None}
+            worker = AutomationWorker(stream, ["Hello {name} from {city}"], scheduler, config, callbacks,
+                                      client=NodeClient(bridge.url))
+            worker.csv_manager = manager
+
+            seconds, _ = timed(lambda: (worker.start(), worker.join()))
+            mode = "jobs" if async_jobs else "blocking"
+            results.append({'scenario': f'worker_{mode}_batch_{batch_size}', 'rows': len(stream), 'seconds': seconds,
+                            'rows_per_sec': len(stream) / seconds, 'bridge_latency': latency,
+                            'bridge_requests': bridge.requests})
+            bridge.requests = 0
+            manager.sent_store.close()
+    finally:
+        bridge.stop()
+    return results
+
+def traced(func):
+    """Runs func under tracemalloc; returns (seconds, peak MB, MB still held afterwards, result)."""
+    tracemalloc.start()
+    try:
+        seconds, result = timed(func)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak / 2**20, current / 2**20, result
+
+def bench_memory(bench, rows):
+    """
+    Memory held for deduplicating the queue: a set of phone strings (the
+    old index) against csv_manager.PhoneSet, fed in load_and_filter
+    sized chunks; then the peak of a whole load_and_filter run.
+    """
+    import numpy
+    from csv_manager import PhoneSet, DEFAULT_CHUNKSIZE
+
+    first = 201000000000
+
+    def string_set():
+        return {str(first + i) for i in range(rows)}
+
+    def packed_set():
+        phones = PhoneSet()
+        for start in range(0, rows, DEFAULT_CHUNKSIZE):
+            phones.add(numpy.arange(first + start, first + min(rows, start + DEFAULT_CHUNKSIZE), dtype='int64'))
+        return phones
+
+    results = []
+    for name, build in (('dedup_index_str_set', string_set), ('dedup_index_packed', packed_set)):
+        seconds, peak, held, index = traced(build)
+        results.append({'scenario': name, 'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds,
+                        'peak_mb': peak, 'held_mb': held, 'bytes_per_phone': held * 2**20 / rows})
+        del index
+
+    path = bench.input_csv(rows)
+    manager = bench.csv_manager()
+    seconds, peak, held, _ = traced(lambda: manager.load_and_filter(path, default_country_code="20"))
+    results.append({'scenario': 'load_and_filter_memory', 'rows': rows, 'seconds': seconds,
+                    'peak_mb': peak, 'held_mb': held})
+    manager.sent_store.close()
+    return results
+
+def bench_suppression(bench, rows):
+    """
+    Suppression list with `rows` opt-outs: reopening it (loading the packed
+    index from SQLite), memory held, per-send lookups and the vectorized
+    check used by load_and_filter.
+    """
+    import numpy
+    from suppression import SuppressionList
+
+    path = os.path.join(bench.case_dir(), "suppressed.db")
+    first = 201000000000
+    SuppressionList(path).add_many((str(first + 2 * i) for i in range(rows)), "benchmark")
+
+    seconds, peak, held, suppression = traced(lambda: SuppressionList(path))
+    results = [{'scenario': 'suppression_open', 'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds,
+                'peak_mb': peak, 'held_mb': held}]
+
+    lookups = min(rows, 200000)
+    phones = [str(first + i) for i in range(lookups)]
+    seconds, hits = timed(lambda: sum(map(suppression.contains, phones)))
+    results.append({'scenario': 'suppression_contains', 'rows': lookups, 'seconds': seconds,
+                    'rows_per_sec': lookups / seconds, 'entries': rows})
+
+    numbers = numpy.arange(first, first + rows, dtype='int64')
+    seconds, _ = timed(lambda: suppression.contains_many(numbers))
+    results.append({'scenario': 'suppression_contains_many', 'rows': rows, 'seconds': seconds,
+                    'rows_per_sec': rows / seconds})
+    suppression.close()
+    return results
+
+def bench_startup(bench, rows):
+    """Import time of the headless entry point; pandas must not be part of it."""
+    runs = []
+    for _ in range(5):
+        seconds, proc = timed(lambda: subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import cli"],
+            cwd=SRC, capture_output=True, text=True, check=True
+        ))
+        runs.append((seconds, proc.stderr))
+    seconds = min(s for s, _ in runs)
+    loaded = {line.rsplit("|", 1)[-1].strip() for line in runs[0][1].splitlines()}
+    return [{'scenario': 'startup_import_cli', 'rows': 1, 'seconds': seconds,
+             'imports_pandas': 'pandas' in loaded, 'imports_requests': 'requests' in loaded}]
+
+SCENARIOS = {
+    'load_and_filter': bench_load_and_filter,
+    'result_logging': bench_result_logging,
+    'format_message': bench_format_message,
+    'scheduler': bench_scheduler,
+    'worker': bench_worker,
+    'memory': bench_memory,
+    'suppression': bench_suppression,
+    'startup': bench_startup,
+}
+# Scenarios that get slow with size are capped, the rest follow --rows.
+MAX_ROWS = {'result_logging': 1000000, 'worker': 100000, 'startup': 1}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    """Prints the throughput ratio of every scenario against a previous run."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    before = {(r['scenario'], r['rows']): r for r in baseline['results']}
+    print(f"\nCompared with {baseline_path} ({baseline.get('commit')}):")
+    for r in results:
+        old = before.get((r['scenario'], r['rows']))
+        if old:
+            change = old['seconds'] / r['seconds'] if r['seconds'] else float('inf')
+            print(f"  {r['scenario']:<32} {r['rows']:>10}  {old['seconds']:9.3f}s -> {r['seconds']:9.3f}s  x{change:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="L-WAS offline benchmarks")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000],
+                        help="input sizes (10000 up to 10000000)")
+    parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument('--output', help="write the JSON results to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--data-dir', default=os.path.join(HERE, ".data"),
+                        help="where generated input CSVs are cached")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="lwas-bench-")
+    bench = Bench(work_dir, args.data_dir)
+
+    results = []
+    try:
+        for name in args.only or SCENARIOS:
+            sizes = sorted({min(rows, MAX_ROWS.get(name, rows)) for rows in args.rows})
+            for rows in sizes:
+                for result in SCENARIOS[name](bench, rows):
+                    print(f"{result['scenario']:<32} {result['rows']:>10} rows  {result['seconds']:9.3f}s"
+                          + (f"  {result['rows_per_sec']:>12,.0f}/s" if 'rows_per_sec' in result else "")
+                          + (f"  peak {result['peak_mb']:,.1f} MB" if 'peak_mb' in result else ""),
+                          flush=True)
+                    results.append(result)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
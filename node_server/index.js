@@ -1,69 +1,547 @@
+const crypto = require('crypto');
 const wppconnect = require('@wppconnect-team/wppconnect');
 const express = require('express');
 
 const app = express();
-app.use(express.json());
 
-let client;
+// Sessions hosted by this bridge, e.g. WPP_SESSIONS=sales1,sales2
+// The first one is the default used by the session-less routes.
+const SESSION_NAMES = (process.env.WPP_SESSIONS || 'mySessionName')
+  .split(',')
+  .map((name) => name.trim())
+  .filter(Boolean);
+const DEFAULT_SESSION = SESSION_NAMES[0];
+const PORT = Number(process.env.PORT) || 3000;
+// Async jobs: queued sends allowed per session, and how long finished
+// jobs stay available for status polling.
+const MAX_QUEUED_JOBS = Number(process.env.MAX_QUEUED_JOBS) || 500;
+const JOB_TTL_MS = (Number(process.env.JOB_TTL_SECONDS) || 3600) * 1000;
+// Media cache: total size of prepared attachments kept in memory, and
+// the largest single upload accepted.
+const MEDIA_CACHE_BYTES = (Number(process.env.MEDIA_CACHE_MB) || 256) * 1024 * 1024;
+const MAX_MEDIA_BYTES = (Number(process.env.MAX_MEDIA_MB) || 64) * 1024 * 1024;
+// JSON request bodies: a full window of MAX_QUEUED_JOBS long messages
+// is far above express's 100kb default.
+const MAX_BODY_BYTES = (Number(process.env.MAX_BODY_MB) || 32) * 1024 * 1024;
 
-// Endpoint to send a message
-app.post('/send-message', async (req, res) => {
-  const { number, message } = req.body;
+app.use(express.json({ limit: MAX_BODY_BYTES }));
 
-  if (!client) {
-    return res.status(500).json({ status: 'error', message: 'WhatsApp client is not ready' });
+// name -> { client, sendChain, nextSendAt, queuedJobs }
+const sessions = {};
+for (const name of SESSION_NAMES) {
+  sessions[name] = { client: null, sendChain: Promise.resolve(), nextSendAt: 0, queuedJobs: 0 };
+}
+
+// Resolves the session for a request and checks that its client is ready.
+function getSession(req, res) {
+  const name = req.params.session || DEFAULT_SESSION;
+  const session = sessions[name];
+  if (!session) {
+    res.status(404).json({ status: 'error', message: `Unknown session "${name}"` });
+    return null;
+  }
+  if (!session.client) {
+    // 503: nothing was sent, the Python app may retry.
+    res.status(503).json({ status: 'error', message: 'WhatsApp client is not ready' });
+    return null;
+  }
+  return session;
+}
+
+// --- Media cache ---
+// Attachments are uploaded once (PUT /media/<sha256>) and kept prepared
+// as data URIs, keyed by the sha256 of their bytes; sends reference the
+// hash only ({ number, message, media }). Least recently used entries
+// are evicted above MEDIA_CACHE_BYTES, except those pinned by queued
+// sends. A send naming an unknown hash gets 409, and the Python app
+// uploads the file again.
+
+// sha256 -> { sha256, filename, mimetype, size, dataUri, pins }; Map order is LRU order.
+const mediaCache = new Map();
+let mediaBytes = 0;
+
+function useMedia(sha256) {
+  const entry = mediaCache.get(sha256);
+  if (entry) {
+    // Re-inserted as most recently used.
+    mediaCache.delete(sha256);
+    mediaCache.set(sha256, entry);
+  }
+  return entry;
+}
+
+function evictMedia() {
+  for (const entry of mediaCache.values()) {
+    if (mediaBytes <= MEDIA_CACHE_BYTES) break;
+    if (entry.pins > 0) continue;
+    mediaCache.delete(entry.sha256);
+    mediaBytes -= entry.dataUri.length;
+    console.log(`Media cache: evicted ${entry.filename} (${entry.sha256.slice(0, 12)})`);
+  }
+}
+
+function pinMedia(hashes, delta) {
+  for (const sha256 of hashes) {
+    const entry = mediaCache.get(sha256);
+    if (entry) entry.pins += delta;
   }
+  if (delta < 0) evictMedia();
+}
+
+// Hashes referenced by the items that are not in the cache.
+function missingMedia(items) {
+  return [...new Set(items.filter((item) => item && item.media).map((item) => item.media))]
+    .filter((sha256) => !mediaCache.has(sha256));
+}
+
+function replyMissingMedia(res, missing) {
+  return res.status(409).json({ status: 'error', message: 'Media not cached, upload it again', missing });
+}
+
+// Text, or the cached attachment with the text as caption.
+async function sendContent(session, number, message, media) {
+  // Add @c.us to the number for personal messages.
+  const to = `${number}@c.us`;
+  if (!media) return session.client.sendText(to, message);
+  const entry = useMedia(media);
+  if (!entry) throw new Error(`Media not cached: ${media}`);
+  return session.client.sendFile(to, entry.dataUri, entry.filename, message || '');
+}
+
+// PUT /media/<sha256>?filename=report.pdf, raw file bytes as body.
+function handleUploadMedia(req, res) {
+  const { sha256 } = req.params;
+  if (!Buffer.isBuffer(req.body) || req.body.length === 0) {
+    return res.status(400).json({ status: 'error', message: 'Send the file as raw bytes' });
+  }
+  if (crypto.createHash('sha256').update(req.body).digest('hex') !== sha256) {
+    return res.status(400).json({ status: 'error', message: 'Content does not match its sha256' });
+  }
+  if (Math.ceil(req.body.length / 3) * 4 > MEDIA_CACHE_BYTES) {
+    return res.status(413).json({ status: 'error', message: 'File is larger than the media cache (MEDIA_CACHE_MB)' });
+  }
+  if (!useMedia(sha256)) {
+    const mimetype = req.get('Content-Type') || 'application/octet-stream';
+    const entry = {
+      sha256,
+      filename: String(req.query.filename || sha256),
+      mimetype,
+      size: req.body.length,
+      dataUri: `data:${mimetype};base64,${req.body.toString('base64')}`,
+      pins: 0,
+    };
+    mediaCache.set(sha256, entry);
+    mediaBytes += entry.dataUri.length;
+    evictMedia();
+  }
+  res.status(200).json({ status: 'success', sha256, cached: true });
+}
+
+// GET /media/<sha256>: whether the attachment is cached.
+function handleMediaStatus(req, res) {
+  const entry = mediaCache.get(req.params.sha256);
+  res.status(200).json({
+    status: 'success',
+    sha256: req.params.sha256,
+    cached: Boolean(entry),
+    size: entry ? entry.size : undefined,
+  });
+}
+
+// GET /media: cache contents and usage.
+function handleListMedia(req, res) {
+  res.status(200).json({
+    status: 'success',
+    bytes: mediaBytes,
+    capacity: MEDIA_CACHE_BYTES,
+    media: [...mediaCache.values()].map(({ sha256, filename, mimetype, size, pins }) => ({
+      sha256, filename, mimetype, size, pins,
+    })),
+  });
+}
+
+// Endpoint to send a message, optionally with a cached attachment: { number, message, media }
+async function handleSendMessage(req, res) {
+  const { number, message, media } = req.body;
 
-  if (!number || !message) {
+  const session = getSession(req, res);
+  if (!session) return;
+
+  if (!number || (!message && !media)) {
     return res.status(400).json({ status: 'error', message: 'Missing "number" or "message" in request body' });
   }
+  if (media && !mediaCache.has(media)) return replyMissingMedia(res, [media]);
 
   try {
-    // Add @c.us to the number for personal messages.
-    const result = await client.sendText(`${number}@c.us`, message);
+    const result = await sendContent(session, number, message, media);
     res.status(200).json({ status: 'success', response: result });
   } catch (error) {
     console.error('Error when sending: ', error);
-    res.status(500).json({ status: 'error', message: 'Error sending message', error: error });
+    res.status(500).json({ status: 'error', message: 'Error sending message', error: errorText(error) });
+  }
+}
+
+// --- Bulk sending ---
+// All batch sends of a session go through one queue so message spacing
+// is enforced here, across items and across consecutive batches.
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+function randomDelayMs(delayMin, delayMax) {
+  const min = Math.max(0, Number(delayMin) || 0);
+  const max = Math.max(min, Number(delayMax) || 0);
+  return (min + Math.random() * (max - min)) * 1000;
+}
+
+function errorText(error) {
+  if (!error) return 'Unknown error';
+  if (typeof error === 'string') return error;
+  return error.message || error.text || JSON.stringify(error);
+}
+
+function enqueue(session, task) {
+  const run = session.sendChain.then(task);
+  session.sendChain = run.catch(() => {});
+  return run;
+}
+
+async function sendBatch(session, items, delayMin, delayMax) {
+  const results = [];
+  for (const item of items) {
+    const { number, message, media, id } = item || {};
+    if (!number || (!message && !media)) {
+      results.push({ id, ok: false, error: 'Missing "number" or "message"' });
+      continue;
+    }
+
+    const wait = session.nextSendAt - Date.now();
+    if (wait > 0) await sleep(wait);
+
+    try {
+      const result = await sendContent(session, number, message, media);
+      results.push({ id, ok: true, msgId: result && result.id });
+    } catch (error) {
+      results.push({ id, ok: false, error: errorText(error) });
+    }
+    session.nextSendAt = Date.now() + randomDelayMs(delayMin, delayMax);
+  }
+  return results;
+}
+
+// Endpoint to send a window of messages: { items: [{ number, message, media, id }], delayMin, delayMax }
+async function handleSendBatch(req, res) {
+  const { items, delayMin, delayMax } = req.body;
+
+  const session = getSession(req, res);
+  if (!session) return;
+
+  if (!Array.isArray(items) || items.length === 0) {
+    return res.status(400).json({ status: 'error', message: 'Missing "items" array in request body' });
+  }
+  const missing = missingMedia(items);
+  if (missing.length) return replyMissingMedia(res, missing);
+
+  const hashes = items.filter((item) => item && item.media).map((item) => item.media);
+  pinMedia(hashes, 1);
+  try {
+    const results = await enqueue(session, () => sendBatch(session, items, delayMin, delayMax));
+    res.status(200).json({ status: 'success', results });
+  } catch (error) {
+    console.error('Error when sending batch: ', error);
+    res.status(500).json({ status: 'error', message: errorText(error) });
+  } finally {
+    pinMedia(hashes, -1);
+  }
+}
+
+// --- Async jobs ---
+// POST /jobs accepts sends into the session queue and answers 202 with a
+// job id per item right away; GET /jobs reports their state. A slow
+// WhatsApp Web page then delays the outcome, not the HTTP response, and
+// the caller never has to guess whether a timed out request was sent.
+
+// jobId -> { jobId, session, id, state: queued|sending|sent|failed|cancelled, error, msgId, finishedAt }
+const jobs = new Map();
+let jobSeq = 0;
+// Long-poll requests waiting for a job to finish.
+const jobWaiters = new Set();
+
+function jobView(job) {
+  return { jobId: job.jobId, id: job.id, state: job.state, error: job.error, msgId: job.msgId };
+}
+
+function finishJob(job, state, fields) {
+  Object.assign(job, fields, { state, finishedAt: Date.now() });
+  for (const waiter of jobWaiters) waiter(job.jobId);
+}
+
+async function runJob(session, job, delayMin, delayMax) {
+  session.queuedJobs -= 1;
+  const wait = session.nextSendAt - Date.now();
+  if (wait > 0) await sleep(wait);
+  if (job.state === 'cancelled') {
+    if (job.media) pinMedia([job.media], -1);
+    delete job.message;
+    return;
+  }
+
+  job.state = 'sending';
+  try {
+    const result = await sendContent(session, job.number, job.message, job.media);
+    finishJob(job, 'sent', { msgId: result && result.id });
+  } catch (error) {
+    finishJob(job, 'failed', { error: errorText(error) });
+  }
+  if (job.media) pinMedia([job.media], -1);
+  delete job.message;
+  session.nextSendAt = Date.now() + randomDelayMs(delayMin, delayMax);
+}
+
+// Body: { items: [{ number, message, media, id }], delayMin, delayMax }
+function handleSubmitJobs(req, res) {
+  const { items, delayMin, delayMax } = req.body;
+
+  const session = getSession(req, res);
+  if (!session) return;
+
+  if (!Array.isArray(items) || items.length === 0) {
+    return res.status(400).json({ status: 'error', message: 'Missing "items" array in request body' });
+  }
+  if (items.some((item) => !item || !item.number || (!item.message && !item.media))) {
+    return res.status(400).json({ status: 'error', message: 'Every item needs "number" and "message"' });
+  }
+  const missing = missingMedia(items);
+  if (missing.length) return replyMissingMedia(res, missing);
+  // Backpressure: refuse the whole request rather than queue without bound.
+  if (session.queuedJobs + items.length > MAX_QUEUED_JOBS) {
+    res.set('Retry-After', '5');
+    return res.status(429).json({
+      status: 'error', message: 'Send queue is full', queued: session.queuedJobs, capacity: MAX_QUEUED_JOBS,
+    });
+  }
+
+  const accepted = items.map((item) => {
+    jobSeq += 1;
+    const job = {
+      jobId: `${req.params.session || DEFAULT_SESSION}-${Date.now().toString(36)}-${jobSeq}`,
+      id: item.id, number: item.number, message: item.message, media: item.media, state: 'queued',
+    };
+    jobs.set(job.jobId, job);
+    // Queued attachments are not evicted before their send.
+    if (job.media) pinMedia([job.media], 1);
+    session.queuedJobs += 1;
+    enqueue(session, () => runJob(session, job, delayMin, delayMax));
+    return { id: job.id, jobId: job.jobId };
+  });
+  res.status(202).json({ status: 'accepted', jobs: accepted });
+}
+
+// GET /jobs?ids=a,b,c&wait=20 : state of several jobs. With "wait" (seconds,
+// max 60) the answer is held until one of them finishes or the time is up.
+function handleJobStatus(req, res) {
+  const ids = String(req.query.ids || '').split(',').filter(Boolean);
+  if (ids.length === 0) {
+    return res.status(400).json({ status: 'error', message: 'Missing "ids" query parameter' });
+  }
+  const view = () => ids.map((jobId) => {
+    const job = jobs.get(jobId);
+    return job ? jobView(job) : { jobId, state: 'unknown' };
+  });
+  const settled = (jobId) => {
+    const job = jobs.get(jobId);
+    return !job || job.state === 'sent' || job.state === 'failed' || job.state === 'cancelled';
+  };
+
+  const waitMs = Math.min(60, Number(req.query.wait) || 0) * 1000;
+  if (!waitMs || ids.some(settled)) {
+    return res.status(200).json({ status: 'success', jobs: view() });
+  }
+
+  const wanted = new Set(ids);
+  let timer;
+  const waiter = (jobId) => {
+    if (wanted.has(jobId)) done();
+  };
+  const cleanup = () => {
+    jobWaiters.delete(waiter);
+    clearTimeout(timer);
+  };
+  function done() {
+    cleanup();
+    res.status(200).json({ status: 'success', jobs: view() });
+  }
+  jobWaiters.add(waiter);
+  timer = setTimeout(done, waitMs);
+  res.on('close', cleanup);  // caller gave up
+}
+
+// DELETE /jobs?ids=a,b,c : cancels the jobs that are still queued (a stopped
+// run). Jobs already sending or finished are left alone; the answer has the
+// state of every job, so the caller knows which ones will not be sent.
+function handleCancelJobs(req, res) {
+  const ids = String(req.query.ids || '').split(',').filter(Boolean);
+  if (ids.length === 0) {
+    return res.status(400).json({ status: 'error', message: 'Missing "ids" query parameter' });
+  }
+  const view = ids.map((jobId) => {
+    const job = jobs.get(jobId);
+    if (!job) return { jobId, state: 'unknown' };
+    if (job.state === 'queued') finishJob(job, 'cancelled', {});
+    return jobView(job);
+  });
+  res.status(200).json({ status: 'success', jobs: view });
+}
+
+// Finished jobs are dropped after JOB_TTL_MS.
+setInterval(() => {
+  const cutoff = Date.now() - JOB_TTL_MS;
+  for (const [jobId, job] of jobs) {
+    if (job.finishedAt && job.finishedAt < cutoff) jobs.delete(jobId);
+  }
+}, 60 * 1000).unref();
+
+// --- Registration pre-check ---
+// POST /check-numbers { numbers: [...] } tells which numbers are on
+// WhatsApp, so the Python app can drop the others before sending.
+// "exists" is null when WhatsApp gave no answer (the number is kept).
+const MAX_CHECK_BATCH = 200;
+const CHECK_CONCURRENCY = Number(process.env.CHECK_CONCURRENCY) || 4;
+
+async function checkNumber(session, number) {
+  try {
+    const status = await session.client.checkNumberStatus(`${number}@c.us`);
+    return { number, exists: Boolean(status && status.numberExists) };
+  } catch (error) {
+    // Some versions reject with the status object for unknown numbers.
+    if (error && error.numberExists === false) return { number, exists: false };
+    return { number, exists: null, error: errorText(error) };
+  }
+}
+
+async function handleCheckNumbers(req, res) {
+  const { numbers } = req.body;
+
+  const session = getSession(req, res);
+  if (!session) return;
+
+  if (!Array.isArray(numbers) || numbers.length === 0 || numbers.length > MAX_CHECK_BATCH) {
+    return res.status(400).json({
+      status: 'error', message: `"numbers" must be an array of 1 to ${MAX_CHECK_BATCH} numbers`,
+    });
   }
+
+  // A few checks in flight at once; each one is a round trip to WhatsApp.
+  const results = new Array(numbers.length);
+  let next = 0;
+  const lane = async () => {
+    while (next < numbers.length) {
+      const index = next++;
+      results[index] = await checkNumber(session, String(numbers[index]));
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(CHECK_CONCURRENCY, numbers.length) }, lane));
+  res.status(200).json({ status: 'success', results });
+}
+
+// --- Inbound messages ---
+// Replies to every session are buffered here and fetched by the Python
+// app in batches with GET /inbound?after=<seq>; that is how "STOP"
+// replies reach its suppression list. Only the last INBOUND_BUFFER
+// messages are kept.
+const INBOUND_BUFFER = Number(process.env.INBOUND_BUFFER) || 10000;
+// Changes on every start, so callers can tell that sequence numbers restarted.
+const BOOT_ID = Date.now().toString(36);
+const inbound = [];
+let inboundSeq = 0;
+
+function recordInbound(name, message) {
+  // Direct chats only; group messages and our own sends are not replies.
+  if (message.isGroupMsg || message.fromMe || !String(message.from || '').endsWith('@c.us')) return;
+  inboundSeq += 1;
+  inbound.push({
+    seq: inboundSeq,
+    session: name,
+    from: message.from.split('@')[0],
+    body: message.type === 'chat' ? String(message.body || '') : '',
+    timestamp: message.timestamp,
+  });
+  if (inbound.length > INBOUND_BUFFER) inbound.splice(0, inbound.length - INBOUND_BUFFER);
+}
+
+// GET /inbound?after=<seq>&limit=500&boot=<bootId>
+function handleInbound(req, res) {
+  // A cursor from before a restart refers to old sequence numbers.
+  const after = req.query.boot && req.query.boot !== BOOT_ID ? 0 : Number(req.query.after) || 0;
+  const limit = Math.max(1, Math.min(1000, Number(req.query.limit) || 500));
+  // Sequence numbers are contiguous, so the position is a subtraction.
+  const first = inbound.length ? inbound[0].seq : inboundSeq + 1;
+  const start = Math.max(0, after + 1 - first);
+  res.status(200).json({
+    status: 'success',
+    bootId: BOOT_ID,
+    last: inboundSeq,
+    messages: inbound.slice(start, start + limit),
+  });
+}
+
+app.post('/send-message', handleSendMessage);
+app.post('/send-batch', handleSendBatch);
+app.post('/sessions/:session/send-message', handleSendMessage);
+app.post('/sessions/:session/send-batch', handleSendBatch);
+app.post('/jobs', handleSubmitJobs);
+app.post('/sessions/:session/jobs', handleSubmitJobs);
+app.get('/jobs', handleJobStatus);
+app.delete('/jobs', handleCancelJobs);
+app.post('/check-numbers', handleCheckNumbers);
+app.post('/sessions/:session/check-numbers', handleCheckNumbers);
+app.get('/inbound', handleInbound);
+app.put('/media/:sha256', express.raw({ type: () => true, limit: MAX_MEDIA_BYTES }), handleUploadMedia);
+app.get('/media/:sha256', handleMediaStatus);
+app.get('/media', handleListMedia);
+
+// Lists the hosted sessions and whether each one is logged in.
+app.get('/sessions', (req, res) => {
+  res.status(200).json({
+    status: 'success',
+    sessions: SESSION_NAMES.map((name) => ({ name, ready: Boolean(sessions[name].client) })),
+  });
 });
 
-// Main function to start the WhatsApp client
-function startWpp() {
+// Starts one WhatsApp client
+function startWpp(name) {
   wppconnect
     .create({
-      session: 'mySessionName',
+      session: name,
       catchQR: (base64Qr, asciiQR) => {
-        console.log('Scan the QR Code below:');
+        console.log(`[${name}] Scan the QR Code below:`);
         console.log(asciiQR);
       },
       statusFind: (statusSession, session) => {
-        console.log('Status Session: ', statusSession);
+        console.log(`[${name}] Status Session: `, statusSession);
         if (statusSession === 'isLogged') {
           // Once logged in, store the client instance
-          console.log('Client is logged in!');
+          console.log(`[${name}] Client is logged in!`);
         }
       },
     })
     .then((readyClient) => {
-      client = readyClient;
-      // Now that the client is ready, start the API server
-      const port = 3000;
-      app.listen(port, () => {
-        console.log(`API server listening at http://localhost:${port}`);
-      });
+      sessions[name].client = readyClient;
+      console.log(`[${name}] Client is ready`);
 
-      // Optional: Set up a listener for incoming messages
-      client.onMessage((message) => {
-        console.log(`Received message from ${message.from}: ${message.body}`);
-        // For a full solution, you would send this to your Python app via a webhook.
+      // Incoming messages are buffered for the Python app (GET /inbound).
+      readyClient.onMessage((message) => {
+        console.log(`[${name}] Received message from ${message.from}: ${message.body}`);
+        recordInbound(name, message);
       });
     })
     .catch((error) => {
-      console.log(error);
+      console.log(`[${name}]`, error);
     });
 }
 
-// Start the whole process
-startWpp();
-
+// Start the whole process. The API answers right away; routes of a
+// session return "not ready" until its client has logged in.
+app.listen(PORT, () => {
+  console.log(`API server listening at http://localhost:${PORT}`);
+});
+// Session start-ups are staggered so their QR codes are easier to tell apart.
+SESSION_NAMES.forEach((name, index) => setTimeout(() => startWpp(name), index * 2000));
\ No newline at end of file
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import threading
+
+def fingerprint(path, sample=65536):
+    """Cheap identity of a file: size, mtime and a hash of its head and tail."""
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample))
+        if stat.st_size > sample:
+            f.seek(max(sample, stat.st_size - sample))
+            digest.update(f.read(sample))
+    return f"{stat.st_size}:{int(stat.st_mtime)}:{digest.hexdigest()}"
+
+class ResumeState:
+    """What CampaignJournal.load() found about an unfinished campaign."""
+    def __init__(self, start):
+        self.start = start            # the "start" record (input, spool, total, ...)
+        self.watermark = start['spool_offset']
+        self.done_ahead = {}          # spool offset -> next offset, done items past the watermark
+        self.inflight = {}            # spool offset -> "send" record without an outcome
+        self.done_count = 0
+        self.template_index = 0
+
+    @property
+    def remaining(self):
+        return self.start['total'] - self.done_count - len(self.inflight)
+
+    def settle_inflight(self):
+        """
+        Counts the messages that were in flight at the crash as done, so
+        the resumed run skips them. Returns their "send" records: they may
+        or may not have reached WhatsApp and need checking by hand.
+        """
+        unconfirmed = list(self.inflight.values())
+        for record in unconfirmed:
+            _apply(self, {'t': 'done', 'o': record['o'], 'n': record['n'], 'ok': False})
+        return unconfirmed
+
+class CampaignJournal:
+    """
+    Append-only JSON-lines journal of queue progress, so a crashed
+    campaign can continue without reloading the input.
+
+    Records: "start" (input fingerprint, spool file, totals), "send"
+    before each message goes to the bridge, "done" with its outcome,
+    "unsent" when a stop cancelled it before it went out, "end" when the
+    queue is finished. Progress is tracked as a watermark
+    (spool byte offset below which every contact is done); every
+    `compact_every` outcomes the file is rewritten to a start + "mark"
+    record, so it stays small however long the campaign runs.
+    """
+    def __init__(self, path="campaign.journal", fsync=True, compact_every=1000):
+        self.path = path
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._file = None
+        self._state = None
+        self._since_compact = 0
+
+    # --- Writing ---
+
+    def begin(self, input_path, stream):
+        """Starts a new journal for `stream` (a fresh csv_manager.ContactStream)."""
+        start = {
+            't': 'start',
+            'input': os.path.abspath(input_path),
+            'fingerprint': fingerprint(input_path),
+            'spool': os.path.abspath(stream.spool_path),
+            'spool_size': os.path.getsize(stream.spool_path),
+            'spool_offset': stream.start_offset,
+            'total': len(stream),
+            'columns': stream.columns,
+        }
+        with self._lock:
+            self._state = ResumeState(start)
+            self._rewrite()
+
+    def attach(self, state):
+        """
+        Continues writing to the journal of a resumed campaign.
+        Returns the unconfirmed in-flight records (see settle_inflight).
+        """
+        with self._lock:
+            unconfirmed = state.settle_inflight()
+            self._state = state
+            self._rewrite()
+        return unconfirmed
+
+    def sending(self, item, template_index):
+        self._append({'t': 'send', 'o': item['_offset'], 'n': item['_next'],
+                      'p': item.get('phone'), 'name': item.get('name'), 'tpl': template_index})
+
+    def finished(self, item, success):
+        self._append({'t': 'done', 'o': item['_offset'], 'n': item['_next'], 'ok': bool(success)})
+
+    def unsent(self, item):
+        """The message of a "send" record was never sent: RESUME sends it again."""
+        self._append({'t': 'unsent', 'o': item['_offset']})
+
+    def end(self):
+        """Marks the campaign as complete; there is nothing to resume afterwards."""
+        self._append({'t': 'end'})
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _append(self, record):
+        with self._lock:
+            if self._file is None:
+                return
+            _apply(self._state, record)
+            self._write(record)
+            if record['t'] == 'done':
+                self._since_compact += 1
+                if self._since_compact >= self.compact_every:
+                    self._rewrite()
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _rewrite(self):
+        # Compacts the journal to start + mark, replacing the file atomically.
+        state = self._state
+        mark = {
+            't': 'mark',
+            'watermark': state.watermark,
+            'ahead': [[o, n] for o, n in state.done_ahead.items()],
+            'inflight': list(state.inflight.values()),
+            'done': state.done_count,
+            'tpl': state.template_index,
+        }
+        if self._file:
+            self._file.close()
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(state.start) + "\n")
+            f.write(json.dumps(mark) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._since_compact = 0
+
+    # --- Reading ---
+
+    @classmethod
+    def load(cls, path="campaign.journal"):
+        """
+        Returns the ResumeState of an unfinished campaign, or None if there
+        is none. Raises ValueError if the input or spool changed since.
+        """
+        if not os.path.exists(path):
+            return None
+
+        state = None
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # torn last line from a crash
+                if record['t'] == 'start':
+                    state = ResumeState(record)
+                elif record['t'] == 'end':
+                    return None
+                elif state is not None:
+                    _apply(state, record)
+
+        if state is None:
+            return None
+
+        start = state.start
+        if not os.path.exists(start['spool']) or os.path.getsize(start['spool']) != start['spool_size']:
+            raise ValueError("The queue spool of the interrupted campaign is gone or was replaced")
+        if not os.path.exists(start['input']) or fingerprint(start['input']) != start['fingerprint']:
+            raise ValueError("The input CSV changed since the campaign started")
+        return state
+
+def _apply(state, record):
+    kind = record['t']
+    if kind == 'send':
+        state.inflight[record['o']] = record
+        state.template_index = record['tpl'] + 1
+    elif kind == 'unsent':
+        state.inflight.pop(record['o'], None)
+    elif kind == 'done':
+        state.inflight.pop(record['o'], None)
+        state.done_count += 1
+        state.done_ahead[record['o']] = record['n']
+        while state.watermark in state.done_ahead:
+            state.watermark = state.done_ahead.pop(state.watermark)
+    elif kind == 'mark':
+        state.watermark = record['watermark']
+        state.done_ahead = {o: n for o, n in record['ahead']}
+        state.inflight = {r['o']: r for r in record['inflight']}
+        state.done_count = record['done']
+        state.template_index = record['tpl']
\ No newline at end of file
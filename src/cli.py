@@ -0,0 +1,286 @@
+"""
+Headless runner: same Scheduler / CSVManager / AutomationWorker / NodeClient
+as the GUI, configured from state.json, reporting to stdout and a status file.
+
+    python src/main.py --headless --input contacts.csv
+    python src/main.py --headless --resume
+    python src/main.py --headless --retry-failed
+    python src/main.py --report --days 30
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+from scheduler import Scheduler
+from checkpoint import CampaignJournal
+from retry_queue import RetryQueue
+from templates import compile_templates, TemplateError
+from metrics import METRICS, MetricsExporter
+from node_client import MAX_BATCH_SIZE
+
+class StatusReporter:
+    """Prints log lines to stdout and keeps a small JSON status file up to date."""
+    def __init__(self, status_file, min_interval=1.0):
+        self.status_file = status_file
+        self.min_interval = min_interval
+        self.status = {'state': 'starting', 'progress': 0.0}
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def log(self, message):
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {message}", flush=True)
+        with self._lock:
+            self.status['last_message'] = message
+
+    def progress(self, value):
+        with self._lock:
+            self.status['progress'] = round(value, 4)
+        self.write()
+
+    def set_state(self, state, **fields):
+        with self._lock:
+            self.status['state'] = state
+            self.status.update(fields)
+        self.write(force=True)
+
+    def write(self, force=False):
+        if not self.status_file:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_write < self.min_interval:
+                return
+            self._last_write = now
+            self.status['updated_at'] = datetime.now().isoformat(timespec='seconds')
+            data = json.dumps(self.status)
+        tmp = self.status_file + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp, self.status_file)
+
+def load_settings(path):
+    """Reads settings in the GUI's state.json format."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def build_config(state):
+    """
+    Turns state.json settings into (worker config, accounts, template
+    sources). Raises ValueError on invalid values, like the GUI does.
+    """
+    from dispatcher import parse_accounts
+
+    delay_min = float(state.get('delay_min', 3))
+    delay_max = float(state.get('delay_max', 7))
+    if delay_min <= 0 or delay_max <= 0 or delay_min > delay_max:
+        raise ValueError("Invalid delay range")
+
+    config = {
+        'delay_min': delay_min,
+        'delay_max': delay_max,
+        'done_number': state.get('done_num', ''),
+        'batch_size': int(state.get('batch_size') or 1),
+        'async_jobs': state.get('async_jobs', True),
+    }
+    if not 1 <= config['batch_size'] <= MAX_BATCH_SIZE:
+        raise ValueError(f"Batch size must be a whole number from 1 to {MAX_BATCH_SIZE}")
+    for key, value in (state.get('caps') or {}).items():
+        if str(value).strip():
+            config[key] = int(value)
+            if config[key] < 1:
+                raise ValueError("Rate caps must be whole numbers >= 1 (or empty)")
+
+    accounts = parse_accounts(state.get('accounts', ''), delay_min, delay_max)
+    templates = [state.get('tmpl_1', ''), state.get('tmpl_2', ''), state.get('tmpl_3', '')]
+    return config, accounts, templates
+
+def template_attachments(state):
+    """Attachment path (or '') of each template, from state.json."""
+    return [state.get('media_1', ''), state.get('media_2', ''), state.get('media_3', '')]
+
+def run(args):
+    reporter = StatusReporter(args.status_file)
+    if args.trace_file:
+        METRICS.start_trace(args.trace_file)
+    exporter = MetricsExporter(path=args.metrics_file or None, port=args.metrics_port).start()
+    try:
+        return _run(args, reporter)
+    finally:
+        exporter.stop()
+        METRICS.stop_trace()
+
+def _run(args, reporter):
+    try:
+        state = load_settings(args.config)
+        config, accounts, template_sources = build_config(state)
+    except (OSError, ValueError) as e:
+        reporter.log(f"Invalid settings in {args.config}: {e}")
+        return 2
+
+    scheduler = Scheduler()
+    scheduler.update_config(state.get('schedule', {}))
+    journal = CampaignJournal()
+    retry_queue = RetryQueue()
+
+    # Heavy modules (pandas, requests) load only from here on, and pandas
+    # not at all for --resume.
+    from csv_manager import CSVManager, ContactStream
+    from worker import AutomationWorker
+    from dispatcher import MultiAccountDispatcher
+    from node_client import NodeClient
+    from suppression import InboundWatcher, parse_keywords
+    from registration import RegistrationCache, RegistrationChecker
+
+    csv_manager = CSVManager()
+    csv_manager.suppression.keywords = parse_keywords(state.get('optout_keywords'))
+    resume = None
+    if args.resume:
+        try:
+            resume = CampaignJournal.load(journal.path)
+        except ValueError as e:
+            reporter.log(f"Cannot resume: {e}")
+            return 2
+        if resume is None:
+            reporter.log("No interrupted campaign to resume.")
+            return 0
+        reporter.log(f"Resuming {os.path.basename(resume.start['input'])}: "
+                     f"{resume.done_count} of {resume.start['total']} done, {resume.remaining} left.")
+        columns = resume.start['columns']
+    elif args.retry_failed:
+        queued, permanent = retry_queue.import_failed_csv(csv_manager.failed_file, csv_manager.sent_store)
+        reporter.log(f"Retry: {queued} new transient failure(s) from {csv_manager.failed_file}, "
+                     f"{permanent} permanent (not retried).")
+        if not len(retry_queue):
+            reporter.log("Nothing to retry.")
+            return 0
+        queue, columns = [], retry_queue.columns()
+    else:
+        checker = None
+        if args.precheck or state.get('precheck_numbers'):
+            checker = RegistrationChecker(NodeClient(args.bridge), RegistrationCache(), on_log=reporter.log)
+            reporter.log("Pre-checking numbers on WhatsApp...")
+        try:
+            queue, skipped = csv_manager.load_and_filter(
+                args.input, default_country_code=(state.get('country_code') or '').strip() or None, checker=checker
+            )
+        except Exception as e:
+            reporter.log(f"Error loading CSV: {e}")
+            return 2
+        stats = queue.stats
+        reporter.log(f"Processing {len(queue)} contacts. Skipped {skipped} (already worked), "
+                     f"{stats['duplicates']} duplicates, {stats['invalid']} invalid, {stats['suppressed']} opted out.")
+        if checker is not None:
+            reporter.log(f"Pre-check: {stats['unregistered']} not on WhatsApp (pruned), {checker.checked} checked, "
+                         f"{checker.cached} from cache, {checker.unknown} unchecked.")
+        if len(queue) == 0:
+            reporter.log("No new contacts to process.")
+            return 0
+        columns = queue.columns
+
+    try:
+        templates = compile_templates(template_sources, columns, template_attachments(state))
+    except TemplateError as e:
+        reporter.log(f"Invalid template: {e}")
+        return 2
+
+    template_index = 0
+    if resume is not None:
+        for record in journal.attach(resume):
+            csv_manager.log_failed(
+                {'name': record.get('name'), 'phone': record.get('p')},
+                "Unconfirmed: in flight when the app stopped, check for a duplicate before resending"
+            )
+            reporter.log(f"Unconfirmed (not resent): {record.get('p')}")
+        queue = ContactStream.resume(resume)
+        template_index = resume.template_index
+    elif len(queue):
+        journal.begin(args.input, queue)
+    else:
+        journal = None  # retry-only runs are not journaled
+
+    callbacks = {
+        'on_log': reporter.log,
+        'on_progress': reporter.progress,
+        'on_finish': lambda: None
+    }
+    if accounts:
+        worker = MultiAccountDispatcher(queue, templates, scheduler, config, callbacks, accounts,
+                                        base_url=args.bridge)
+    else:
+        worker = AutomationWorker(queue, templates, scheduler, config, callbacks,
+                                  client=NodeClient(args.bridge))
+    worker.csv_manager = csv_manager
+    worker.journal = journal
+    worker.retry_queue = retry_queue
+    worker.suppression = csv_manager.suppression
+    worker.template_index = template_index
+
+    def request_stop(signum, frame):
+        reporter.log("Stop requested, finishing current message...")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, request_stop)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, request_stop)
+
+    # STOP replies that arrive during the run are suppressed before their contact comes up.
+    watcher = InboundWatcher(csv_manager.suppression, NodeClient(args.bridge, max_retries=0), on_log=reporter.log)
+    watcher.start()
+
+    reporter.set_state('running', total=len(queue))
+    worker.start()
+    # Short joins keep the main thread responsive to signals.
+    while worker.is_alive():
+        worker.join(0.5)
+    watcher.stop()
+    csv_manager.close()
+
+    reporter.set_state('finished' if worker.completed else 'stopped')
+    return 0
+
+def report(args):
+    """Prints the campaign statistics kept in results.db."""
+    from result_store import ResultStore, format_report
+
+    if not os.path.exists("results.db"):
+        print("No results yet (results.db not found).")
+        return 0
+    store = ResultStore("results.db")
+    try:
+        print(format_report(store.stats(days=args.days)))
+    finally:
+        store.close()
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="L-WAS headless campaign runner")
+    parser.add_argument('--headless', action='store_true', help=argparse.SUPPRESS)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help="input CSV with name, phone (and any template columns)")
+    source.add_argument('--resume', action='store_true', help="continue the interrupted campaign")
+    source.add_argument('--retry-failed', action='store_true',
+                        help="re-send transient failures from failed.csv and scheduled retries")
+    source.add_argument('--report', action='store_true',
+                        help="print sent/failed statistics per day, template and failure reason, then exit")
+    parser.add_argument('--days', type=int, help="with --report: only the last N days")
+    parser.add_argument('--precheck', action='store_true',
+                        help="drop numbers that are not on WhatsApp before sending (also 'precheck_numbers' in the settings)")
+    parser.add_argument('--config', default='state.json', help="settings file in the GUI's state.json format")
+    parser.add_argument('--bridge', default='http://localhost:3000', help="URL of the Node bridge")
+    parser.add_argument('--status-file', default='status.json', help="JSON status file ('' to disable)")
+    parser.add_argument('--metrics-file', default='metrics.prom',
+                        help="Prometheus text file, rewritten every 10s ('' to disable)")
+    parser.add_argument('--metrics-port', type=int, help="serve Prometheus metrics at 127.0.0.1:PORT/metrics")
+    parser.add_argument('--trace-file', help="append per-phase timings (JSON lines) for profiling")
+    args = parser.parse_args(argv)
+    if args.report:
+        return report(args)
+    return run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
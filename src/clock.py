@@ -0,0 +1,25 @@
+import time
+from datetime import datetime
+
+class SystemClock:
+    """
+    Time source of the worker and its rate controller. The simulator
+    swaps in simulator.VirtualClock, which has the same four methods.
+    """
+    def now(self):
+        """Wall-clock datetime, used for the sending schedule."""
+        return datetime.now()
+
+    def time(self):
+        """Epoch seconds, used for retry due times."""
+        return time.time()
+
+    def monotonic(self):
+        """Seconds for measuring durations and pacing."""
+        return time.monotonic()
+
+    def wait(self, condition, seconds):
+        """Waits on `condition` (held by the caller) for up to `seconds`."""
+        condition.wait(seconds)
+
+SYSTEM_CLOCK = SystemClock()
@@ -1,70 +1,323 @@
-import pandas as pd
 import os
 import csv
+import json
+import threading
+import time
+from datetime import datetime
+from metrics import METRICS
+from sent_store import SentStore
+from suppression import SuppressionList
+from result_logger import ResultLogger, FLUSH
+from result_store import ResultStore
+
+# pandas is imported inside the functions that need it, so importing this
+# module (e.g. for a resumed or headless run) stays cheap.
+
+# Rows parsed per pandas chunk while streaming the input CSV.
+DEFAULT_CHUNKSIZE = 50000
+
+def normalize_phones(phones, default_country_code=None):
+    """
+    Vectorized canonicalization of a Series of raw phone strings to
+    digits-only E.164 (no '+'), e.g. '+34 600...', '0034600...' -> '34600...'.
+    A float-formatted '34600....0' loses its '.0'.
+    With `default_country_code`, national numbers (trunk '0' prefix or
+    10 digits or fewer) get that code prepended.
+    Returns (normalized, reasons); reasons is '' for valid numbers.
+    """
+    import pandas as pd
+
+    raw = phones.fillna('').astype(str).str.strip()
+    # Numbers saved by Excel as floats ('3460012345.0') keep their digits.
+    raw = raw.str.replace(r'^(\+?\d+)\.0+$', r'\1', regex=True)
+    digits = raw.str.replace(r'\D', '', regex=True)
+
+    international = raw.str.startswith('+') | digits.str.startswith('00')
+    digits = digits.where(~digits.str.startswith('00'), digits.str[2:])
+
+    if default_country_code:
+        cc = str(default_country_code).strip().lstrip('+')
+        trunk = ~international & digits.str.startswith('0')
+        digits = digits.where(~trunk, cc + digits.str[1:])
+        national = ~international & ~trunk & (digits.str.len() <= 10) & ~digits.str.startswith(cc)
+        digits = digits.where(~national, cc + digits)
+
+    length = digits.str.len()
+    reasons = pd.Series('', index=phones.index, dtype=object)
+    reasons[length > 15] = 'too long'
+    reasons[length < 8] = 'too short'
+    reasons[digits.str.startswith('0')] = 'missing country code'
+    reasons[raw.str.contains(r'[A-Za-z]', regex=True)] = 'contains letters'
+    reasons[raw == ''] = 'empty'
+    return digits, reasons
+
+class PhoneSet:
+    """
+    Set of normalized phones packed as sorted int64 arrays: 8 bytes per
+    number instead of a str object in a hash set, so deduplicating a
+    10M-row input needs ~80 MB rather than ~1 GB. New numbers are added
+    as a sorted run and runs of similar size are merged, which keeps
+    the number of runs (binary searches per lookup) logarithmic.
+    Phones must be digits-only E.164 (at most 15 digits, no leading 0).
+    """
+    def __init__(self):
+        self._runs = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return sum(run.nbytes for run in self._runs)
+
+    def contains(self, numbers):
+        """Boolean array: which of `numbers` (int64 array) are in the set."""
+        import numpy as np
+
+        found = np.zeros(len(numbers), dtype=bool)
+        for run in self._runs:
+            index = np.searchsorted(run, numbers).clip(max=len(run) - 1)
+            found |= run[index] == numbers
+        return found
+
+    def add(self, numbers):
+        """Adds `numbers` (int64 array, none of them already in the set)."""
+        import numpy as np
+
+        if not len(numbers):
+            return
+        self._runs.append(np.unique(numbers))
+        self._size += len(self._runs[-1])
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            last = self._runs.pop()
+            merged = np.concatenate((self._runs.pop(), last))
+            merged.sort(kind='stable')
+            self._runs.append(merged)
+
+class ContactStream:
+    """
+    Lazy view over the contacts that survived filtering.
+    The filtered rows live in a JSON-lines spool file, so only the
+    current contact is held in memory while the worker iterates.
+    """
+    def __init__(self, spool_path, total, columns=('name', 'phone'), start_offset=0, skip=()):
+        self.spool_path = spool_path
+        self.total = total
+        self.columns = list(columns)  # usable as template variables
+        self.stats = {}  # per-stage counts from load_and_filter
+        # Resume support: byte offset to start at, line offsets to leave out.
+        self.start_offset = start_offset
+        self.skip = set(skip)
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        """
+        Yields contact dicts. '_offset' / '_next' hold the byte offsets of
+        the contact's spool line and of the following one (used by the
+        campaign journal).
+        """
+        with open(self.spool_path, 'rb') as f:
+            f.seek(self.start_offset)
+            offset = self.start_offset
+            for line in f:
+                next_offset = offset + len(line)
+                if line.strip() and offset not in self.skip:
+                    item = json.loads(line)
+                    item['_offset'] = offset
+                    item['_next'] = next_offset
+                    yield item
+                offset = next_offset
+
+    @classmethod
+    def resume(cls, state):
+        """Rebuilds the remaining stream of an interrupted campaign (checkpoint.ResumeState)."""
+        start = state.start
+        return cls(start['spool'], start['total'] - state.done_count, start['columns'],
+                   start_offset=state.watermark, skip=state.done_ahead.keys())
 
 class CSVManager:
-    def __init__(self, worked_file="worked.csv", failed_file="failed.csv"):
+    def __init__(self, worked_file="worked.csv", failed_file="failed.csv", spool_file="queue.spool", sent_db="worked.db",
+                 durability=FLUSH, rejects_file="rejects.csv", suppressed_db="suppressed.db",
+                 results_db="results.db", max_log_bytes=20 * 1024 * 1024, log_backups=3):
         self.worked_file = worked_file
         self.failed_file = failed_file
-        self._init_file(self.worked_file)
-        self._init_file(self.failed_file)
+        self.spool_file = spool_file
+        self.rejects_file = rejects_file
+        self.durability = durability
+        self.max_log_bytes = max_log_bytes  # worked.csv / failed.csv rotate above this size
+        self.log_backups = log_backups
+        self._init_file(self.worked_file, ['name', 'phone', 'timestamp'])
+        self._init_file(self.failed_file, ResultLogger.HEADERS['failed'])
 
-    def _init_file(self, filepath):
+        self.result_logger = None
+        self._logger_lock = threading.Lock()
+
+        # Dedup index. Rows already in worked.csv (e.g. from older
+        # versions) are imported once, later starts only read new bytes.
+        self.sent_store = SentStore(sent_db)
+        self.sent_store.import_csv(self.worked_file)
+        # Opt-outs, checked here at load time and by the worker before each send.
+        self.suppression = SuppressionList(suppressed_db)
+        # Full result history and its rollups; CSV history from before it
+        # existed is imported on the first start.
+        self.result_store = ResultStore(results_db)
+        self.result_store.import_csv(self.worked_file, self.failed_file)
+
+    def _init_file(self, filepath, header):
         if not os.path.exists(filepath):
             with open(filepath, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerow(['name', 'phone', 'timestamp'])
+                writer.writerow(header)
 
-    def load_and_filter(self, input_csv_path):
+    def load_and_filter(self, input_csv_path, chunksize=DEFAULT_CHUNKSIZE, default_country_code=None, checker=None):
+        """
+        Streams the input CSV in chunks of `chunksize` rows and, per chunk:
+        normalizes phones to digits-only E.164, drops invalid rows (written
+        to the rejects file with a reason), drops numbers repeated within
+        the file, drops opted-out phones (suppression list), drops phones
+        that were already worked (one indexed join against the sent store),
+        optionally drops numbers that are not on WhatsApp (`checker`, a
+        registration.RegistrationChecker; written to the rejects file) and
+        spools the survivors to disk.
+        Returns (ContactStream, skipped_count); per-stage counts are in
+        ContactStream.stats.
+        """
         if not os.path.exists(input_csv_path):
             raise FileNotFoundError("Input CSV not found")
+        import pandas as pd
+
+        # Results still queued from a previous run must reach the store first.
+        self.close()
+        if default_country_code:
+            # History in national format must match the input normalized with the code.
+            self.sent_store.add_country_code_aliases(default_country_code)
+        started = time.perf_counter()
+
+        stats = {'rows': 0, 'invalid': 0, 'duplicates': 0, 'suppressed': 0, 'already_worked': 0,
+                 'unregistered': 0, 'queued': 0}
+        columns = ['name', 'phone']
+        seen = PhoneSet()  # every phone queued so far, packed
+        tmp_path = self.spool_file + ".tmp"
+        rejects_header = True
 
         try:
-            df_input = pd.read_csv(input_csv_path, dtype=str)
-            df_input.columns = [c.lower().strip() for c in df_input.columns]
+            reader = pd.read_csv(input_csv_path, dtype=str, chunksize=chunksize, keep_default_na=False)
+            with open(tmp_path, 'w', encoding='utf-8') as spool, \
+                    open(self.rejects_file, 'w', newline='', encoding='utf-8') as rejects:
+                for chunk in reader:
+                    chunk.columns = [c.lower().strip() for c in chunk.columns]
+                    chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+                    columns = ['name', 'phone'] + [c for c in chunk.columns if c not in ('name', 'phone')]
+                    raw_phones = self._column(chunk, 'phone')
+                    names = self._column(chunk, 'name')
+                    stats['rows'] += len(chunk)
+
+                    # 1. Normalize, reject invalid numbers
+                    phones, reasons = normalize_phones(raw_phones, default_country_code)
+                    invalid = reasons != ''
+                    if invalid.any():
+                        stats['invalid'] += int(invalid.sum())
+                        pd.DataFrame({
+                            'name': names[invalid], 'phone': raw_phones[invalid], 'reason': reasons[invalid]
+                        }).to_csv(rejects, header=rejects_header, index=False)
+                        rejects_header = False
+
+                    # 2. Drop repeats inside the file (first occurrence wins)
+                    valid = ~invalid
+                    numbers = phones[valid].astype('int64')
+                    duplicate = numbers.duplicated() | seen.contains(numbers.to_numpy())
+                    duplicate = valid & duplicate.reindex(phones.index, fill_value=False)
+                    stats['duplicates'] += int(duplicate.sum())
+                    mask = valid & ~duplicate
+                    seen.add(numbers[~duplicate[valid]].to_numpy())
+
+                    # 3. Drop opt-outs
+                    suppressed = pd.Series(self.suppression.contains_many(numbers.to_numpy()), index=numbers.index)
+                    suppressed = mask & suppressed.reindex(phones.index, fill_value=False)
+                    stats['suppressed'] += int(suppressed.sum())
+                    mask &= ~suppressed
+
+                    # 4. Drop already worked
+                    already_sent = self.sent_store.filter_sent(phones[mask].unique())
+                    worked = mask & phones.isin(already_sent)
+                    stats['already_worked'] += int(worked.sum())
+                    mask &= ~worked
+
+                    # 5. Drop numbers that are not on WhatsApp (pre-check)
+                    if checker is not None and mask.any():
+                        unregistered = mask & phones.isin(checker.unregistered(phones[mask]))
+                        if unregistered.any():
+                            stats['unregistered'] += int(unregistered.sum())
+                            pd.DataFrame({
+                                'name': names[unregistered], 'phone': raw_phones[unregistered],
+                                'reason': 'not on WhatsApp'
+                            }).to_csv(rejects, header=rejects_header, index=False)
+                            rejects_header = False
+                            mask &= ~unregistered
+
+                    kept = int(mask.sum())
+                    if not kept:
+                        continue
+
+                    # Every input column is kept so templates can use it.
+                    out = chunk[mask].assign(name=names[mask], phone=phones[mask])[columns]
+                    lines = out.to_json(orient='records', lines=True, force_ascii=False)
+                    spool.write(lines if lines.endswith('\n') else lines + '\n')
+                    stats['queued'] += kept
         except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             raise Exception(f"Error reading input CSV: {e}")
 
-        worked_phones = set()
-        if os.path.exists(self.worked_file):
-            try:
-                df_worked = pd.read_csv(self.worked_file, dtype=str)
-                if 'phone' in df_worked.columns:
-                    worked_phones = set(df_worked['phone'].unique())
-            except Exception:
-                pass 
-
-        queue = []
-        skipped_count = 0
-        
-        for _, row in df_input.iterrows():
-            phone = str(row.get('phone', '')).strip()
-            if phone in worked_phones:
-                skipped_count += 1
-                continue
-            
-            queue.append({
-                'name': row.get('name', ''),
-                'phone': phone
-            })
-
-        return queue, skipped_count
-
-    def log_worked(self, data):
-        with open(self.worked_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                data.get('name'), 
-                data.get('phone'), 
-                pd.Timestamp.now()
-            ])
-
-    def log_failed(self, data, reason):
-        with open(self.failed_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                data.get('name'), 
-                data.get('phone'), 
-                reason,
-                pd.Timestamp.now()
-            ])
\ No newline at end of file
+        os.replace(tmp_path, self.spool_file)
+        METRICS.record(METRICS.load_seconds, "observe", time.perf_counter() - started, phase="load_csv")
+        for stage in ('invalid', 'duplicates', 'suppressed', 'already_worked', 'unregistered', 'queued'):
+            METRICS.record(METRICS.contacts, "inc", stats[stage], stage=stage)
+        stream = ContactStream(self.spool_file, stats['queued'], columns)
+        stream.stats = stats
+        return stream, stats['already_worked']
+
+    @staticmethod
+    def _column(chunk, name):
+        if name in chunk.columns:
+            return chunk[name]
+        import pandas as pd
+        return pd.Series('', index=chunk.index, dtype=str)
+
+    def export_worked_csv(self, csv_path):
+        """Exports every sent phone in the classic worked.csv layout."""
+        self.close()
+        self.sent_store.export_csv(csv_path)
+
+    def _results(self):
+        # Started lazily so every run gets a fresh writer after close().
+        with self._logger_lock:
+            if self.result_logger is None:
+                self.result_logger = ResultLogger(
+                    self.worked_file, self.failed_file,
+                    sent_store=self.sent_store, durability=self.durability, result_store=self.result_store,
+                    max_bytes=self.max_log_bytes, backups=self.log_backups
+                )
+                self.result_logger.start()
+            return self.result_logger
+
+    def log_worked(self, data, template=None):
+        """`template`: number of the template the message was rendered from, for the statistics."""
+        self._results().log_worked(data.get('name'), data.get('phone'), str(datetime.now()), template)
+
+    def log_failed(self, data, reason, template=None):
+        # The other input columns go along, so Retry Failed can render templates that use them.
+        fields = {key: value for key, value in data.items()
+                  if key not in ('name', 'phone') and not key.startswith('_')}
+        self._results().log_failed(data.get('name'), data.get('phone'), reason, str(datetime.now()), template,
+                                   json.dumps(fields, ensure_ascii=False) if fields else '')
+
+    def close(self):
+        """Flushes pending results to disk. Safe to call more than once."""
+        with self._logger_lock:
+            logger, self.result_logger = self.result_logger, None
+        if logger is not None:
+            logger.close()
\ No newline at end of file
@@ -0,0 +1,151 @@
+import threading
+from node_client import NodeClient
+from worker import AutomationWorker
+
+class SharedQueue:
+    """
+    Thread-safe iterator over one contact stream, shared by several
+    workers. Each contact is handed to exactly one worker, so faster
+    accounts simply take more of the queue.
+    """
+    def __init__(self, contacts):
+        self._contacts = iter(contacts)
+        self._total = len(contacts)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._total
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            return next(self._contacts)
+
+def parse_accounts(text, delay_min, delay_max):
+    """
+    Parses the "Accounts" setting: comma separated bridge session names,
+    each with an optional delay range, e.g. "sales1, sales2:5-10".
+    Returns a list of {'session', 'delay_min', 'delay_max'} dicts.
+    """
+    accounts = []
+    for part in (text or "").split(','):
+        part = part.strip()
+        if not part:
+            continue
+        session, _, delays = part.partition(':')
+        account = {'session': session.strip(), 'delay_min': delay_min, 'delay_max': delay_max}
+        if delays:
+            low, _, high = delays.partition('-')
+            account['delay_min'] = float(low)
+            account['delay_max'] = float(high or low)
+            if account['delay_min'] <= 0 or account['delay_min'] > account['delay_max']:
+                raise ValueError(f"Invalid delay range for account '{account['session']}'")
+        accounts.append(account)
+    return accounts
+
+class MultiAccountDispatcher(threading.Thread):
+    """
+    Runs one AutomationWorker per linked account (bridge session) over a
+    shared queue. Dedup and result logging go through the single shared
+    CSVManager; each account keeps its own delay range.
+    Exposes the same start/paused/stop surface as AutomationWorker.
+    """
+    def __init__(self, queue, templates, scheduler, config, callbacks, accounts, base_url="http://localhost:3000"):
+        super().__init__()
+        self.queue = SharedQueue(queue)
+        self.templates = templates
+        self.scheduler = scheduler
+        self.config = config
+        self.callbacks = callbacks
+        self.accounts = accounts
+        self.base_url = base_url
+
+        self.csv_manager = None
+        self.journal = None
+        self.retry_queue = None  # shared by all accounts
+        self.suppression = None
+        self.template_index = 0  # starting rotation for every account (RESUME)
+        self.workers = []
+        self.completed = False
+        self._paused = False
+        self._stopped = False
+        self._progress_lock = threading.Lock()
+
+    @property
+    def paused(self):
+        return self._paused
+
+    @paused.setter
+    def paused(self, value):
+        self._paused = value
+        for worker in self.workers:
+            worker.paused = value
+
+    def run(self):
+        total = len(self.queue)
+        self.log(f"Dispatcher started. Queue size: {total}, accounts: {len(self.accounts)}")
+
+        for account in self.accounts:
+            config = dict(self.config)
+            config.update(account)
+            # The completion notice is sent once, by the dispatcher.
+            config.pop('done_number', None)
+
+            name = account['session']
+            callbacks = {
+                'on_log': lambda msg, name=name: self.log(f"[{name}] {msg}"),
+                'on_progress': lambda _: self._report_progress(total),
+                'on_finish': lambda: None
+            }
+            worker = AutomationWorker(self.queue, self.templates, self.scheduler, config, callbacks,
+                                      client=NodeClient(self.base_url, session=name))
+            worker.csv_manager = self.csv_manager
+            worker.close_results_on_exit = False
+            worker.journal = self.journal
+            worker.close_journal_on_exit = False
+            worker.retry_queue = self.retry_queue
+            worker.suppression = self.suppression
+            worker.template_index = self.template_index
+            worker.paused = self._paused
+            worker.running = not self._stopped
+            self.workers.append(worker)
+
+        for worker in self.workers:
+            worker.start()
+        try:
+            for worker in self.workers:
+                worker.join()
+        finally:
+            if self.csv_manager:
+                self.csv_manager.close()
+            self.completed = all(worker.completed for worker in self.workers)
+            if self.journal:
+                if self.completed:
+                    self.journal.end()
+                else:
+                    self.journal.close()
+
+        self.log("All accounts finished.")
+
+        done_num = self.config.get('done_number')
+        if done_num and self.workers:
+            self.workers[0].client.send_message(done_num, "Automation Batch Completed Successfully.")
+
+        self.callbacks['on_finish']()
+
+    def _report_progress(self, total):
+        with self._progress_lock:
+            done = sum(worker.current for worker in self.workers)
+        if total:
+            self.callbacks['on_progress'](done / total)
+
+    def log(self, msg):
+        if self.callbacks['on_log']:
+            self.callbacks['on_log'](msg)
+
+    def stop(self):
+        self._stopped = True
+        for worker in self.workers:
+            worker.stop()
\ No newline at end of file
@@ -1,16 +1,29 @@
 import customtkinter as ctk
 import json
 import os
+import threading
 from tkinter import filedialog, messagebox
 
 from scheduler import Scheduler
-from csv_manager import CSVManager
+from csv_manager import CSVManager, ContactStream
+from checkpoint import CampaignJournal
+from retry_queue import RetryQueue
 from worker import AutomationWorker
+from dispatcher import MultiAccountDispatcher, parse_accounts
+from templates import compile_templates, TemplateError
+from ui_events import UIEventBus, history_logger
+from metrics import METRICS, exporter_from_env
+from node_client import NodeClient, MAX_BATCH_SIZE
+from suppression import InboundWatcher, parse_keywords
+from registration import RegistrationCache, RegistrationChecker
+from result_store import format_report
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
 DAYS_OF_WEEK = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+UI_FRAME_MS = 100        # how often worker events are applied to the widgets
+MAX_LOG_LINES = 1000     # lines kept in the log view, full history goes to lwas.log
 
 class App(ctk.CTk):
     def __init__(self):
@@ -25,17 +38,34 @@ class App(ctk.CTk):
         # Data Structures
         self.scheduler = Scheduler()
         self.csv_manager = CSVManager()
+        self.journal = CampaignJournal()
+        self.retry_queue = RetryQueue()
+        self.registration_cache = RegistrationCache()
         self.worker = None
+        self._stopping = None  # a stopped worker still finishing its current send
+        self._loading = False  # a CSV is being loaded (and pre-checked) in the background
+        self.events = UIEventBus()
+        self.history = history_logger()
+        self.metrics_exporter = exporter_from_env()  # opt-in, see README "Metrics"
+        self._run_id = 0
         self.schedule_data = {day: [] for day in DAYS_OF_WEEK} 
 
         self._create_sidebar()
         self._create_tabs()
         self._load_state()
 
+        # Collects STOP replies from the bridge into the suppression list.
+        self.inbound_watcher = InboundWatcher(self.csv_manager.suppression, NodeClient(max_retries=0),
+                                              on_log=self.events.log)
+        self.inbound_watcher.start()
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self._pump_job = self.after(UI_FRAME_MS, self._pump_events)
+
     def _create_sidebar(self):
         self.sidebar = ctk.CTkFrame(self, width=140, corner_radius=0)
         self.sidebar.grid(row=0, column=0, rowspan=4, sticky="nsew")
-        self.sidebar.grid_rowconfigure(4, weight=1)
+        self.sidebar.grid_rowconfigure(6, weight=1)
 
         ctk.CTkLabel(self.sidebar, text="L-WAS v2.1", font=ctk.CTkFont(size=20, weight="bold")).grid(row=0, column=0, padx=20, pady=(20, 10))
         
@@ -45,6 +75,15 @@ class App(ctk.CTk):
         self.lbl_status = ctk.CTkLabel(self.sidebar, text="Status: IDLE", text_color="gray")
         self.lbl_status.grid(row=2, column=0, padx=20, pady=10)
 
+        self.btn_export = ctk.CTkButton(self.sidebar, text="Export Sent CSV", command=self.export_sent_dialog)
+        self.btn_export.grid(row=3, column=0, padx=20, pady=10)
+
+        self.btn_resume_campaign = ctk.CTkButton(self.sidebar, text="Resume Campaign", command=self.resume_worker)
+        self.btn_resume_campaign.grid(row=4, column=0, padx=20, pady=10)
+
+        self.btn_retry_failed = ctk.CTkButton(self.sidebar, text="Retry Failed", command=self.retry_failed)
+        self.btn_retry_failed.grid(row=5, column=0, padx=20, pady=10)
+
     def _create_tabs(self):
         self.tabview = ctk.CTkTabview(self)
         self.tabview.grid(row=0, column=1, padx=20, pady=20, sticky="nsew")
@@ -52,10 +91,12 @@ class App(ctk.CTk):
         self.tab_run = self.tabview.add("Run Dashboard")
         self.tab_config = self.tabview.add("Schedule Manager")
         self.tab_templates = self.tabview.add("Templates")
+        self.tab_stats = self.tabview.add("Statistics")
 
         self._setup_run_tab()
         self._setup_config_tab()
         self._setup_templates_tab()
+        self._setup_stats_tab()
 
     def _setup_run_tab(self):
         # Controls
@@ -104,11 +145,50 @@ class App(ctk.CTk):
         self.entry_delay_max.pack(side="left", padx=5)
         self.entry_delay_max.insert(0, "7") # Default 7 seconds
 
+        # Messages per bridge request (1 = one request per message)
+        ctk.CTkLabel(f_g_in, text="Batch:").pack(side="left", padx=5)
+        self.entry_batch_size = ctk.CTkEntry(f_g_in, width=50)
+        self.entry_batch_size.pack(side="left", padx=5)
+        self.entry_batch_size.insert(0, "1")
+
         # Done Number
         ctk.CTkLabel(f_g_in, text="Done Number:").pack(side="left", padx=5)
         self.entry_done_num = ctk.CTkEntry(f_g_in, width=120)
         self.entry_done_num.pack(side="left", padx=5)
 
+        # Prepended to national numbers (e.g. 0600... -> 34600...)
+        ctk.CTkLabel(f_g_in, text="Country Code:").pack(side="left", padx=5)
+        self.entry_country_code = ctk.CTkEntry(f_g_in, width=50)
+        self.entry_country_code.pack(side="left", padx=5)
+
+        # Multi-account: bridge session names, optionally with their own delay range
+        f_g_acc = ctk.CTkFrame(frame_global, fg_color="transparent")
+        f_g_acc.pack(pady=5)
+        ctk.CTkLabel(f_g_acc, text="Accounts:").pack(side="left", padx=5)
+        self.entry_accounts = ctk.CTkEntry(f_g_acc, width=320, placeholder_text="empty = single session, e.g. sales1, sales2:5-10")
+        self.entry_accounts.pack(side="left", padx=5)
+
+        # Rate caps per account (empty = no cap)
+        f_g_caps = ctk.CTkFrame(frame_global, fg_color="transparent")
+        f_g_caps.pack(pady=5)
+        self.entry_caps = {}
+        for key, label in (('max_per_minute', "Max/min:"), ('max_per_hour', "Max/hour:"), ('max_per_day', "Max/day:")):
+            ctk.CTkLabel(f_g_caps, text=label).pack(side="left", padx=5)
+            entry = ctk.CTkEntry(f_g_caps, width=60)
+            entry.pack(side="left", padx=5)
+            self.entry_caps[key] = entry
+
+        # Replies that add the sender to the suppression list
+        f_g_optout = ctk.CTkFrame(frame_global, fg_color="transparent")
+        f_g_optout.pack(pady=5)
+        ctk.CTkLabel(f_g_optout, text="Opt-out keywords:").pack(side="left", padx=5)
+        self.entry_optout = ctk.CTkEntry(f_g_optout, width=320, placeholder_text="empty = stop, unsubscribe, cancel, الغاء, ...")
+        self.entry_optout.pack(side="left", padx=5)
+
+        # Drop numbers that are not on WhatsApp before sending (asks the bridge, results cached)
+        self.var_precheck = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(f_g_optout, text="Pre-check numbers on WhatsApp", variable=self.var_precheck).pack(side="left", padx=10)
+
         # --- Schedule Creator (Multi-Session) ---
         frame_sched = ctk.CTkFrame(self.tab_config)
         frame_sched.pack(pady=10, fill="both", expand=True, padx=10)
@@ -141,19 +221,66 @@ class App(ctk.CTk):
         ctk.CTkButton(self.tab_config, text="Save All Settings", command=self._save_state, fg_color="green").pack(pady=10)
 
     def _setup_templates_tab(self):
-        self.txt_template1 = self._create_template_area("Template 1")
-        self.txt_template2 = self._create_template_area("Template 2")
-        self.txt_template3 = self._create_template_area("Template 3")
+        # Attachment path per template ('' = text only)
+        self.template_media = ["", "", ""]
+        self.lbl_media = []
+        self.txt_template1 = self._create_template_area("Template 1", 0)
+        self.txt_template2 = self._create_template_area("Template 2", 1)
+        self.txt_template3 = self._create_template_area("Template 3", 2)
         
-        ctk.CTkLabel(self.tab_templates, text="Variables: {name} - Messages will rotate through templates").pack(pady=10)
+        ctk.CTkLabel(self.tab_templates, text="Variables: {name} or any column of the input CSV (e.g. {city}) - Messages will rotate through templates. An attachment is sent with every message of its template, the text as caption.").pack(pady=10)
         ctk.CTkButton(self.tab_templates, text="Save Templates", command=self._save_state).pack(pady=10)
 
-    def _create_template_area(self, label):
-        ctk.CTkLabel(self.tab_templates, text=label).pack(pady=2)
+    def _create_template_area(self, label, index):
+        row = ctk.CTkFrame(self.tab_templates, fg_color="transparent")
+        row.pack(pady=2, fill="x", padx=20)
+        ctk.CTkLabel(row, text=label).pack(side="left")
+        ctk.CTkButton(row, text="X", width=30, fg_color="red",
+                      command=lambda: self._set_template_media(index, "")).pack(side="right", padx=5)
+        ctk.CTkButton(row, text="Attach File", width=100,
+                      command=lambda: self._choose_template_media(index)).pack(side="right", padx=5)
+        lbl_media = ctk.CTkLabel(row, text="No attachment", text_color="gray")
+        lbl_media.pack(side="right", padx=10)
+        self.lbl_media.append(lbl_media)
+
         box = ctk.CTkTextbox(self.tab_templates, height=80)
         box.pack(pady=5, fill="x", padx=20)
         return box
 
+    def _choose_template_media(self, index):
+        path = filedialog.askopenfilename(filetypes=[
+            ("Images and documents", "*.jpg *.jpeg *.png *.gif *.webp *.pdf *.mp4 *.docx *.xlsx"),
+            ("All Files", "*.*")
+        ])
+        if path:
+            self._set_template_media(index, path)
+
+    def _set_template_media(self, index, path):
+        self.template_media[index] = path
+        self.lbl_media[index].configure(text=os.path.basename(path) if path else "No attachment")
+
+    def _setup_stats_tab(self):
+        frame = ctk.CTkFrame(self.tab_stats, fg_color="transparent")
+        frame.pack(pady=10, fill="x", padx=10)
+        self.combo_stats_days = ctk.CTkComboBox(frame, values=["All time", "Last 7 days", "Last 30 days"], width=130,
+                                                command=lambda _: self.refresh_stats())
+        self.combo_stats_days.pack(side="left", padx=5)
+        self.combo_stats_days.set("All time")
+        ctk.CTkButton(frame, text="Refresh", width=100, command=self.refresh_stats).pack(side="left", padx=5)
+
+        self.stats_box = ctk.CTkTextbox(self.tab_stats, font=("Courier New", 12))
+        self.stats_box.pack(pady=10, fill="both", expand=True, padx=10)
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        # Read from the rollups in results.db, so this is instant for any history size.
+        days = {"Last 7 days": 7, "Last 30 days": 30}.get(self.combo_stats_days.get())
+        text = format_report(self.csv_manager.result_store.stats(days=days))
+        self.stats_box.configure(state="normal")
+        self.stats_box.delete("1.0", "end")
+        self.stats_box.insert("1.0", text)
+        self.stats_box.configure(state="disabled")
+
     # --- Logic ---
 
     def add_session_ui(self):
@@ -202,8 +329,48 @@ class App(ctk.CTk):
                     btn_del.pack(side="right", padx=10)
 
     def log(self, message):
-        self.log_box.insert("end", f"{message}\n")
-        self.log_box.see("end")
+        # Safe from any thread; shown on the next UI frame.
+        self.events.log(message)
+
+    def _pump_events(self):
+        try:
+            self._handle_events()
+        finally:
+            # Always reschedule: a failing callback must not freeze the UI for the rest of the session.
+            self._pump_job = self.after(UI_FRAME_MS, self._pump_events)
+
+    def _handle_events(self):
+        lines, progress, finished, calls = self.events.drain()
+
+        if lines:
+            for stamp, message in lines:
+                self.history.info(f"{stamp:%Y-%m-%d %H:%M:%S} {message}")
+            # One insert per frame, then trim the view to the last MAX_LOG_LINES.
+            self.log_box.insert("end", "".join(f"{message}\n" for _, message in lines[-MAX_LOG_LINES:]))
+            line_count = int(self.log_box.index("end-1c").split(".")[0])
+            if line_count > MAX_LOG_LINES:
+                self.log_box.delete("1.0", f"{line_count - MAX_LOG_LINES + 1}.0")
+            self.log_box.see("end")
+
+        if progress is not None:
+            self.progress.set(progress)
+
+        for func, args in calls:
+            self._call_safely(func, *args)
+
+        for run_id in finished:
+            # Ignore late finish events from a run that was already stopped and replaced.
+            if run_id == self._run_id:
+                self._call_safely(self.on_worker_finish)
+
+    def _call_safely(self, func, *args):
+        # One failing call (e.g. a disk error while launching a run) is
+        # logged, and the remaining events of the frame still run.
+        try:
+            func(*args)
+        except Exception as e:
+            self.history.exception(f"Error in {getattr(func, '__name__', func)}")
+            self.log(f"Error: {e}")
 
     def load_csv_dialog(self):
         path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
@@ -212,30 +379,116 @@ class App(ctk.CTk):
             self.lbl_file_info.configure(text=f"Selected: {os.path.basename(path)}")
             self.log(f"CSV Loaded: {path}")
 
+    def export_sent_dialog(self):
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv")])
+        if path:
+            try:
+                self.csv_manager.export_worked_csv(path)
+                self.log(f"Exported sent contacts to {path}")
+            except Exception as e:
+                self.log(f"Error exporting sent contacts: {e}")
+
     def start_worker(self):
         if not hasattr(self, 'csv_path'):
             self.log("Error: No CSV loaded.")
             return
+        if self._busy():
+            return
 
         self._save_state()
-        
+
+        checker = None
+        if self.var_precheck.get():
+            checker = RegistrationChecker(NodeClient(), self.registration_cache, on_log=self.events.log)
+            self.log("Pre-checking numbers on WhatsApp...")
+        country_code = self.entry_country_code.get().strip() or None
+
+        # Loading runs in the background: a pre-check of a large list takes a while.
+        self._loading = True
+        for button in (self.btn_start, self.btn_resume_campaign, self.btn_retry_failed):
+            button.configure(state="disabled")
+        self.lbl_status.configure(text="Status: LOADING", text_color="orange")
+        threading.Thread(target=self._load_queue, args=(self.csv_path, country_code, checker), daemon=True).start()
+
+    def _load_queue(self, path, country_code, checker):
         try:
-            queue, skipped = self.csv_manager.load_and_filter(self.csv_path)
-            self.log(f"Processing {len(queue)} contacts. Skipped {skipped} (already worked).")
-            if len(queue) == 0:
-                self.log("No new contacts to process.")
-                return
+            queue, skipped = self.csv_manager.load_and_filter(path, default_country_code=country_code, checker=checker)
         except Exception as e:
-            self.log(f"Error loading CSV: {e}")
+            self.events.call(self._on_queue_loaded, path, None, 0, checker, e)
+            return
+        self.events.call(self._on_queue_loaded, path, queue, skipped, checker, None)
+
+    def _on_queue_loaded(self, path, queue, skipped, checker, error):
+        self._loading = False
+        self.on_worker_finish()
+        if error is not None:
+            self.log(f"Error loading CSV: {error}")
+            return
+
+        stats = queue.stats
+        self.log(f"Processing {len(queue)} contacts. Skipped {skipped} (already worked), "
+                 f"{stats['duplicates']} duplicates, {stats['invalid']} invalid, {stats['suppressed']} opted out.")
+        if checker is not None:
+            self.log(f"Pre-check: {stats['unregistered']} not on WhatsApp (pruned, listed in "
+                     f"{self.csv_manager.rejects_file}), {checker.checked} checked, {checker.cached} from cache, "
+                     f"{checker.unknown} unchecked.")
+        if stats['invalid']:
+            self.log(f"Invalid numbers written to {self.csv_manager.rejects_file}")
+        self.lbl_file_info.configure(
+            text=f"{os.path.basename(path)}: {stats['rows']} rows, {len(queue)} queued, "
+                 f"{skipped} already worked, {stats['duplicates']} duplicates, {stats['invalid']} invalid, "
+                 f"{stats['suppressed']} opted out, {stats['unregistered']} not on WhatsApp"
+        )
+        if len(queue) == 0:
+            self.log("No new contacts to process.")
+            return
+
+        self._launch(queue.columns, queue=queue, input_path=path)
+
+    def resume_worker(self):
+        """Continues an interrupted campaign from its journal, without reloading the CSV."""
+        if self._busy():
+            return
+        try:
+            state = CampaignJournal.load(self.journal.path)
+        except ValueError as e:
+            self.log(f"Cannot resume: {e}")
+            return
+        if state is None:
+            self.log("No interrupted campaign to resume.")
+            return
+
+        self._save_state()
+        self.log(f"Resuming {os.path.basename(state.start['input'])}: "
+                 f"{state.done_count} of {state.start['total']} done, {state.remaining} left.")
+        self._launch(state.start['columns'], resume=state)
+
+    def retry_failed(self):
+        """Re-sends the transient failures in failed.csv (bridge down or not ready) plus any scheduled retries."""
+        if self._busy():
+            return
+        self.csv_manager.close()
+        queued, permanent = self.retry_queue.import_failed_csv(self.csv_manager.failed_file, self.csv_manager.sent_store)
+        self.log(f"Retry: {queued} new transient failure(s) from {self.csv_manager.failed_file}, "
+                 f"{permanent} permanent (not retried).")
+        if not len(self.retry_queue):
+            self.log("Nothing to retry.")
             return
+        self._save_state()
+        self._launch(self.retry_queue.columns(), queue=[])
 
+    def _launch(self, columns, queue=None, resume=None, input_path=None):
         self.scheduler.update_config(self.schedule_data)
         
-        templates = [
-            self.txt_template1.get("1.0", "end-1c"),
-            self.txt_template2.get("1.0", "end-1c"),
-            self.txt_template3.get("1.0", "end-1c")
-        ]
+        try:
+            templates = compile_templates([
+                self.txt_template1.get("1.0", "end-1c"),
+                self.txt_template2.get("1.0", "end-1c"),
+                self.txt_template3.get("1.0", "end-1c")
+            ], columns, self.template_media)
+        except TemplateError as e:
+            messagebox.showerror("Error", f"Invalid template: {e}")
+            return
         
         # Validate Delay Range
         try:
@@ -249,23 +502,80 @@ class App(ctk.CTk):
             messagebox.showerror("Error", f"Invalid delay range: {e}")
             return
 
+        try:
+            batch_size = int(self.entry_batch_size.get() or 1)
+            if not 1 <= batch_size <= MAX_BATCH_SIZE:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", f"Batch size must be a whole number from 1 to {MAX_BATCH_SIZE}")
+            return
+
+        caps = {}
+        try:
+            for key, entry in self.entry_caps.items():
+                value = entry.get().strip()
+                if value:
+                    caps[key] = int(value)
+                    if caps[key] < 1:
+                        raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Rate caps must be whole numbers >= 1 (or empty)")
+            return
+
+        try:
+            accounts = parse_accounts(self.entry_accounts.get(), delay_min, delay_max)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid accounts setting: {e}")
+            return
+
         config = {
             'delay_min': delay_min,
             'delay_max': delay_max,
-            'done_number': self.entry_done_num.get()
+            'done_number': self.entry_done_num.get(),
+            'batch_size': batch_size
         }
+        config.update(caps)
 
+        self._run_id += 1
+        run_id = self._run_id
         callbacks = {
-            'on_log': self.log,
-            'on_progress': self.progress.set,
-            'on_finish': self.on_worker_finish
+            'on_log': self.events.log,
+            'on_progress': self.events.progress,
+            'on_finish': lambda: self.events.finish(run_id)
         }
 
-        self.worker = AutomationWorker(queue, templates, self.scheduler, config, callbacks)
+        template_index = 0
+        if resume is not None:
+            unconfirmed = self.journal.attach(resume)
+            for record in unconfirmed:
+                self.csv_manager.log_failed(
+                    {'name': record.get('name'), 'phone': record.get('p')},
+                    "Unconfirmed: in flight when the app stopped, check for a duplicate before resending"
+                )
+            if unconfirmed:
+                self.log(f"{len(unconfirmed)} message(s) were in flight when the app stopped. "
+                         f"They are not resent and are listed in failed.csv as 'Unconfirmed'.")
+            queue = ContactStream.resume(resume)
+            template_index = resume.template_index
+        elif len(queue):
+            # The file the queue came from, even if another was picked meanwhile.
+            self.journal.begin(input_path, queue)
+
+        if accounts:
+            self.worker = MultiAccountDispatcher(queue, templates, self.scheduler, config, callbacks, accounts)
+        else:
+            self.worker = AutomationWorker(queue, templates, self.scheduler, config, callbacks)
         self.worker.csv_manager = self.csv_manager
+        # Retry-only runs (empty queue) are not journaled.
+        self.worker.journal = self.journal if resume is not None or len(queue) else None
+        self.worker.retry_queue = self.retry_queue
+        self.worker.suppression = self.csv_manager.suppression
+        self.worker.template_index = template_index
         self.worker.start()
         
         self.btn_start.configure(state="disabled")
+        self.btn_resume_campaign.configure(state="disabled")
+        self.btn_retry_failed.configure(state="disabled")
         self.btn_pause.configure(state="normal")
         self.btn_stop.configure(state="normal")
         self.lbl_status.configure(text="Status: RUNNING", text_color="green")
@@ -280,32 +590,78 @@ class App(ctk.CTk):
                 self.btn_pause.configure(text="PAUSE", fg_color="orange")
                 self.lbl_status.configure(text="Status: RUNNING", text_color="green")
 
+    def _busy(self):
+        return self.worker or self._loading or self._stopping
+
     def stop_worker(self):
-        if self.worker:
-            self.worker.stop()
-            self.worker = None
+        if not self.worker:
+            self.on_worker_finish()
+            return
+        self.worker.stop()
+        # The worker still shares the journal, result logs and retry queue
+        # until its current send returns, so a new run waits for it.
+        self._stopping, self.worker = self.worker, None
+        self._run_id += 1  # its finish event is handled by _wait_for_stop
+        self.btn_pause.configure(state="disabled")
+        self.btn_stop.configure(state="disabled")
+        self.lbl_status.configure(text="Status: STOPPING", text_color="orange")
+        self.log("Stopping: waiting for the current send to finish...")
+        self._wait_for_stop()
+
+    def _wait_for_stop(self):
+        if self._stopping.is_alive():
+            self.after(200, self._wait_for_stop)
+            return
+        self._stopping = None
         self.on_worker_finish()
         self.log("Worker Stopped by user.")
 
     def on_worker_finish(self):
         self.btn_start.configure(state="normal")
+        self.btn_resume_campaign.configure(state="normal")
+        self.btn_retry_failed.configure(state="normal")
         self.btn_pause.configure(state="disabled")
         self.btn_stop.configure(state="disabled")
         self.lbl_status.configure(text="Status: IDLE", text_color="gray")
         self.progress.set(0)
+        self.refresh_stats()
+
+    def on_close(self):
+        # Let the worker wind down so the result logger flushes to disk.
+        for worker in (self.worker, self._stopping):
+            if worker:
+                worker.stop()
+                worker.join(timeout=15)
+        self.inbound_watcher.stop()
+        self.csv_manager.close()
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        METRICS.stop_trace()
+        self.after_cancel(self._pump_job)
+        self.destroy()
 
     def _save_state(self):
         state = {
             'delay_min': self.entry_delay_min.get(),
             'delay_max': self.entry_delay_max.get(),
+            'batch_size': self.entry_batch_size.get(),
+            'accounts': self.entry_accounts.get(),
+            'country_code': self.entry_country_code.get(),
+            'caps': {key: entry.get() for key, entry in self.entry_caps.items()},
             'done_num': self.entry_done_num.get(),
+            'optout_keywords': self.entry_optout.get(),
+            'precheck_numbers': self.var_precheck.get(),
             'tmpl_1': self.txt_template1.get("1.0", "end-1c"),
             'tmpl_2': self.txt_template2.get("1.0", "end-1c"),
             'tmpl_3': self.txt_template3.get("1.0", "end-1c"),
+            'media_1': self.template_media[0],
+            'media_2': self.template_media[1],
+            'media_3': self.template_media[2],
             'schedule': self.schedule_data
         }
         with open('state.json', 'w') as f:
             json.dump(state, f)
+        self.csv_manager.suppression.keywords = parse_keywords(state['optout_keywords'])
 
     def _load_state(self):
         if os.path.exists('state.json'):
@@ -318,12 +674,25 @@ class App(ctk.CTk):
                     delay_max = state.get('delay_max', '7')
                     self.entry_delay_min.delete(0, "end"); self.entry_delay_min.insert(0, delay_min)
                     self.entry_delay_max.delete(0, "end"); self.entry_delay_max.insert(0, delay_max)
+                    self.entry_batch_size.delete(0, "end"); self.entry_batch_size.insert(0, state.get('batch_size', '1'))
                     
                     self.entry_done_num.delete(0, "end"); self.entry_done_num.insert(0, state.get('done_num', ''))
+                    self.entry_country_code.delete(0, "end"); self.entry_country_code.insert(0, state.get('country_code', ''))
+                    if state.get('accounts'):
+                        self.entry_accounts.delete(0, "end"); self.entry_accounts.insert(0, state['accounts'])
+                    if state.get('optout_keywords'):
+                        self.entry_optout.delete(0, "end"); self.entry_optout.insert(0, state['optout_keywords'])
+                    self.csv_manager.suppression.keywords = parse_keywords(state.get('optout_keywords'))
+                    self.var_precheck.set(bool(state.get('precheck_numbers', False)))
+                    for key, value in state.get('caps', {}).items():
+                        if key in self.entry_caps:
+                            self.entry_caps[key].delete(0, "end"); self.entry_caps[key].insert(0, value)
                     
                     self.txt_template1.delete("1.0", "end"); self.txt_template1.insert("1.0", state.get('tmpl_1', ''))
                     self.txt_template2.delete("1.0", "end"); self.txt_template2.insert("1.0", state.get('tmpl_2', ''))
                     self.txt_template3.delete("1.0", "end"); self.txt_template3.insert("1.0", state.get('tmpl_3', ''))
+                    for index in range(3):
+                        self._set_template_media(index, state.get(f'media_{index + 1}', ''))
 
                     saved_sched = state.get('schedule', {})
                     for day in DAYS_OF_WEEK:
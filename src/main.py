@@ -1,5 +1,11 @@
-from gui import App
+import sys
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Headless run: the GUI toolkit is never imported.
+        from cli import main
+        sys.exit(main())
+
+    from gui import App
     app = App()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
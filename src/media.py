@@ -0,0 +1,29 @@
+import hashlib
+import mimetypes
+import os
+
+class MediaFile:
+    """
+    An attachment (image, PDF, ...) identified by the sha256 of its
+    content. The file is hashed once when the templates are compiled;
+    sends only carry the hash, and the bytes are uploaded to the bridge's
+    media cache once (again only if the bridge evicted them).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        digest = hashlib.sha256()
+        self.size = 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+                self.size += len(chunk)
+        self.sha256 = digest.hexdigest()
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def __repr__(self):
+        return f"MediaFile({self.filename!r}, {self.size} bytes, {self.sha256[:12]})"
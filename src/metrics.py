@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Seconds; covers a fast local bridge call up to a slow batch window.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Counter:
+    """Monotonic counter, one value per label set."""
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, key, value
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+class Histogram:
+    """Cumulative-bucket histogram, one per label set."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.values = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self):
+        for key, state in self.values.items():
+            for bound, count in zip(self.buckets, state):
+                yield self.name + "_bucket", key + (("le", _number(bound)),), count
+            yield self.name + "_bucket", key + (("le", "+Inf"),), state[-1]
+            yield self.name + "_sum", key, state[-2]
+            yield self.name + "_count", key, state[-1]
+
+class Metrics:
+    """
+    Process-wide instrumentation of the send pipeline. Workers, the
+    bridge client and the CSV manager record into it; MetricsExporter
+    publishes it in Prometheus text format. Recording is a dict update
+    under one lock, cheap next to any network or disk call.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._trace = None
+        self.bridge_seconds = Histogram("lwas_bridge_request_seconds",
+                                        "Latency of each HTTP attempt to the Node bridge.")
+        self.bridge_retries = Counter("lwas_bridge_retries_total", "Bridge attempts that were retried.")
+        self.send_seconds = Histogram("lwas_send_seconds",
+                                      "Time to send one message, retries included (batch time per message).")
+        self.messages = Counter("lwas_messages_total", "Messages processed, by result and failure class.")
+        self.state_seconds = Counter("lwas_state_seconds_total",
+                                     "Worker wall-clock time per state (sending, delay, rate_limit, schedule, paused).")
+        self.flush_seconds = Histogram("lwas_result_flush_seconds",
+                                       "Time to write one batch of results to the CSV files and sent store.")
+        self.result_rows = Counter("lwas_result_rows_total", "Result rows written, by file.")
+        self.load_seconds = Histogram("lwas_load_seconds", "Time to stream, filter and spool an input CSV.")
+        self.contacts = Counter("lwas_contacts_total", "Input rows by load_and_filter outcome.")
+        self.queue_size = Gauge("lwas_queue_size", "Contacts queued for the current run.")
+        self._metrics = [self.bridge_seconds, self.bridge_retries, self.send_seconds, self.messages,
+                         self.state_seconds, self.flush_seconds, self.result_rows, self.load_seconds,
+                         self.contacts, self.queue_size]
+
+    def record(self, metric, update, value, phase=None, **labels):
+        """
+        Calls `update` ("inc", "set" or "observe") on `metric` with `value` under `labels`.
+        With a trace open, timings named by `phase` are also appended to it.
+        """
+        with self._lock:
+            getattr(metric, update)(value, **labels)
+            if phase is not None and self._trace is not None:
+                record = {'ts': time.time(), 'phase': phase, 'seconds': round(value, 6)}
+                record.update(labels)
+                self._trace.write(json.dumps(record) + "\n")
+
+    def start_trace(self, path):
+        """Starts appending every timed phase to a JSON-lines file, for profiling slow runs."""
+        with self._lock:
+            if self._trace is None:
+                self._trace = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def stop_trace(self):
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for metric in self._metrics:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+
+def failure_class(reason):
+    """Coarse class of a failure reason, used as a metric label."""
+    text = str(reason).lower()
+    if text.startswith("unconfirmed"):
+        return "unconfirmed"
+    if text.startswith("opted out"):
+        return "suppressed"
+    if text.startswith("connection error"):
+        return "connection"
+    if text.startswith("timeout"):
+        return "timeout"
+    # Before "http": a bridge error over HTTP 500 carries WhatsApp's reason.
+    if "not registered" in text or "invalid" in text or "not exist" in text:
+        return "invalid_number"
+    if text.startswith("http error"):
+        return "http"
+    if text.startswith("missing"):
+        return "bad_request"
+    if "no result" in text:
+        return "missing_result"
+    return "bridge_error"
+
+class MetricsExporter:
+    """
+    Publishes METRICS: rewrites `path` every `interval` seconds (for the
+    node_exporter textfile collector or a quick look) and/or serves
+    GET /metrics on 127.0.0.1:`port`.
+    """
+    def __init__(self, path=None, port=None, interval=10.0, metrics=METRICS):
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.metrics = metrics
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+    def start(self):
+        if self.port:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    data = metrics.render().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", int(self.port)), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+        if self.path:
+            self._thread = threading.Thread(target=self._write_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(f"# Written {datetime.now().isoformat(timespec='seconds')}\n")
+            f.write(self.metrics.render())
+        os.replace(tmp, self.path)
+
+    def stop(self):
+        """Stops the endpoint and writes the file one last time."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+def exporter_from_env():
+    """
+    Exporter configured by LWAS_METRICS_FILE / LWAS_METRICS_PORT, plus a
+    phase trace when LWAS_TRACE_FILE is set. Returns None if none is set.
+    """
+    if os.environ.get("LWAS_TRACE_FILE"):
+        METRICS.start_trace(os.environ["LWAS_TRACE_FILE"])
+    path = os.environ.get("LWAS_METRICS_FILE") or None
+    port = os.environ.get("LWAS_METRICS_PORT") or None
+    if not path and not port:
+        return None
+    return MetricsExporter(path=path, port=port).start()
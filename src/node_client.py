@@ -1,28 +1,443 @@
-import requests
 import logging
+import random
+import time
+from metrics import METRICS
+
+# Messages a session's job queue holds (the bridge's MAX_QUEUED_JOBS
+# default); a larger window would always be answered with 429.
+MAX_BATCH_SIZE = 500
 
 class NodeClient:
-    def __init__(self, base_url="http://localhost:3000"):
+    """
+    HTTP client for the Node.js bridge.
+    Keeps one pooled keep-alive session and retries transient failures
+    (connection refused, timeouts, 5xx) with exponential backoff + jitter.
+    POSTs that send or queue messages only retry failures that happen
+    before the bridge tried to send (connection refused, 503 not ready):
+    after a timeout or a 500 WhatsApp may already have the message.
+    Timings of the last call are kept in `last_attempts`.
+    send_jobs() uses the bridge's async job queue (202 + status polling)
+    and falls back to the blocking routes on bridges without it.
+    Attachments (media.MediaFile) are uploaded once with ensure_media();
+    sends carry only their hash, and re-upload it if the bridge no
+    longer has it (HTTP 409).
+    """
+    def __init__(self, base_url="http://localhost:3000", session=None, connect_timeout=3.05, read_timeout=15,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0, jitter=0.5, pool_size=4):
         self.base_url = base_url
+        self.session_name = session
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+
+        # Imported here so modules using NodeClient load fast (headless start).
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # One dict per attempt of the last call: {'latency': s, 'status': code or None, 'error': str or None}
+        self.last_attempts = []
+        self.jobs_supported = True  # cleared when the bridge has no /jobs route
 
-    def send_message(self, phone, message):
+    @property
+    def last_latency(self):
+        """Latency in seconds of the final attempt of the last call."""
+        return self.last_attempts[-1]['latency'] if self.last_attempts else None
+
+    def send_message(self, phone, message, media=None):
         """
         Sends a POST request to the local Node.js server.
         Note: index.js adds '@c.us', so we send the raw number.
+        With `media` (a MediaFile) the message is its caption.
         """
-        url = f"{self.base_url}/send-message"
+        url = self._url("/send-message")
         payload = {
             "number": str(phone),
             "message": message
         }
-        
+        if media is not None:
+            payload["media"] = media.sha256
+        return self._post_media(url, payload, [media] if media is not None else [])
+
+    def send_batch(self, items, delay_min=0, delay_max=0):
+        """
+        Sends a window of messages through POST /send-batch in one request.
+        items: list of {'id', 'number', 'message', optional 'media'}. The
+        bridge queues them and waits a random delay_min..delay_max seconds
+        between sends. Returns a list of (id, success, response) tuples.
+        """
+        url = self._url("/send-batch")
+        payload = {
+            "items": [self._item_payload(item) for item in items],
+            "delayMin": delay_min,
+            "delayMax": delay_max
+        }
+        # The whole window is sent before the bridge answers.
+        read_timeout = self.read_timeout + len(items) * (self.read_timeout + delay_max)
+
+        # A timed out batch may be half sent, so only retry failures that
+        # happen before anything reached WhatsApp.
+        success, body = self._post_media(url, payload, self._item_media(items), read_timeout=read_timeout)
+        if not success:
+            return [(item['id'], False, body) for item in items]
+
+        results = []
+        for entry in body.get('results', []):
+            if entry.get('ok'):
+                results.append((entry.get('id'), True, entry))
+            else:
+                results.append((entry.get('id'), False, entry.get('error', 'Unknown bridge error')))
+        return results
+
+    def submit_jobs(self, items, delay_min=0, delay_max=0):
+        """
+        Queues messages on the bridge through POST /jobs, which answers
+        right away. items: list of {'id', 'number', 'message', optional 'media'}.
+        Returns (accepted, error, retry_after): accepted maps item id to
+        job id; on a full bridge queue (HTTP 429) retry_after is the
+        number of seconds to wait before trying again.
+        """
+        payload = {
+            "items": [self._item_payload(item) for item in items],
+            "delayMin": delay_min,
+            "delayMax": delay_max
+        }
+        # A timed out request may still have queued the jobs, so like the
+        # sends, only retry failures that happen before the bridge got it.
+        success, body = self._post_media(self._url("/jobs"), payload, self._item_media(items))
+        if success:
+            accepted = {job['id']: job['jobId'] for job in body.get('jobs', [])}
+            return accepted, None if accepted else "Bridge accepted no jobs", None
+        last = self.last_attempts[-1] if self.last_attempts else {}
+        if last.get('status') == 429:
+            return {}, body, last.get('retry_after') or 5.0
+        if last.get('status') == 404:
+            self.jobs_supported = False
+        return {}, body, None
+
+    def poll_jobs(self, job_ids, wait=20):
+        """
+        State of queued jobs through GET /jobs. With `wait`, the bridge holds
+        the answer until one of them finishes (up to `wait` seconds).
+        Returns (True, {job_id: {'state', 'error', 'msgId'}}) or (False, error).
+        States: queued, sending, sent, failed, cancelled, unknown (expired
+        or never seen).
+        """
+        params = {"ids": ",".join(job_ids), "wait": wait}
+        success, body = self._request("GET", f"{self.base_url}/jobs", params=params,
+                                      read_timeout=self.read_timeout + wait)
+        if not success:
+            return False, body
+        return True, {job['jobId']: job for job in body.get('jobs', [])}
+
+    def cancel_jobs(self, job_ids):
+        """
+        Cancels queued jobs through DELETE /jobs, for a stopped run. Jobs
+        already sending or finished are not affected. Returns
+        (True, {job_id: {'state', ...}}) or (False, error).
+        """
+        success, body = self._request("DELETE", f"{self.base_url}/jobs", params={"ids": ",".join(job_ids)})
+        if not success:
+            return False, body
+        return True, {job['jobId']: job for job in body.get('jobs', [])}
+
+    def check_numbers(self, numbers):
+        """
+        Asks the bridge which numbers are on WhatsApp (POST /check-numbers).
+        Returns (True, {number: True/False/None}), None when WhatsApp gave
+        no answer for that number, or (False, error).
+        """
+        # Checks send nothing, so every failure is safe to retry.
+        success, body = self._post(self._url("/check-numbers"), {"numbers": [str(n) for n in numbers]},
+                                   read_timeout=self.read_timeout + len(numbers),
+                                   retry_on=("connection", "timeout", "5xx", "unavailable"))
+        if not success:
+            return False, body
+        return True, {str(result.get('number')): result.get('exists') for result in body.get('results', [])}
+
+    def media_status(self, media):
+        """
+        Asks the bridge whether it has `media` (a MediaFile) in its cache,
+        through GET /media/<sha256>. Returns (True, cached) or (False, error).
+        """
+        success, body = self._request("GET", f"{self.base_url}/media/{media.sha256}")
+        if not success:
+            if self.last_attempts and self.last_attempts[-1]['status'] == 404:
+                return False, "The bridge has no media support, update node_server/index.js"
+            return False, body
+        return True, bool(body.get('cached'))
+
+    def upload_media(self, media):
+        """
+        Uploads the bytes of `media` to the bridge's media cache
+        (PUT /media/<sha256>). Returns (True, body) or (False, error).
+        """
+        # Raw bytes, not base64 in JSON: a third smaller and no encoding on either side.
+        # The upload is idempotent (keyed by hash), so every failure is safe to retry.
+        return self._request("PUT", f"{self.base_url}/media/{media.sha256}", data=media.read(),
+                             params={"filename": media.filename}, headers={"Content-Type": media.mimetype},
+                             read_timeout=self.read_timeout + media.size / (1024 * 1024))
+
+    def ensure_media(self, media):
+        """
+        Makes sure the bridge has every MediaFile in `media`, uploading the
+        missing ones. The cache is shared by all sessions of a bridge.
+        Returns (True, None) or (False, error).
+        """
+        for entry in {m.sha256: m for m in media}.values():
+            success, cached = self.media_status(entry)
+            if not success:
+                return False, cached
+            if not cached:
+                success, body = self.upload_media(entry)
+                if not success:
+                    return False, body
+                logging.info("Uploaded attachment %s (%d bytes) to the bridge", entry.filename, entry.size)
+        return True, None
+
+    def fetch_inbound(self, after=0, boot=None, limit=500):
+        """
+        Messages received by the bridge (all sessions) after sequence
+        number `after`, through GET /inbound. `boot` is the bridge's bootId
+        the number belongs to; after a bridge restart it no longer matches
+        and the bridge answers from the start of its buffer.
+        Returns (True, {'bootId', 'last', 'messages': [{'seq', 'session',
+        'from', 'body', 'timestamp'}]}) or (False, error).
+        """
+        params = {"after": after, "limit": limit}
+        if boot:
+            params["boot"] = boot
+        return self._request("GET", f"{self.base_url}/inbound", params=params, retry_on=())
+
+    def send_jobs(self, items, delay_min=0, delay_max=0, on_result=None, confirm_timeout=600, poll_wait=20,
+                  send_seconds=None, stopped=None):
+        """
+        Sends a window of messages through the async job queue and waits
+        for the final state of each, so a slow WhatsApp page can no longer
+        turn a sent message into a timeout failure. `on_result(id, success,
+        response)` is called as each outcome arrives. The window may take
+        len(items) * (delay_max + send_seconds) seconds (send_seconds
+        defaults to the read timeout); messages without an outcome
+        `confirm_timeout` seconds past that come back with success None
+        (unconfirmed: they may still go out).
+        `stopped()` is checked between polls: once it is true the jobs
+        still queued on the bridge are cancelled and left out of the
+        results (they were not sent), and only the one being sent is
+        waited for.
+        Returns a list of (id, success, response) tuples, like send_batch.
+        """
+        if not self.jobs_supported:
+            return self._send_blocking(items, delay_min, delay_max, on_result)
+
+        if send_seconds is None:
+            send_seconds = self.read_timeout
+        confirm_timeout += len(items) * (delay_max + send_seconds)
+        deadline = time.monotonic() + confirm_timeout
+        while True:
+            accepted, error, retry_after = self.submit_jobs(items, delay_min, delay_max)
+            if accepted or retry_after is None or time.monotonic() + retry_after > deadline:
+                break
+            if stopped and stopped():
+                return []
+            logging.info("Bridge queue full, retrying in %.0fs", retry_after)
+            time.sleep(retry_after)
+
+        if not accepted:
+            if not self.jobs_supported:
+                return self._send_blocking(items, delay_min, delay_max, on_result)
+            results = [(item['id'], False, error) for item in items]
+            if on_result:
+                for result in results:
+                    on_result(*result)
+            return results
+
+        results = []
+
+        def report(outcome):
+            results.append(outcome)
+            if on_result:
+                on_result(*outcome)
+
+        pending = {job_id: item_id for item_id, job_id in accepted.items()}
+        for item in items:
+            if item['id'] not in accepted:
+                report((item['id'], False, "Not accepted by bridge"))
+        stopping = cancel_failed = False
+        while pending and time.monotonic() < deadline:
+            if not stopping and stopped and stopped():
+                stopping = True
+                if not self._cancel_pending(pending):
+                    cancel_failed = True
+                    break
+                if not pending:
+                    break
+            wait = max(1, min(poll_wait, int(deadline - time.monotonic())))
+            success, states = self.poll_jobs(list(pending), wait)
+            if not success:
+                # Bridge unreachable: the jobs may still run, keep asking until the deadline.
+                time.sleep(min(5.0, max(0.0, deadline - time.monotonic())))
+                continue
+            for job_id, job in states.items():
+                item_id = pending.get(job_id)
+                if item_id is None:
+                    continue
+                if job['state'] == 'sent':
+                    outcome = (item_id, True, job)
+                elif job['state'] == 'failed':
+                    outcome = (item_id, False, job.get('error') or "Unknown bridge error")
+                elif job['state'] == 'unknown':
+                    outcome = (item_id, None, "Unconfirmed: the bridge lost track of the job (restarted?)")
+                else:
+                    continue
+                del pending[job_id]
+                report(outcome)
+
+        for job_id, item_id in pending.items():
+            if cancel_failed:
+                report((item_id, None, "Unconfirmed: the run stopped and the bridge could not be asked"))
+            else:
+                report((item_id, None, f"Unconfirmed: no outcome after {confirm_timeout:.0f}s"))
+        return results
+
+    def _cancel_pending(self, pending):
+        # Drops the jobs the bridge cancelled from `pending` (job id -> item id).
+        success, states = self.cancel_jobs(list(pending))
+        if not success:
+            logging.warning("Could not cancel queued jobs: %s", states)
+            return False
+        for job_id, job in states.items():
+            if job.get('state') == 'cancelled':
+                pending.pop(job_id, None)
+        return True
+
+    def _send_blocking(self, items, delay_min, delay_max, on_result):
+        # Bridges without /jobs: one blocking request, like before.
+        if len(items) == 1:
+            success, response = self.send_message(items[0]['number'], items[0]['message'], items[0].get('media'))
+            results = [(items[0]['id'], success, response)]
+        else:
+            results = self.send_batch(items, delay_min, delay_max)
+        if on_result:
+            for result in results:
+                on_result(*result)
+        return results
+
+    def _url(self, path):
+        # Named sessions live under /sessions/<name>, the default one at the root.
+        if self.session_name:
+            return f"{self.base_url}/sessions/{self.session_name}{path}"
+        return f"{self.base_url}{path}"
+
+    @staticmethod
+    def _item_payload(item):
+        payload = {"id": item['id'], "number": str(item['number']), "message": item['message']}
+        if item.get('media') is not None:
+            payload["media"] = item['media'].sha256
+        return payload
+
+    @staticmethod
+    def _item_media(items):
+        return [item['media'] for item in items if item.get('media') is not None]
+
+    def _post(self, url, payload, read_timeout=None, retry_on=("connection", "unavailable")):
+        return self._request("POST", url, payload=payload, read_timeout=read_timeout, retry_on=retry_on)
+
+    def _post_media(self, url, payload, media, **kwargs):
+        success, body = self._post(url, payload, **kwargs)
+        if success or not media or not self.last_attempts or self.last_attempts[-1]['status'] != 409:
+            return success, body
+        # 409: the bridge no longer has an attachment (evicted, or restarted).
+        # Nothing was sent, so upload it again and resend once.
+        attempts = self.last_attempts
+        uploaded, error = self.ensure_media(media)
+        if not uploaded:
+            self.last_attempts = attempts
+            return False, f"Attachment upload failed: {error}"
+        return self._post(url, payload, **kwargs)
+
+    def _request(self, method, url, payload=None, params=None, read_timeout=None,
+                 retry_on=("connection", "timeout", "5xx", "unavailable"), data=None, headers=None):
+        import requests
+
+        attempts = []
+        self.last_attempts = attempts
+        timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+        endpoint = url.rsplit("/", 1)[-1]
+        account = self.session_name or "default"
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self._backoff(attempt - 1))
+
+            started = time.perf_counter()
+            status = None
+            response = None
+            try:
+                response = self.session.request(method, url, json=payload, data=data, headers=headers, params=params,
+                                                timeout=timeout)
+                status = response.status_code
+                response.raise_for_status()
+                body = response.json()
+                latency = time.perf_counter() - started
+                attempts.append({'latency': latency, 'status': status, 'error': None})
+                METRICS.record(METRICS.bridge_seconds, "observe", latency, phase="bridge_request",
+                               method=method, endpoint=endpoint, account=account, outcome="ok")
+                return True, body
+            except requests.exceptions.ConnectionError:
+                error = "Connection Error: Node.js server is not reachable."
+                kind = "connection"
+            except requests.exceptions.Timeout:
+                error = "Timeout: Node.js server took too long."
+                kind = "timeout"
+            except requests.exceptions.RequestException as e:
+                detail = self._error_detail(response)
+                error = f"HTTP Error: {status} {detail}" if detail else f"HTTP Error: {str(e)}"
+                # 4xx means the request itself is bad, retrying won't help.
+                # 503: the bridge's WhatsApp client is not ready, nothing was sent.
+                if status == 503:
+                    kind = "unavailable"
+                else:
+                    kind = "5xx" if status is not None and status >= 500 else None
+
+            latency = time.perf_counter() - started
+            attempt_info = {'latency': latency, 'status': status, 'error': error}
+            if status == 429:
+                try:
+                    attempt_info['retry_after'] = float(response.headers.get('Retry-After', 5))
+                except ValueError:
+                    attempt_info['retry_after'] = 5.0
+            attempts.append(attempt_info)
+            METRICS.record(METRICS.bridge_seconds, "observe", latency, phase="bridge_request",
+                           method=method, endpoint=endpoint, account=account, outcome=kind or "http")
+            if kind not in retry_on:
+                break
+            METRICS.record(METRICS.bridge_retries, "inc", 1, endpoint=endpoint, account=account)
+            logging.warning("Bridge attempt %d/%d failed: %s", attempt + 1, self.max_retries + 1, error)
+
+        return False, error
+
+    @staticmethod
+    def _error_detail(response):
+        # The bridge explains failures in its JSON body: {message, error}.
+        if response is None:
+            return None
         try:
-            response = requests.post(url, json=payload, timeout=15)
-            response.raise_for_status()
-            return True, response.json()
-        except requests.exceptions.ConnectionError:
-            return False, "Connection Error: Node.js server is not reachable."
-        except requests.exceptions.Timeout:
-            return False, "Timeout: Node.js server took too long."
-        except requests.exceptions.RequestException as e:
-            return False, f"HTTP Error: {str(e)}"
\ No newline at end of file
+            body = response.json()
+        except ValueError:
+            return None
+        if not isinstance(body, dict):
+            return None
+        parts = [str(body[key]) for key in ('message', 'error') if body.get(key) and not isinstance(body[key], dict)]
+        return ": ".join(parts) or None
+
+    def _backoff(self, retry):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** retry))
+        return delay + random.uniform(0, delay * self.jitter)
\ No newline at end of file
@@ -0,0 +1,114 @@
+import random
+import time
+from clock import SYSTEM_CLOCK
+
+class TokenBucket:
+    """
+    Allows `capacity` sends per `period` seconds, refilled continuously.
+    """
+    def __init__(self, capacity, period, name="", now=None):
+        self.capacity = float(capacity)
+        self.period = float(period)
+        self.name = name
+        self.rate = self.capacity / self.period
+        self.tokens = self.capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_available(self, count=1, now=None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        count = min(count, self.capacity)
+        # Tolerance for float remainders, which would otherwise ask for ever shorter waits.
+        if self.tokens >= count - 1e-9:
+            return 0.0
+        return (count - self.tokens) / self.rate
+
+    def consume(self, count=1, now=None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= count
+
+class RateController:
+    """
+    Paces one account: a random delay_min..delay_max pause after every
+    message (the natural-looking jitter), plus optional token-bucket caps
+    per minute, hour and day. Also keeps the time spent sending versus
+    waiting, per wait reason. `clock` and `rng` are injectable, so a
+    simulated run is reproducible.
+    """
+    WAIT_KINDS = ("delay", "rate_limit", "schedule", "retry", "paused")
+
+    def __init__(self, delay_min=3.0, delay_max=7.0, per_minute=None, per_hour=None, per_day=None,
+                 clock=None, rng=None):
+        self.clock = clock or SYSTEM_CLOCK
+        self.random = rng or random
+        self.delay_min = max(0.0, float(delay_min))
+        self.delay_max = max(self.delay_min, float(delay_max))
+
+        self.buckets = []
+        for limit, period, name in ((per_minute, 60, "minute"), (per_hour, 3600, "hour"), (per_day, 86400, "day")):
+            if limit:
+                self.buckets.append(TokenBucket(limit, period, name, now=self.clock.monotonic()))
+
+        self.send_seconds = 0.0
+        self.sends = 0
+        self.wait_seconds = {kind: 0.0 for kind in self.WAIT_KINDS}
+
+    @classmethod
+    def from_config(cls, config, clock=None, rng=None):
+        """Builds a controller from the worker config dict."""
+        def number(key, default=None):
+            try:
+                value = config.get(key)
+                return float(value) if value not in (None, "") else default
+            except (ValueError, TypeError):
+                return default
+
+        return cls(
+            delay_min=number('delay_min', 3.0),
+            delay_max=number('delay_max', 7.0),
+            per_minute=number('max_per_minute'),
+            per_hour=number('max_per_hour'),
+            per_day=number('max_per_day'),
+            clock=clock,
+            rng=rng,
+        )
+
+    def next_delay(self):
+        """Random pause to take after a message."""
+        return self.random.uniform(self.delay_min, self.delay_max)
+
+    def time_until_allowed(self, count=1):
+        """
+        Seconds until `count` more messages fit under every cap.
+        Returns (seconds, name of the limiting cap or None).
+        """
+        now = self.clock.monotonic()
+        wait, limiter = 0.0, None
+        for bucket in self.buckets:
+            needed = bucket.time_until_available(count, now)
+            if needed > wait:
+                wait, limiter = needed, bucket.name
+        return wait, limiter
+
+    def consume(self, count=1):
+        now = self.clock.monotonic()
+        for bucket in self.buckets:
+            bucket.consume(count, now)
+
+    def record_send(self, seconds, count=1):
+        self.send_seconds += seconds
+        self.sends += count
+
+    def record_wait(self, kind, seconds):
+        self.wait_seconds[kind] = self.wait_seconds.get(kind, 0.0) + seconds
+
+    def summary(self):
+        waited = sum(self.wait_seconds.values())
+        parts = ", ".join(f"{kind} {seconds:.0f}s" for kind, seconds in self.wait_seconds.items() if seconds)
+        return (f"{self.sends} sent in {self.send_seconds:.0f}s of sending, "
+                f"{waited:.0f}s waiting" + (f" ({parts})" if parts else ""))
\ No newline at end of file
@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+import time
+
+DAY = 86400
+
+class RegistrationCache:
+    """
+    Results of WhatsApp registration checks, kept in SQLite so a number is
+    asked about once per TTL, not once per campaign. Numbers found on
+    WhatsApp are trusted for `ttl_days`, numbers that were not for
+    `negative_ttl_days` (people join later). evict() drops expired rows
+    and caps the table at `max_entries`, oldest checks first.
+    """
+    def __init__(self, db_path="registration.db", ttl_days=30, negative_ttl_days=7, max_entries=2000000):
+        self.db_path = db_path
+        self.ttl = ttl_days * DAY
+        self.negative_ttl = negative_ttl_days * DAY
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checked ("
+            "phone INTEGER PRIMARY KEY, registered INTEGER NOT NULL, checked_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS checked_at ON checked (checked_at)")
+        self._conn.commit()
+
+    def lookup_many(self, phones, now=None):
+        """
+        Returns {phone: registered} for the `phones` (digit strings) with a
+        result that has not expired yet. The batch is joined against the
+        primary key through a temp table, like SentStore.filter_sent.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (phone INTEGER PRIMARY KEY)")
+            self._conn.execute("DELETE FROM lookup")
+            self._conn.executemany("INSERT OR IGNORE INTO lookup (phone) VALUES (?)", ((int(p),) for p in phones))
+            rows = self._conn.execute(
+                "SELECT phone, registered FROM lookup JOIN checked USING (phone) "
+                "WHERE checked_at >= CASE registered WHEN 1 THEN ? ELSE ? END",
+                (now - self.ttl, now - self.negative_ttl)
+            ).fetchall()
+            self._conn.execute("DELETE FROM lookup")
+        return {str(phone): bool(registered) for phone, registered in rows}
+
+    def store_many(self, results, now=None):
+        """results: {phone: registered (bool)}."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO checked (phone, registered, checked_at) VALUES (?, ?, ?)",
+                ((int(phone), int(bool(registered)), now) for phone, registered in results.items())
+            )
+            self._conn.commit()
+
+    def evict(self, now=None):
+        """Deletes expired results, then the oldest ones above max_entries. Returns the number deleted."""
+        now = time.time() if now is None else now
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("DELETE FROM checked WHERE checked_at < CASE registered WHEN 1 THEN ? ELSE ? END",
+                               (now - self.ttl, now - self.negative_ttl))
+            excess = self._conn.execute("SELECT COUNT(*) FROM checked").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM checked WHERE phone IN (SELECT phone FROM checked ORDER BY checked_at LIMIT ?)",
+                    (excess,)
+                )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM checked").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class RegistrationChecker:
+    """
+    Pre-flight stage of load_and_filter: finds the numbers that are not
+    on WhatsApp, from the cache first and from the bridge
+    (POST /check-numbers, `batch_size` numbers per request) for the rest.
+    If the bridge can't answer, checking stops for the rest of the load
+    and unchecked numbers are kept; a failed pre-check never drops a
+    contact.
+    """
+    def __init__(self, client, cache, batch_size=100, on_log=None):
+        self.client = client
+        self.cache = cache
+        self.batch_size = batch_size
+        self.on_log = on_log
+        self.available = True
+        self.cached = 0    # numbers answered from the cache
+        self.checked = 0   # numbers asked to the bridge
+        self.unknown = 0   # numbers kept without an answer
+
+    def unregistered(self, phones):
+        """Returns the subset of `phones` (digit strings) that is not on WhatsApp."""
+        phones = list(dict.fromkeys(phones))
+        known = self.cache.lookup_many(phones)
+        self.cached += len(known)
+        missing = [phone for phone in phones if phone not in known]
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            success, results = self.client.check_numbers(batch) if self.available else (False, None)
+            if not success:
+                if self.available:
+                    self.available = False
+                    self.log(f"Pre-check stopped, numbers are kept unchecked: {results}")
+                self.unknown += len(missing) - start
+                break
+            answered = {phone: registered for phone, registered in results.items() if registered is not None}
+            self.cache.store_many(answered)
+            known.update(answered)
+            self.checked += len(batch)
+            self.unknown += len(batch) - len(answered)
+            self.log(f"Pre-check: {self.checked} numbers checked on WhatsApp, {self.cached} from cache...")
+
+        if missing:
+            self.cache.evict()
+        return {phone for phone, registered in known.items() if not registered}
+
+    def log(self, message):
+        if self.on_log:
+            self.on_log(message)
@@ -0,0 +1,166 @@
+import csv
+import os
+import queue
+import threading
+import time
+from metrics import METRICS
+
+# Durability policies
+FLUSH = "flush"          # hand rows to the OS after every batch
+FSYNC = "fsync"          # flush, and fsync every `fsync_every` rows
+ON_SHUTDOWN = "shutdown" # keep rows in the file buffer until close()
+
+_STOP = object()
+
+class ResultLogger(threading.Thread):
+    """
+    Background writer for worked/failed results.
+    The send thread only enqueues rows; this thread keeps both CSV files
+    open and writes them in batches, once `batch_size` rows are pending or
+    `flush_interval` seconds have passed. Worked rows are also forwarded to
+    the sent store, and all rows to the result store, in the same batches.
+    A CSV that grows past `max_bytes` is rotated like a RotatingFileHandler
+    log (worked.csv -> worked.csv.1 ..., `backups` kept); its rows stay in
+    the result store.
+    """
+    # `fields`: the contact's other input columns as JSON, for Retry Failed.
+    HEADERS = {'worked': ['name', 'phone', 'timestamp'], 'failed': ['name', 'phone', 'reason', 'timestamp', 'fields']}
+
+    def __init__(self, worked_file, failed_file, sent_store=None, durability=FLUSH,
+                 batch_size=200, flush_interval=1.0, fsync_every=100, result_store=None,
+                 max_bytes=None, backups=3):
+        super().__init__(daemon=True)
+        if durability not in (FLUSH, FSYNC, ON_SHUTDOWN):
+            raise ValueError(f"Unknown durability policy: {durability}")
+
+        self.worked_file = worked_file
+        self.failed_file = failed_file
+        self.sent_store = sent_store
+        self.result_store = result_store
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_every = fsync_every
+
+        self._queue = queue.Queue()
+        self._files = {}
+        self._writers = {}
+        self._sent_rows = []
+        self._result_rows = []
+        self._pending = 0
+        self._unsynced = 0
+
+    def log_worked(self, name, phone, timestamp, template=None):
+        self._queue.put(('worked', [name, phone, timestamp], template))
+
+    def log_failed(self, name, phone, reason, timestamp, template=None, fields=''):
+        self._queue.put(('failed', [name, phone, reason, timestamp, fields], template))
+
+    def close(self):
+        """Writes out everything still queued and closes the files."""
+        if self.is_alive():
+            self._queue.put(_STOP)
+            self.join()
+
+    def run(self):
+        for kind in self.HEADERS:
+            self._open(kind)
+
+        last_flush = time.monotonic()
+        try:
+            while True:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                # Drain whatever else is already waiting without blocking.
+                while item is not None and item is not _STOP:
+                    self._write(item)
+                    if self._pending >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+
+                if item is _STOP:
+                    break
+                if self._pending and (self._pending >= self.batch_size
+                                      or time.monotonic() - last_flush >= self.flush_interval):
+                    self._flush()
+                    last_flush = time.monotonic()
+        finally:
+            self._flush(final=True)
+            for f in self._files.values():
+                f.close()
+
+    def _path(self, kind):
+        return self.worked_file if kind == 'worked' else self.failed_file
+
+    def _open(self, kind):
+        path = self._path(kind)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        f = open(path, 'a', newline='', encoding='utf-8', buffering=1 << 16)
+        self._files[kind] = f
+        self._writers[kind] = csv.writer(f)
+        if new:
+            self._writers[kind].writerow(self.HEADERS[kind])
+
+    def _rotate(self, kind):
+        self._files[kind].close()
+        path = self._path(kind)
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{index}"):
+                os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+        if self.backups:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+        self._open(kind)
+
+    def _write(self, item):
+        kind, row, template = item
+        self._writers[kind].writerow(row)
+        if kind == 'worked':
+            self._sent_rows.append((row[0], row[1], row[2]))
+            self._result_rows.append((True, row[0], row[1], None, template, row[2]))
+        else:
+            self._result_rows.append((False, row[0], row[1], row[2], template, row[3]))
+        self._pending += 1
+        METRICS.record(METRICS.result_rows, "inc", 1, file=kind)
+
+    def _flush(self, final=False):
+        started = time.perf_counter()
+        try:
+            self._flush_files(final)
+        finally:
+            METRICS.record(METRICS.flush_seconds, "observe", time.perf_counter() - started,
+                           phase="result_flush", durability=self.durability)
+
+    def _flush_files(self, final):
+        if self.sent_store is not None and self._sent_rows:
+            self.sent_store.add_many(self._sent_rows)
+        self._sent_rows = []
+        if self.result_store is not None and self._result_rows:
+            self.result_store.add_many(self._result_rows)
+        self._result_rows = []
+
+        self._unsynced += self._pending
+        self._pending = 0
+
+        if self.durability == ON_SHUTDOWN and not final:
+            return
+        for f in self._files.values():
+            f.flush()
+        if final or (self.durability == FSYNC and self._unsynced >= self.fsync_every):
+            for f in self._files.values():
+                os.fsync(f.fileno())
+            self._unsynced = 0
+        if self.max_bytes:
+            for kind, f in list(self._files.items()):
+                if f.tell() >= self.max_bytes:
+                    self._rotate(kind)
\ No newline at end of file
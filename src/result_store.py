@@ -0,0 +1,174 @@
+import csv
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from metrics import failure_class
+
+class ResultStore:
+    """
+    Every send result, compacted into SQLite (results.db): one row per
+    result with the phone as an integer, the time as epoch seconds and
+    the reason as an id into a dictionary of distinct reasons. Rollups
+    per day, template and failure class (`daily`) and per reason (the
+    dictionary's counts) are updated in the same transaction as the rows,
+    so statistics are small lookups however long the history is.
+    worked.csv / failed.csv can then rotate without losing anything.
+    """
+    def __init__(self, db_path="results.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "  ts REAL NOT NULL, phone INTEGER, name TEXT, sent INTEGER NOT NULL,"
+            "  template INTEGER NOT NULL, reason INTEGER);"
+            "CREATE INDEX IF NOT EXISTS results_ts ON results (ts);"
+            "CREATE TABLE IF NOT EXISTS reasons ("
+            "  id INTEGER PRIMARY KEY, text TEXT UNIQUE NOT NULL, class TEXT NOT NULL, count INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS daily ("
+            "  day TEXT NOT NULL, template INTEGER NOT NULL, class TEXT NOT NULL,"
+            "  sent INTEGER NOT NULL, failed INTEGER NOT NULL, PRIMARY KEY (day, template, class)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+        )
+        self._conn.commit()
+        self._reason_ids = dict(self._conn.execute("SELECT text, id FROM reasons"))
+
+    def add_many(self, rows):
+        """
+        rows: iterable of (sent, name, phone, reason, template, timestamp),
+        `timestamp` a datetime or its str(), `template` the template
+        number (0 = unknown), `reason` None for sent messages.
+        """
+        results = []
+        rollup = {}  # (day, template, class) -> [sent, failed]
+        reason_counts = Counter()
+        for sent, name, phone, reason, template, timestamp in rows:
+            if not isinstance(timestamp, datetime):
+                timestamp = datetime.fromisoformat(str(timestamp))
+            day = timestamp.strftime("%Y-%m-%d")
+            template = int(template or 0)
+            phone = str(phone or "")
+            number = int(phone) if phone.isdigit() else None
+            if sent:
+                rollup.setdefault((day, template, ""), [0, 0])[0] += 1
+                results.append((timestamp.timestamp(), number, name, 1, template, None))
+            else:
+                reason = str(reason or "")
+                rollup.setdefault((day, template, failure_class(reason)), [0, 0])[1] += 1
+                reason_counts[reason] += 1
+                results.append((timestamp.timestamp(), number, name, 0, template, reason))
+
+        with self._lock:
+            with self._conn:
+                for reason, count in reason_counts.items():
+                    if reason not in self._reason_ids:
+                        cursor = self._conn.execute("INSERT INTO reasons (text, class, count) VALUES (?, ?, 0)",
+                                                    (reason, failure_class(reason)))
+                        self._reason_ids[reason] = cursor.lastrowid
+                    self._conn.execute("UPDATE reasons SET count = count + ? WHERE id = ?",
+                                       (count, self._reason_ids[reason]))
+                self._conn.executemany(
+                    "INSERT INTO results (ts, phone, name, sent, template, reason) VALUES (?, ?, ?, ?, ?, ?)",
+                    [row[:5] + (self._reason_ids.get(row[5]),) for row in results]
+                )
+                self._conn.executemany(
+                    "INSERT INTO daily (day, template, class, sent, failed) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (day, template, class) DO UPDATE "
+                    "SET sent = sent + excluded.sent, failed = failed + excluded.failed",
+                    [key + tuple(counts) for key, counts in rollup.items()]
+                )
+
+    def import_csv(self, worked_file, failed_file, batch_size=10000):
+        """
+        One-time import of the history in worked.csv / failed.csv files
+        written before results.db existed (the template is unknown).
+        Returns the number of rows imported.
+        """
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'csv_imported'").fetchone():
+                return 0
+        imported = 0
+        for path, sent in ((worked_file, True), (failed_file, False)):
+            if not os.path.exists(path):
+                continue
+            batch = []
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.reader(f):
+                    if len(row) < (3 if sent else 4) or row[1] == 'phone':
+                        continue
+                    try:
+                        timestamp = datetime.fromisoformat(row[2] if sent else row[3])
+                    except ValueError:
+                        continue
+                    batch.append((sent, row[0], row[1], None if sent else row[2], 0, timestamp))
+                    if len(batch) >= batch_size:
+                        self.add_many(batch)
+                        imported += len(batch)
+                        batch = []
+            if batch:
+                self.add_many(batch)
+                imported += len(batch)
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_imported', ?)",
+                                   (str(datetime.now()),))
+        return imported
+
+    def stats(self, days=None, top_reasons=10):
+        """
+        Campaign statistics from the rollups: {'sent', 'failed', 'days':
+        [(day, sent, failed)], 'templates': [(template, sent, failed)],
+        'classes': [(class, failed)], 'reasons': [(reason, class, count)]}.
+        With `days`, only the last `days` days (reasons are all-time).
+        """
+        since = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d") if days else ""
+        with self._lock:
+            query = self._conn.execute
+            sent, failed = query("SELECT COALESCE(SUM(sent), 0), COALESCE(SUM(failed), 0) FROM daily WHERE day >= ?",
+                                 (since,)).fetchone()
+            per_day = query("SELECT day, SUM(sent), SUM(failed) FROM daily WHERE day >= ? GROUP BY day ORDER BY day",
+                            (since,)).fetchall()
+            per_template = query("SELECT template, SUM(sent), SUM(failed) FROM daily WHERE day >= ? "
+                                 "GROUP BY template ORDER BY template", (since,)).fetchall()
+            per_class = query("SELECT class, SUM(failed) FROM daily WHERE day >= ? AND failed > 0 "
+                              "GROUP BY class ORDER BY 2 DESC", (since,)).fetchall()
+            reasons = query("SELECT text, class, count FROM reasons ORDER BY count DESC LIMIT ?",
+                            (top_reasons,)).fetchall()
+        return {'sent': sent, 'failed': failed, 'days': per_day, 'templates': per_template,
+                'classes': per_class, 'reasons': reasons}
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def _rate(sent, failed):
+    total = sent + failed
+    return f"{100.0 * sent / total:.1f}%" if total else "-"
+
+def format_report(stats):
+    """Text report of ResultStore.stats(), shared by the GUI and the CLI."""
+    lines = [f"Sent: {stats['sent']}   Failed: {stats['failed']}   "
+             f"Success rate: {_rate(stats['sent'], stats['failed'])}", ""]
+    lines.append(f"{'Day':<12} {'Sent':>9} {'Failed':>9} {'Success':>8}")
+    for day, sent, failed in stats['days']:
+        lines.append(f"{day:<12} {sent:>9} {failed:>9} {_rate(sent, failed):>8}")
+    lines += ["", f"{'Template':<12} {'Sent':>9} {'Failed':>9} {'Success':>8}"]
+    for template, sent, failed in stats['templates']:
+        label = f"Template {template}" if template else "(unknown)"
+        lines.append(f"{label:<12} {sent:>9} {failed:>9} {_rate(sent, failed):>8}")
+    if stats['classes']:
+        lines += ["", "Failures by class:"]
+        lines += [f"  {cls:<18} {failed:>9}" for cls, failed in stats['classes']]
+    if stats['reasons']:
+        lines += ["", "Top failure reasons (all time):"]
+        lines += [f"  {count:>9}  {text[:90]}" for text, _, count in stats['reasons']]
+    return "\n".join(lines)
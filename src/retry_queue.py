@@ -0,0 +1,213 @@
+import csv
+import heapq
+import io
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+# Failures worth another attempt: the bridge or WhatsApp Web was
+# unavailable (also while re-uploading an attachment), not the number. Everything else (invalid or blocked
+# numbers, unconfirmed sends that may already have arrived) is final. A
+# plain HTTP 500 is classified by the bridge's error text it carries.
+_TRANSIENT_PATTERNS = re.compile(
+    r"^connection error|^http error: (502|503|429)\b|not ready|queue is full|"
+    r"not connected|disconnected|econnreset|socket hang up|"
+    r"attachment upload failed: (connection error|timeout)",
+    re.IGNORECASE
+)
+
+def classify(reason):
+    """Returns TRANSIENT or PERMANENT for a failure reason from NodeClient / the bridge."""
+    text = str(reason or "").strip()
+    if text.lower().startswith(("unconfirmed", "timeout")):
+        # May have been delivered (a timed out send or job submission may
+        # still go out), resending risks a duplicate.
+        return PERMANENT
+    return TRANSIENT if _TRANSIENT_PATTERNS.search(text) else PERMANENT
+
+def _fields(text):
+    # The `fields` column of failed.csv: the contact's other input columns as JSON.
+    try:
+        fields = json.loads(text) if text else {}
+    except ValueError:
+        return {}
+    if not isinstance(fields, dict):
+        return {}
+    return {str(key): value for key, value in fields.items() if not str(key).startswith('_')}
+
+class RetryQueue:
+    """
+    Transient failures waiting for another attempt, ordered by due time
+    (a heap of (due, seq, entry)). The delay doubles per attempt from
+    `base_delay` up to `max_delay`, with up to 20% jitter; after
+    `max_attempts` sends a contact is given up. The queue is saved to a
+    JSON file, so scheduled retries survive a restart.
+    """
+    def __init__(self, path="retry.json", base_delay=60.0, max_delay=3600.0, max_attempts=5):
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # workers of several accounts share one queue
+        self._imported = {}  # abspath of an imported failed.csv -> byte offset read so far
+        self._dirty = False
+        self._saved_at = 0.0
+        self._load()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, item, reason, now=None):
+        """
+        Schedules another attempt for a failed contact. Returns the delay
+        in seconds, or None if the failure is permanent or the contact
+        ran out of attempts.
+        """
+        attempts = int(item.get('_attempts', 1))
+        if classify(reason) != TRANSIENT or attempts >= self.max_attempts:
+            return None
+
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        delay *= random.uniform(1.0, 1.2)
+        # Spool bookkeeping belongs to the original run, not to the retry.
+        entry = {k: v for k, v in item.items() if k not in ('_offset', '_next')}
+        entry['_attempts'] = attempts + 1
+        entry['_reason'] = str(reason)
+        now = time.time() if now is None else now
+        with self._lock:
+            heapq.heappush(self._heap, (now + delay, next(self._seq), entry))
+            self._dirty = True
+        return delay
+
+    def requeue(self, entries, now=None):
+        """Puts back popped contacts that were not sent after all (the run stopped), due right away."""
+        now = time.time() if now is None else now
+        with self._lock:
+            for entry in entries:
+                heapq.heappush(self._heap, (now, next(self._seq), entry))
+                self._dirty = True
+
+    def pop_due(self, limit, now=None):
+        """Removes and returns up to `limit` contacts whose retry is due."""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and len(due) < limit and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+            if due:
+                self._dirty = True
+        return due
+
+    def seconds_until_due(self, now=None):
+        """Seconds until the next retry is due (0 if one is), None if the queue is empty."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - now)
+
+    def import_failed_csv(self, path, sent_store=None):
+        """
+        Queues the transient failures of a failed.csv for an immediate
+        retry. Only rows appended since the last import are read; phones
+        that were sent meanwhile (per `sent_store`) are skipped.
+        Returns (queued, permanent) counts.
+        """
+        if not os.path.exists(path):
+            return 0, 0
+        key = os.path.abspath(path)
+        queued = permanent = 0
+        now = time.time()
+        with self._lock:
+            queued_phones = {entry.get('phone') for _, _, entry in self._heap}
+        stat = os.stat(path)
+        # [offset, inode]; plain offsets come from older retry.json files.
+        position = self._imported.get(key, 0)
+        offset, inode = position if isinstance(position, list) else (position, None)
+        segments = [(path, offset)]
+        if offset > stat.st_size or inode not in (None, stat.st_ino):
+            # The file was rotated (or replaced): finish the rotated segment first.
+            rotated = path + ".1"
+            segments = [(path, 0)]
+            if os.path.exists(rotated) and os.stat(rotated).st_ino == inode and os.path.getsize(rotated) >= offset:
+                segments.insert(0, (rotated, offset))
+
+        for segment, start in segments:
+            with open(segment, 'rb') as raw:
+                raw.seek(start)
+                reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8', newline=''))
+                if start == 0:
+                    next(reader, None)  # header
+                for row in reader:
+                    if len(row) < 3 or not row[1]:
+                        continue
+                    name, phone, reason = row[0], row[1], row[2]
+                    if classify(reason) != TRANSIENT:
+                        permanent += 1
+                        continue
+                    if phone in queued_phones or (sent_store is not None and sent_store.contains(phone)):
+                        continue
+                    queued_phones.add(phone)
+                    entry = _fields(row[4] if len(row) > 4 else '')
+                    entry.update({'name': name, 'phone': phone, '_attempts': 2, '_reason': reason})
+                    with self._lock:
+                        heapq.heappush(self._heap, (now, next(self._seq), entry))
+                    queued += 1
+        self._imported[key] = [stat.st_size, stat.st_ino]
+        self._dirty = True
+        self.save()
+        return queued, permanent
+
+    def columns(self):
+        """
+        Contact columns every queued retry has, name and phone first: the
+        variables templates may use in a run of retries only. Rows of an
+        older failed.csv have no other columns, so a template using one
+        is rejected rather than rendered with blanks.
+        """
+        with self._lock:
+            entries = [entry for _, _, entry in self._heap]
+        common = None
+        for entry in entries:
+            keys = {key for key in entry if not key.startswith('_')}
+            common = keys if common is None else common & keys
+        return ['name', 'phone'] + sorted((common or set()) - {'name', 'phone'})
+
+    def save(self, min_interval=0.0):
+        """Writes the queue to disk if it changed (at most every `min_interval` seconds)."""
+        with self._save_lock:
+            if not self._dirty or time.monotonic() - self._saved_at < min_interval:
+                return
+            with self._lock:
+                data = {
+                    'imported': self._imported,
+                    'entries': [[due, entry] for due, _, entry in sorted(self._heap)],
+                }
+                self._dirty = False
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+            self._saved_at = time.monotonic()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError:
+            return  # unreadable: start empty rather than refuse to run
+        self._imported = data.get('imported', {})
+        self._heap = [(due, next(self._seq), entry) for due, entry in data.get('entries', [])]
+        heapq.heapify(self._heap)
@@ -1,31 +1,136 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from bisect import bisect_right
 import calendar
 
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+SECONDS_PER_WEEK = MINUTES_PER_WEEK * 60
+
+def _to_minutes(hhmm):
+    hours, minutes = hhmm.strip().split(':')
+    return int(hours) * 60 + int(minutes)
+
+def _format_minute(minute_of_week):
+    minute = minute_of_week % MINUTES_PER_DAY
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
 class Scheduler:
+    """
+    Decides when sending is allowed.
+    schedule_map is compiled into a sorted, merged list of half-open
+    minute-of-week intervals, so every question is a bisect lookup.
+    A session's end minute is included (09:00-12:00 allows 12:00:59),
+    and a session whose end is before its start runs past midnight.
+    """
     def __init__(self):
         # Structure: {'Mon': [{'start': '09:00', 'end': '12:00'}, ...], 'Tue': ...}
-        self.schedule_map = {} 
+        self.schedule_map = {}
+        self._starts = []
+        self._ends = []
 
     def update_config(self, schedule_map):
         self.schedule_map = schedule_map
+        self._compile()
+
+    def _compile(self):
+        intervals = []
+        for day_index, day in enumerate(DAYS):
+            base = day_index * MINUTES_PER_DAY
+            for session in self.schedule_map.get(day) or []:
+                start = _to_minutes(session['start'])
+                end = _to_minutes(session['end']) + 1
+                if end <= start:
+                    end += MINUTES_PER_DAY  # spans midnight
+                start += base
+                end += base
+                if end > MINUTES_PER_WEEK:
+                    # Sunday night into Monday morning
+                    intervals.append((start, MINUTES_PER_WEEK))
+                    intervals.append((0, end - MINUTES_PER_WEEK))
+                else:
+                    intervals.append((start, end))
+
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+
+    @staticmethod
+    def _week_position(now):
+        """Seconds since Monday 00:00 for `now`."""
+        return (now.weekday() * MINUTES_PER_DAY + now.hour * 60 + now.minute) * 60 + now.second + now.microsecond / 1e6
 
-    def is_allowed(self):
-        now = datetime.now()
+    def _interval_at(self, position):
+        """Index of the interval containing `position` (seconds), or None."""
+        i = bisect_right(self._starts, position // 60) - 1
+        if i >= 0 and position < self._ends[i] * 60:
+            return i
+        return None
+
+    def is_allowed(self, now=None):
+        now = now or datetime.now()
         current_day = calendar.day_name[now.weekday()][:3] # Mon, Tue...
-        current_time_str = now.strftime("%H:%M")
 
-        if current_day not in self.schedule_map:
-            return False, f"No sessions configured for {current_day}"
+        i = self._interval_at(self._week_position(now))
+        if i is not None:
+            start, end = self._starts[i], self._ends[i] - 1
+            return True, f"Active (Session: {_format_minute(start)}-{_format_minute(end)})"
 
-        sessions = self.schedule_map[current_day]
-        if not sessions:
+        if not self.schedule_map.get(current_day):
             return False, f"No sessions configured for {current_day}"
 
-        for session in sessions:
-            start = session.get('start')
-            end = session.get('end')
-            
-            if start <= current_time_str <= end:
-                return True, f"Active (Session: {start}-{end})"
+        return False, f"Outside all sessions for {current_day} (Time: {now.strftime('%H:%M')})"
+
+    def seconds_until_open(self, now=None):
+        """
+        0 if sending is allowed now, otherwise seconds until the next
+        session opens. None when no sessions are configured at all.
+        """
+        if not self._starts:
+            return None
+        position = self._week_position(now or datetime.now())
+        if self._interval_at(position) is not None:
+            return 0.0
+
+        j = bisect_right(self._starts, position // 60)
+        if j < len(self._starts):
+            return self._starts[j] * 60 - position
+        return self._starts[0] * 60 + SECONDS_PER_WEEK - position
+
+    def seconds_until_close(self, now=None):
+        """
+        Seconds left in the current session, 0 if outside all sessions,
+        float('inf') if the schedule covers the whole week.
+        """
+        position = self._week_position(now or datetime.now())
+        i = self._interval_at(position)
+        if i is None:
+            return 0.0
+
+        end = self._ends[i]
+        if end == MINUTES_PER_WEEK and self._starts[0] == 0:
+            if i == 0:
+                return float('inf')
+            # Continues into Monday's first session.
+            end += self._ends[0]
+        return end * 60 - position
 
-        return False, f"Outside all sessions for {current_day} (Time: {current_time_str})"
\ No newline at end of file
+    def session_at(self, now=None):
+        """
+        (start, end) datetimes of the session `now` falls in, end
+        exclusive, or None outside all sessions.
+        """
+        now = now or datetime.now()
+        position = self._week_position(now)
+        i = self._interval_at(position)
+        if i is None:
+            return None
+        week_start = now - timedelta(seconds=position)
+        return (week_start + timedelta(minutes=self._starts[i]),
+                week_start + timedelta(minutes=self._ends[i]))
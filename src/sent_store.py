@@ -0,0 +1,151 @@
+import sqlite3
+import threading
+import csv
+import io
+import os
+import re
+
+def canonical_phone(phone):
+    """Digits only, without a leading 00, matching csv_manager.normalize_phones."""
+    digits = re.sub(r'\D', '', re.sub(r'^(\+?\d+)\.0+$', r'\1', (phone or '').strip()))
+    return digits[2:] if digits.startswith('00') else digits
+
+class SentStore:
+    """
+    Indexed on-disk record of every phone that was already messaged.
+    SQLite in WAL mode with the phone as primary key, so dedup is an
+    index lookup instead of a full read of worked.csv.
+    """
+    def __init__(self, db_path="worked.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sent ("
+            "phone TEXT PRIMARY KEY, name TEXT, timestamp TEXT) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    def add(self, name, phone, timestamp):
+        self.add_many([(name, phone, timestamp)])
+
+    def add_many(self, rows):
+        """rows: iterable of (name, phone, timestamp)."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO sent (name, phone, timestamp) VALUES (?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def contains(self, phone):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM sent WHERE phone = ?", (phone,)).fetchone()
+        return row is not None
+
+    def filter_sent(self, phones):
+        """
+        Returns the subset of `phones` that is already in the store.
+        The batch is loaded into a temp table and joined against the index.
+        """
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (phone TEXT PRIMARY KEY) WITHOUT ROWID")
+            self._conn.execute("DELETE FROM incoming")
+            self._conn.executemany("INSERT OR IGNORE INTO incoming (phone) VALUES (?)", ((p,) for p in phones))
+            rows = self._conn.execute("SELECT phone FROM incoming JOIN sent USING (phone)").fetchall()
+            self._conn.execute("DELETE FROM incoming")
+        return {r[0] for r in rows}
+
+    def add_country_code_aliases(self, country_code):
+        """
+        Also records the national-format phones of old worked.csv rows
+        (imported as they were written, e.g. 01012345678) under the
+        number the input gets with `country_code` (201012345678), by the
+        rules of csv_manager.normalize_phones. The original keys stay, so
+        numbers that were already international keep matching. Returns
+        the number of aliases added.
+        """
+        cc = str(country_code).strip().lstrip('+')
+        if not cc.isdigit():
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sent (phone, name, timestamp) "
+                "SELECT CASE WHEN substr(phone, 1, 1) = '0' THEN ? || substr(phone, 2) ELSE ? || phone END, "
+                "name, timestamp FROM sent "
+                "WHERE phone != '' AND (substr(phone, 1, 1) = '0' OR "
+                "(length(phone) <= 10 AND substr(phone, 1, ?) != ?))",
+                (cc, cc, len(cc), cc)
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sent").fetchone()[0]
+
+    def import_csv(self, csv_path, batch_size=10000):
+        """
+        Imports rows from a worked.csv style file (name, phone, timestamp).
+        Only the bytes appended since the last import are read, so calling
+        this on every start is cheap. Returns the number of rows read.
+        """
+        if not os.path.exists(csv_path):
+            return 0
+
+        key = f"imported:{os.path.abspath(csv_path)}"
+        offset = int(self._get_meta(key) or 0)
+        size = os.path.getsize(csv_path)
+        if size < offset:
+            # File was replaced or truncated, start over.
+            offset = 0
+        if size == offset:
+            return 0
+
+        imported = 0
+        fb = open(csv_path, 'rb')
+        fb.seek(offset)
+        with io.TextIOWrapper(fb, encoding='utf-8', newline='') as data:
+            batch = []
+            for row in csv.reader(data):
+                if len(row) < 2 or row[1] == 'phone':
+                    continue
+                batch.append((row[0], canonical_phone(row[1]), row[2] if len(row) > 2 else None))
+                if len(batch) >= batch_size:
+                    self.add_many(batch)
+                    imported += len(batch)
+                    batch = []
+            if batch:
+                self.add_many(batch)
+                imported += len(batch)
+
+        self._set_meta(key, str(size))
+        return imported
+
+    def export_csv(self, csv_path):
+        """Writes the store back out in the worked.csv layout."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT name, phone, timestamp FROM sent ORDER BY timestamp")
+            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['name', 'phone', 'timestamp'])
+                for row in cursor:
+                    writer.writerow(row)
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
\ No newline at end of file
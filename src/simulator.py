@@ -0,0 +1,372 @@
+"""
+Campaign simulator: runs the real Scheduler / RateController /
+AutomationWorker against a virtual clock and a simulated bridge, so a
+campaign of days finishes in seconds and nothing is sent.
+
+    python src/simulator.py --contacts 200000
+    python src/simulator.py --input contacts.csv --start "2026-10-19 08:00" --deadline "2026-10-23 18:00"
+    python src/simulator.py --contacts 50000 --latency 2.5 --fail-rate 0.02 --output forecast.json
+
+Settings (delays, caps, batch size, accounts, schedule, templates) come
+from state.json, like a headless run. Reports the projected completion
+time, messages and idle time per session, and where the time went.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from scheduler import Scheduler
+from templates import compile_templates, TemplateError
+
+class SimulationLimit(Exception):
+    """Raised in a worker whose next wait would pass the simulation horizon."""
+
+class VirtualClock:
+    """
+    Drop-in for clock.SystemClock whose time only moves when every
+    participant (worker thread) is waiting: the clock then jumps to the
+    earliest wake-up. Waits cost no real time and the result does not
+    depend on thread timing. A participant that finishes must call leave().
+    """
+    def __init__(self, start, participants=1, horizon=None):
+        self.start = start
+        self.horizon = horizon  # seconds after start, or None
+        self._epoch = start.timestamp()
+        self._now = 0.0
+        self._active = participants
+        self._wakeups = []  # heap of [seconds, seq, released]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def now(self):
+        return self.start + timedelta(seconds=self._now)
+
+    def time(self):
+        return self._epoch + self._now
+
+    def monotonic(self):
+        return self._now
+
+    def wait(self, condition, seconds):
+        # Nothing pauses or stops a simulated run from outside, so the
+        # worker's condition is not needed to wake it.
+        self.sleep(seconds)
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        with self._cond:
+            wake = self._now + seconds
+            if self.horizon is not None and wake > self.horizon:
+                # Still a participant: the caller leaves (once) when it unwinds.
+                raise SimulationLimit(f"Simulation horizon reached at {self.now():%Y-%m-%d %H:%M}")
+            entry = [wake, next(self._seq), False]
+            heapq.heappush(self._wakeups, entry)
+            self._active -= 1
+            self._advance()
+            while not entry[2]:
+                self._cond.wait()
+
+    def leave(self):
+        with self._cond:
+            self._leave()
+
+    def _leave(self):
+        self._active -= 1
+        self._advance()
+
+    def _advance(self):
+        if self._active or not self._wakeups:
+            return
+        self._now = max(self._now, self._wakeups[0][0])
+        while self._wakeups and self._wakeups[0][0] <= self._now:
+            heapq.heappop(self._wakeups)[2] = True
+            self._active += 1
+        self._cond.notify_all()
+
+class SimulatedClient:
+    """
+    Stand-in for NodeClient with the surface AutomationWorker uses. Each
+    send takes `latency` seconds of virtual time, +/- `jitter` (a
+    fraction of it). `fail_rate` of the sends fail transiently (retried
+    through the retry queue), `reject_rate` fail for good. Sends are kept
+    in `sends` as (virtual seconds, latency, success).
+    """
+    def __init__(self, clock, session=None, latency=1.5, jitter=0.5, fail_rate=0.0, reject_rate=0.0, rng=None):
+        self.clock = clock
+        self.session_name = session
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.reject_rate = reject_rate
+        self.random = rng or random.Random()
+        self.last_attempts = []
+        self.sends = []
+
+    @property
+    def last_latency(self):
+        return self.last_attempts[-1]['latency'] if self.last_attempts else None
+
+    def ensure_media(self, media):
+        return True, None
+
+    def send_message(self, phone, message, media=None):
+        started = self.clock.monotonic()
+        latency = self.random.uniform(self.latency * (1 - self.jitter), self.latency * (1 + self.jitter))
+        self.clock.sleep(latency)
+
+        roll = self.random.random()
+        if roll < self.fail_rate:
+            success, response = False, "HTTP Error: 503 WhatsApp client is not ready"
+        elif roll < self.fail_rate + self.reject_rate:
+            success, response = False, "Simulated failure"
+        else:
+            success, response = True, {'status': 'success'}
+        self.last_attempts = [{'latency': latency, 'status': 200 if success else 500,
+                               'error': None if success else response}]
+        self.sends.append((started, latency, success))
+        return success, response
+
+    def send_batch(self, items, delay_min=0, delay_max=0):
+        results = []
+        for n, item in enumerate(items):
+            if n:
+                # Spacing between messages, applied by the bridge.
+                self.clock.sleep(self.random.uniform(delay_min, delay_max))
+            success, response = self.send_message(item['number'], item['message'], item.get('media'))
+            results.append((item['id'], success, response))
+        return results
+
+    def send_jobs(self, items, delay_min=0, delay_max=0, on_result=None, **kwargs):
+        results = self.send_batch(items, delay_min, delay_max)
+        if on_result:
+            for result in results:
+                on_result(*result)
+        return results
+
+def synthetic_contacts(count):
+    return [{'name': f"Contact {n}", 'phone': f"2010{n:08d}"} for n in range(count)]
+
+def simulate(queue, templates, scheduler, config, accounts=None, start=None, latency=1.5, jitter=0.5,
+             fail_rate=0.0, reject_rate=0.0, seed=None, horizon_days=60, retry_file=None, on_log=None):
+    """
+    Runs one simulated campaign over `queue` (a sized iterable of
+    contacts) and returns its report (see report()). `accounts` is the
+    dispatcher's list of {'session', 'delay_min', 'delay_max'}.
+    """
+    from worker import AutomationWorker
+    from dispatcher import SharedQueue
+    from rate_controller import RateController
+    from retry_queue import RetryQueue
+
+    start = start or datetime.now()
+    accounts = accounts or [{'session': None}]
+    clock = VirtualClock(start, participants=len(accounts), horizon=horizon_days * 86400)
+    rng = random.Random(seed)
+    total = len(queue)
+    shared = SharedQueue(queue)
+    retry_queue = RetryQueue(retry_file) if retry_file else None
+
+    workers = []
+    for account in accounts:
+        account_config = dict(config)
+        account_config.update(account)
+        account_config.pop('done_number', None)
+        name = account['session'] or "default"
+        callbacks = {
+            'on_log': (lambda msg, name=name: on_log(clock.now(), f"[{name}] {msg}")) if on_log else None,
+            'on_progress': lambda _: None,
+            'on_finish': lambda: None
+        }
+        client = SimulatedClient(clock, account['session'], latency, jitter, fail_rate, reject_rate,
+                                 rng=random.Random(rng.random()))
+        rate_controller = RateController.from_config(account_config, clock=clock, rng=random.Random(rng.random()))
+        worker = AutomationWorker(shared, templates, scheduler, account_config, callbacks, client=client,
+                                  rate_controller=rate_controller, clock=clock)
+        worker.retry_queue = retry_queue
+        workers.append(worker)
+
+    errors = []
+
+    def run(worker):
+        try:
+            worker.run()
+        except SimulationLimit as e:
+            errors.append(str(e))
+        finally:
+            clock.leave()
+
+    threads = [threading.Thread(target=run, args=(worker,), daemon=True) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return report(scheduler, clock, workers, total, errors[0] if errors else None)
+
+def report(scheduler, clock, workers, total, error=None):
+    """
+    Summary of a finished simulation: completion time, totals, time per
+    state, and per account and per session the messages, sending seconds
+    and idle seconds (session time of every account not spent sending).
+    """
+    start, end = clock.start, clock.now()
+    sends = sorted((t, latency, success) for worker in workers for t, latency, success in worker.client.sends)
+
+    sessions = []
+    moment = start
+    while moment < end:
+        window = scheduler.session_at(moment)
+        if window is None:
+            wait = scheduler.seconds_until_open(moment)
+            if wait is None:
+                break
+            moment += timedelta(seconds=wait)
+            continue
+        opened, closed = max(window[0], start), min(window[1], end)
+        sessions.append({'start': opened, 'end': closed, 'messages': 0, 'sending_seconds': 0.0})
+        moment = window[1]
+
+    index = 0
+    for t, latency, _ in sends:
+        at = start + timedelta(seconds=t)
+        while index < len(sessions) - 1 and at >= sessions[index]['end']:
+            index += 1
+        if sessions:
+            sessions[index]['messages'] += 1
+            sessions[index]['sending_seconds'] += latency
+
+    for session in sessions:
+        length = (session['end'] - session['start']).total_seconds() * len(workers)
+        session['idle_seconds'] = max(0.0, length - session['sending_seconds'])
+        session['start'] = session['start'].isoformat(timespec='minutes')
+        session['end'] = session['end'].isoformat(timespec='minutes')
+
+    states = {'sending': sum(worker.rate_controller.send_seconds for worker in workers)}
+    for worker in workers:
+        for kind, seconds in worker.rate_controller.wait_seconds.items():
+            states[kind] = states.get(kind, 0.0) + seconds
+
+    return {
+        'start': start.isoformat(timespec='minutes'),
+        'completion': end.isoformat(timespec='minutes') if error is None else None,
+        'simulated_until': end.isoformat(timespec='minutes'),
+        'error': error,
+        'contacts': total,
+        'processed': sum(worker.current for worker in workers),
+        'sent': sum(1 for _, _, success in sends if success),
+        'failed_sends': sum(1 for _, _, success in sends if not success),
+        'accounts': {worker.client.session_name or "default": {
+            'messages': len(worker.client.sends),
+            'sending_seconds': worker.rate_controller.send_seconds,
+        } for worker in workers},
+        'state_seconds': states,
+        'sessions': sessions,
+    }
+
+def _hours(seconds):
+    return f"{seconds / 3600:.1f}h"
+
+def print_report(result, deadline=None):
+    print(f"Start:       {result['start']}")
+    if result['error']:
+        print(f"Not finished: {result['error']} "
+              f"({result['processed']} of {result['contacts']} contacts processed)")
+    else:
+        print(f"Completion:  {result['completion']} ({result['contacts']} contacts)")
+    if deadline is not None:
+        fits = result['completion'] is not None and datetime.fromisoformat(result['completion']) <= deadline
+        print(f"Deadline:    {deadline:%Y-%m-%d %H:%M} - {'fits' if fits else 'DOES NOT FIT'}")
+    print(f"Messages:    {result['sent']} sent, {result['failed_sends']} failed sends")
+    print("Time:        " + ", ".join(f"{kind} {_hours(seconds)}"
+                                      for kind, seconds in result['state_seconds'].items() if seconds))
+    if len(result['accounts']) > 1:
+        for name, account in result['accounts'].items():
+            print(f"  {name}: {account['messages']} messages, {_hours(account['sending_seconds'])} sending")
+    print()
+    print(f"{'Session':<28} {'Messages':>9} {'Sending':>9} {'Idle':>9}")
+    for session in result['sessions']:
+        window = f"{session['start'].replace('T', ' ')} - {session['end'][11:]}"
+        print(f"{window:<28} {session['messages']:>9} {_hours(session['sending_seconds']):>9} "
+              f"{_hours(session['idle_seconds']):>9}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="L-WAS campaign simulator (virtual clock, nothing is sent)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help="input CSV, loaded and filtered like a real run")
+    source.add_argument('--contacts', type=int, help="simulate N synthetic contacts")
+    parser.add_argument('--config', default='state.json', help="settings file in the GUI's state.json format")
+    parser.add_argument('--start', help="simulated start, 'YYYY-MM-DD HH:MM' (default: now)")
+    parser.add_argument('--deadline', help="report whether the campaign finishes by 'YYYY-MM-DD HH:MM'")
+    parser.add_argument('--latency', type=float, default=1.5, help="seconds per send on the bridge (default 1.5)")
+    parser.add_argument('--jitter', type=float, default=0.5, help="latency spread as a fraction (default 0.5)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="share of sends failing transiently (retried)")
+    parser.add_argument('--reject-rate', type=float, default=0.0, help="share of sends failing for good")
+    parser.add_argument('--seed', type=int, help="random seed, for repeatable forecasts")
+    parser.add_argument('--horizon-days', type=float, default=60, help="give up after this many simulated days")
+    parser.add_argument('--output', help="also write the report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="print the worker log with simulated times")
+    args = parser.parse_args(argv)
+
+    from cli import load_settings, build_config, template_attachments
+
+    try:
+        state = load_settings(args.config)
+        config, accounts, template_sources = build_config(state)
+        start = datetime.strptime(args.start, "%Y-%m-%d %H:%M") if args.start else datetime.now()
+        deadline = datetime.strptime(args.deadline, "%Y-%m-%d %H:%M") if args.deadline else None
+    except (OSError, ValueError) as e:
+        print(f"Invalid settings: {e}")
+        return 2
+
+    scheduler = Scheduler()
+    scheduler.update_config(state.get('schedule', {}))
+    work_dir = tempfile.mkdtemp(prefix="lwas-sim-")
+    try:
+        if args.input:
+            from csv_manager import CSVManager
+            csv_manager = CSVManager(
+                worked_file=os.path.join(work_dir, "worked.csv"), failed_file=os.path.join(work_dir, "failed.csv"),
+                spool_file=os.path.join(work_dir, "queue.spool"), sent_db=os.path.join(work_dir, "worked.db"),
+                rejects_file=os.path.join(work_dir, "rejects.csv"),
+                suppressed_db=os.path.join(work_dir, "suppressed.db"),
+                results_db=os.path.join(work_dir, "results.db")
+            )
+            queue, _ = csv_manager.load_and_filter(
+                args.input, default_country_code=(state.get('country_code') or '').strip() or None
+            )
+            columns = queue.columns
+        else:
+            queue, columns = synthetic_contacts(args.contacts), ['name', 'phone']
+
+        try:
+            templates = compile_templates(template_sources, columns, template_attachments(state))
+        except TemplateError as e:
+            print(f"Invalid template: {e}" + ("" if args.input else " (use --input for templates with more columns)"))
+            return 2
+
+        on_log = (lambda at, msg: print(f"{at:%Y-%m-%d %H:%M:%S} {msg}")) if args.verbose else None
+        result = simulate(queue, templates, scheduler, config, accounts, start=start, latency=args.latency,
+                          jitter=args.jitter, fail_rate=args.fail_rate, reject_rate=args.reject_rate,
+                          seed=args.seed, horizon_days=args.horizon_days,
+                          retry_file=os.path.join(work_dir, "retry.json"), on_log=on_log)
+        if args.input:
+            csv_manager.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(result, deadline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    return 0 if result['error'] is None else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
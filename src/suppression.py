@@ -0,0 +1,206 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime
+from sent_store import canonical_phone
+
+# A reply opts out when, ignoring case, punctuation and extra spaces, it
+# is exactly one of these. Whole-message matching keeps "stop" from
+# firing on a reply like "don't stop sending me offers".
+DEFAULT_KEYWORDS = ("stop", "stop all", "stopall", "unsubscribe", "cancel", "end", "quit",
+                    "opt out", "optout", "الغاء", "إلغاء", "توقف", "ايقاف", "إيقاف")
+
+# failed.csv reason of contacts skipped because they opted out.
+OPTED_OUT = "Opted out (suppression list)"
+
+def normalize_text(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text or "").lower()).split())
+
+def parse_keywords(text):
+    """Keywords from a comma separated setting; the defaults when it is empty."""
+    words = [normalize_text(word) for word in str(text or "").split(",")]
+    return frozenset(word for word in words if word) or frozenset(DEFAULT_KEYWORDS)
+
+def _number(phone):
+    digits = canonical_phone(str(phone or ""))
+    if not digits or len(digits) > 18:
+        return None
+    return int(digits)
+
+class SuppressionList:
+    """
+    Phones that must never be messaged again (people who replied STOP).
+    SQLite holds the exact, persistent list; lookups go to an in-memory
+    copy packed as a sorted array of 64-bit integers, so a check is a
+    binary search and a million entries take 8 MB.
+    """
+    def __init__(self, db_path="suppressed.db", keywords=None):
+        self.db_path = db_path
+        self.keywords = parse_keywords(",".join(keywords) if keywords else "")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # The phone is the rowid, so a table scan returns it sorted.
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS suppressed ("
+            "phone INTEGER PRIMARY KEY, reason TEXT, source TEXT, timestamp TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        cursor = self._conn.execute("SELECT phone FROM suppressed ORDER BY phone")
+        self._numbers = array('q', (phone for (phone,) in cursor))
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def contains(self, phone):
+        number = _number(phone)
+        if number is None:
+            return False
+        with self._lock:
+            index = bisect_left(self._numbers, number)
+            return index < len(self._numbers) and self._numbers[index] == number
+
+    def contains_many(self, numbers):
+        """Boolean array: which of `numbers` (int64 numpy array) are suppressed."""
+        import numpy as np
+
+        with self._lock:
+            if not self._numbers:
+                return np.zeros(len(numbers), dtype=bool)
+            packed = np.frombuffer(self._numbers, dtype=np.int64)
+            index = np.searchsorted(packed, numbers).clip(max=len(packed) - 1)
+            found = packed[index] == numbers
+            del packed  # the array can't grow while a view of it exists
+        return found
+
+    def add(self, phone, reason, source="manual"):
+        """Suppresses `phone`. Returns False if it was already suppressed (or is not a number)."""
+        number = _number(phone)
+        if number is None:
+            return False
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO suppressed (phone, reason, source, timestamp) VALUES (?, ?, ?, ?)",
+                (number, reason, source, str(datetime.now()))
+            )
+            self._conn.commit()
+            if not cursor.rowcount:
+                return False
+            insort(self._numbers, number)
+        return True
+
+    def add_many(self, phones, reason, source="import"):
+        """Suppresses many phones in one transaction (e.g. an existing opt-out list). Returns the new count."""
+        numbers = {n for n in map(_number, phones) if n is not None}
+        timestamp = str(datetime.now())
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO suppressed (phone, reason, source, timestamp) VALUES (?, ?, ?, ?)",
+                ((n, reason, source, timestamp) for n in sorted(numbers))
+            )
+            self._conn.commit()
+            added = self._conn.total_changes - before
+            if added:
+                merged = set(self._numbers)
+                merged.update(numbers)
+                self._numbers = array('q', sorted(merged))
+        return added
+
+    def is_opt_out(self, text):
+        return normalize_text(text) in self.keywords
+
+    def process_inbound(self, messages):
+        """
+        Suppresses the senders of opt-out replies among inbound messages
+        from the bridge. Returns [(phone, text)] of the new opt-outs.
+        """
+        added = []
+        for message in messages:
+            text = message.get('body') or ""
+            if self.is_opt_out(text) and self.add(message.get('from'), f"Replied: {text.strip()}",
+                                                  source=message.get('session') or "inbound"):
+                added.append((canonical_phone(message.get('from')), text.strip()))
+        return added
+
+    def get_cursor(self, key):
+        """(boot id, last seen sequence number) of an inbound feed."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None, 0
+        cursor = json.loads(row[0])
+        return cursor.get('boot'), int(cursor.get('after') or 0)
+
+    def set_cursor(self, key, boot, after):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               (key, json.dumps({'boot': boot, 'after': after})))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class InboundWatcher(threading.Thread):
+    """
+    Fetches the messages buffered by the bridge (GET /inbound) every
+    `interval` seconds and suppresses everyone who replied with an
+    opt-out keyword. The read position is kept in the suppression
+    database, so no reply is processed twice or missed across restarts
+    (as long as the bridge still buffers it).
+    """
+    def __init__(self, suppression, client, interval=15.0, on_log=None, limit=500):
+        super().__init__(daemon=True)
+        self.suppression = suppression
+        self.client = client  # a NodeClient of its own: the worker's client keeps per-call state
+        self.interval = interval
+        self.on_log = on_log
+        self.limit = limit
+        self._stopped = threading.Event()
+        self._unsupported = False
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logging.exception("Inbound poll failed")
+            self._stopped.wait(self.interval)
+
+    def poll(self):
+        """Reads every message buffered since the last poll. Returns the number of new opt-outs."""
+        key = f"inbound:{self.client.base_url}"
+        boot, after = self.suppression.get_cursor(key)
+        total = 0
+        while not self._stopped.is_set():
+            success, body = self.client.fetch_inbound(after, boot, self.limit)
+            if not success:
+                last = self.client.last_attempts[-1] if self.client.last_attempts else {}
+                if last.get('status') == 404 and not self._unsupported:
+                    self._unsupported = True
+                    self.log("The Node server has no /inbound route; opt-out replies are not collected.")
+                return total
+            messages = body.get('messages', [])
+            for phone, text in self.suppression.process_inbound(messages):
+                self.log(f"Opt-out: {phone} replied \"{text}\", added to the suppression list.")
+                total += 1
+            boot = body.get('bootId')
+            after = messages[-1]['seq'] if messages else int(body.get('last') or 0)
+            self.suppression.set_cursor(key, boot, after)
+            if len(messages) < self.limit:
+                return total
+        return total
+
+    def log(self, message):
+        if self.on_log:
+            self.on_log(message)
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,79 @@
+from string import Formatter
+
+class TemplateError(ValueError):
+    pass
+
+class CompiledTemplate:
+    """
+    A message template parsed once into literal text and variable names.
+    Variables are input CSV columns ({name}, {phone}, {city}, ...),
+    matched case-insensitively. `{{` and `}}` give literal braces.
+    Rendering is a single join over the precomputed parts. `media` is
+    the template's attachment (media.MediaFile), sent with every message
+    rendered from it, the text as its caption. `number` is the template's
+    position in the settings (Template 1-3), used in the statistics.
+    """
+    __slots__ = ("source", "fields", "media", "number", "_parts")
+
+    def __init__(self, source, columns=None, media=None, number=None):
+        self.source = source
+        self.media = media
+        self.number = number
+        allowed = {c.lower().strip() for c in columns} if columns is not None else None
+
+        try:
+            parsed = list(Formatter().parse(source))
+        except ValueError as e:
+            raise TemplateError(f"Malformed template: {e}")
+
+        parts = []
+        fields = []
+        for literal, field, spec, conversion in parsed:
+            if literal:
+                parts.append((True, literal))
+            if field is None:
+                continue
+
+            key = field.lower().strip()
+            if not key or key.isdigit() or '.' in key or '[' in key:
+                raise TemplateError(f"Invalid placeholder {{{field}}}, use a column name like {{name}}")
+            if spec or conversion:
+                raise TemplateError(f"Formatting options are not supported in {{{field}}}")
+            if allowed is not None and key not in allowed:
+                raise TemplateError(f"Unknown variable {{{field}}}. Available: "
+                                    + ", ".join("{" + c + "}" for c in sorted(allowed)))
+            parts.append((False, key))
+            fields.append(key)
+
+        self.fields = fields
+        self._parts = tuple(parts)
+
+    def render(self, row):
+        return "".join([part if is_literal else str(row.get(part) or "") for is_literal, part in self._parts])
+
+def compile_templates(sources, columns=None, attachments=None):
+    """
+    Compiles the rotating templates. `attachments` holds a file path (or
+    '') per template. Templates without text or attachment are left out
+    of the rotation; raises TemplateError (naming the template) on the
+    first bad one, or if none is left.
+    """
+    from media import MediaFile
+
+    attachments = list(attachments or [])
+    compiled = []
+    for number, source in enumerate(sources, start=1):
+        attachment = ((attachments[number - 1] if number <= len(attachments) else "") or "").strip()
+        if not source.strip() and not attachment:
+            continue
+        try:
+            media = MediaFile(attachment) if attachment else None
+        except OSError as e:
+            raise TemplateError(f"Template {number}: cannot read attachment: {e}")
+        try:
+            compiled.append(CompiledTemplate(source, columns, media, number))
+        except TemplateError as e:
+            raise TemplateError(f"Template {number}: {e}")
+    if not compiled:
+        raise TemplateError("All templates are empty")
+    return compiled
\ No newline at end of file
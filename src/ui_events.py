@@ -0,0 +1,70 @@
+import logging
+import queue
+import threading
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+class UIEventBus:
+    """
+    Hand-off from worker threads to the Tk main loop.
+    Workers only enqueue; the GUI drains the bus from `after()` at a
+    fixed frame rate. Log lines queue up in order, progress is coalesced
+    to the latest value, finish events carry the id of their run, and
+    calls hand the result of background work back to the Tk thread.
+    """
+    def __init__(self):
+        self._events = queue.SimpleQueue()
+        self._progress = None
+        self._progress_lock = threading.Lock()
+
+    def log(self, message):
+        # Stamped here, not when drained, so the history file has send-time stamps.
+        self._events.put(('log', (datetime.now(), message)))
+
+    def progress(self, value):
+        with self._progress_lock:
+            self._progress = value
+
+    def finish(self, run_id=None):
+        self._events.put(('finish', run_id))
+
+    def call(self, func, *args):
+        """Has the GUI run func(*args) on the Tk thread at the next frame."""
+        self._events.put(('call', (func, args)))
+
+    def drain(self, max_events=5000):
+        """
+        Returns (log_lines, progress or None, finished_run_ids, calls)
+        collected since the last call, at most `max_events` queued events
+        per call. log_lines are (datetime, message) tuples, calls are
+        (func, args) tuples.
+        """
+        lines = []
+        finished = []
+        calls = []
+        for _ in range(max_events):
+            try:
+                kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'log':
+                lines.append(payload)
+            elif kind == 'call':
+                calls.append(payload)
+            else:
+                finished.append(payload)
+
+        with self._progress_lock:
+            progress, self._progress = self._progress, None
+        return lines, progress, finished, calls
+
+def history_logger(path="lwas.log", max_bytes=5 * 1024 * 1024, backups=5):
+    """Logger that keeps the full run history in rotating files."""
+    logger = logging.getLogger("lwas.history")
+    if not logger.handlers:
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
\ No newline at end of file
@@ -13,11 +13,8 @@ def resource_path(relative_path):
 
 def format_message(template, data):
     """
-    Replaces {name} in the template.
+    Renders a template with the contact's columns (e.g. {name}).
+    For repeated use compile once with templates.CompiledTemplate.
     """
-    try:
-        return template.format(
-            name=data.get('name', '')
-        )
-    except KeyError as e:
-        return f"Error processing template: Missing key {e}"
\ No newline at end of file
+    from templates import CompiledTemplate
+    return CompiledTemplate(template).render(data)
\ No newline at end of file
@@ -1,96 +1,423 @@
 import threading
-import time
-import random
+from itertools import islice
+from clock import SYSTEM_CLOCK
 from node_client import NodeClient
+from rate_controller import RateController
+from templates import CompiledTemplate
+from metrics import METRICS, failure_class
+from suppression import OPTED_OUT
 
 class AutomationWorker(threading.Thread):
-    def __init__(self, queue, templates, scheduler, config, callbacks):
+    def __init__(self, queue, templates, scheduler, config, callbacks, client=None, rate_controller=None, clock=None):
         super().__init__()
-        self.queue = queue 
-        self.templates = templates  # Now a list of 3 templates
+        self.clock = clock or SYSTEM_CLOCK  # simulator.VirtualClock for simulated runs
+        self.queue = queue  # Sized iterable of contacts (e.g. csv_manager.ContactStream)
+        # Rotating templates, compiled once (plain strings are compiled here).
+        self.templates = [t if isinstance(t, CompiledTemplate) else CompiledTemplate(t) for t in templates]
         self.scheduler = scheduler
-        self.config = config 
-        # config now expects: {'delay_min': float, 'delay_max': float, 'done_number': str}
-        self.callbacks = callbacks 
-        
-        self.running = True
-        self.paused = False
-        self.client = NodeClient()
+        self.config = config
+        # config now expects: {'delay_min': float, 'delay_max': float, 'done_number': str,
+        #                      'batch_size': int (optional, >1 sends windows of messages at once),
+        #                      'async_jobs': bool (default True, send through the bridge job queue),
+        #                      'max_per_minute' / 'max_per_hour' / 'max_per_day': optional caps}
+        self.callbacks = callbacks
+
+        # Pause/resume/stop wake any wait through this condition.
+        self._state = threading.Condition()
+        self._running = True
+        self._paused = False
+        self.rate_controller = rate_controller or RateController.from_config(config, clock=self.clock)
+        self.client = client or NodeClient()
         self.csv_manager = None
+        self.close_results_on_exit = True  # False when the CSVManager is shared with other workers
+        self.journal = None  # checkpoint.CampaignJournal, records progress for RESUME
+        self.close_journal_on_exit = True
+        self.retry_queue = None  # retry_queue.RetryQueue, transient failures are re-sent from it
+        self.suppression = None  # suppression.SuppressionList, opt-outs are skipped right before sending
         self.template_index = 0  # For rotating through templates
-        
+        self.current = 0
+        self.total = 0
+        self.send_estimate = 2.0  # seconds, refined from observed sends
+        self.completed = False  # True once the queue ran out without STOP or a crash
+
+    @property
+    def running(self):
+        return self._running
+
+    @running.setter
+    def running(self, value):
+        with self._state:
+            self._running = value
+            self._state.notify_all()
+
+    @property
+    def paused(self):
+        return self._paused
+
+    @paused.setter
+    def paused(self, value):
+        with self._state:
+            self._paused = value
+            self._state.notify_all()
+
     def run(self):
-        total = len(self.queue)
-        current = 0
-        
-        self.log(f"Worker started. Queue size: {total}")
-
-        while self.running and current < total:
-            if self.paused:
-                self.log("Paused...")
-                time.sleep(1)
-                continue
-
-            # 1. Check Schedule
-            allowed, reason = self.scheduler.is_allowed()
-            if not allowed:
-                self.log(f"Waiting: {reason}")
-                time.sleep(30) 
-                continue
-
-            # 2. Process Item
-            item = self.queue[current]
-            phone = item['phone']
-            
-            # Rotate through templates
-            template = self.templates[self.template_index % len(self.templates)]
-            self.template_index += 1
-            
-            from utils import format_message
-            message = format_message(template, item)
+        self.total = len(self.queue)
+        self.current = 0
+        METRICS.record(METRICS.queue_size, "set", self.total)
+        contacts = iter(self.queue)
+        batch_size = self._batch_size()
 
-            self.log(f"Sending to {item['name']} ({phone})...")
+        self.log(f"Worker started. Queue size: {self.total}")
+        if batch_size > 1:
+            self.log(f"Batch mode: up to {batch_size} messages per bridge request.")
 
-            # 3. Send
-            success, response = self.client.send_message(phone, message)
+        completed = False
+        try:
+            self._upload_media()
+            while self.running:
+                if self.paused:
+                    self.log("Paused...")
+                    self._wait_while_paused()
+                    continue
 
-            if success:
-                self.log(f"SUCCESS: {phone}")
-                if self.csv_manager:
-                    self.csv_manager.log_worked(item)
-            else:
-                self.log(f"FAILED: {phone} - {response}")
-                if self.csv_manager:
-                    self.csv_manager.log_failed(item, str(response))
-
-            # 4. Update Progress
-            current += 1
-            self.callbacks['on_progress'](current / total)
-
-            # 5. Random Delay (NEW LOGIC)
-            try:
-                delay_min = float(self.config.get('delay_min', 3))
-                delay_max = float(self.config.get('delay_max', 7))
-                if delay_min < 0: delay_min = 0
-                if delay_max < delay_min: delay_max = delay_min
-                delay = random.uniform(delay_min, delay_max)
-            except (ValueError, TypeError):
-                delay = random.uniform(3.0, 7.0)
-            
-            self.log(f"Waiting {delay:.2f} seconds before next message...")
-            time.sleep(delay)
+                # 1. Check Schedule (a window shrinks to what the session can hold)
+                size = self._wait_for_window(batch_size)
+                if not size:
+                    continue
+
+                # 1b. Check rate caps
+                if not self._wait_for_rate_caps(size):
+                    continue
+
+                # 2. Process Item(s), due retries first
+                window = self.retry_queue.pop_due(size, self.clock.time()) if self.retry_queue is not None else []
+                window += islice(contacts, size - len(window))
+                if not window:
+                    if not self._wait_for_retries():
+                        break
+                    continue
+                window = self._drop_suppressed(window)
+                if not window:
+                    continue
+                self.rate_controller.consume(len(window))
+
+                if batch_size > 1:
+                    # Spacing between messages is applied by the bridge.
+                    self._send_window(window)
+                    continue
+
+                self._send_one(window[0])
+
+                # 5. Random Delay (NEW LOGIC)
+                delay = self.rate_controller.next_delay()
+
+                self.log(f"Waiting {delay:.2f} seconds before next message...")
+                self._wait(delay, "delay")
+            completed = self.running
+        finally:
+            self.completed = completed
+            if self.retry_queue is not None:
+                self.retry_queue.save()
+            # Make sure every buffered result reaches disk, also on STOP.
+            if self.csv_manager and self.close_results_on_exit:
+                self.csv_manager.close()
+            if self.journal and self.close_journal_on_exit:
+                # A stopped or crashed run keeps its journal open for RESUME.
+                if completed:
+                    self.journal.end()
+                else:
+                    self.journal.close()
 
         self.log("Queue completed.")
-        
+        self.log(f"Timing: {self.rate_controller.summary()}")
+
         done_num = self.config.get('done_number')
         if done_num:
             self.client.send_message(done_num, "Automation Batch Completed Successfully.")
 
         self.callbacks['on_finish']()
 
+    def _wait_for_window(self, batch_size):
+        """
+        Returns how many messages (at most `batch_size`) the current
+        session can still hold. When not even one fits, sleeps until the
+        next session opens (or the current one closes) and returns 0.
+        """
+        now = self.clock.now()
+        allowed, reason = self.scheduler.is_allowed(now)
+        if not allowed:
+            wait = self.scheduler.seconds_until_open(now)
+            if wait is None:
+                self.log(f"Waiting: {reason}")
+                self._wait(30, "schedule")
+            else:
+                self.log(f"Waiting: {reason}. Next session opens in {self._format_duration(wait)}.")
+                self._wait(wait, "schedule")
+            return 0
+
+        # Don't start a send the session can't hold: n messages need
+        # n * send_estimate + (n - 1) * delay_max seconds.
+        remaining = self.scheduler.seconds_until_close(now)
+        delay_max = self.rate_controller.delay_max
+        if remaining == float('inf'):
+            return batch_size
+        fits = int((remaining + delay_max) // (self.send_estimate + delay_max))
+        if fits < 1:
+            self.log(f"Session closes in {remaining:.0f}s, not enough for the next send. Waiting for the next session.")
+            self._wait(remaining, "schedule")
+            return 0
+        return min(batch_size, fits)
+
+    def _wait_for_rate_caps(self, batch_size):
+        wait, limiter = self.rate_controller.time_until_allowed(batch_size)
+        if wait <= 0:
+            return True
+        self.log(f"Per-{limiter} cap reached. Waiting {self._format_duration(wait)}...")
+        self._wait(wait, "rate_limit")
+        return False
+
+    def _wait_for_retries(self):
+        """
+        Called once the queue is exhausted: sleeps until the next scheduled
+        retry is due. Returns False when no retry is left.
+        """
+        wait = self.retry_queue.seconds_until_due(self.clock.time()) if self.retry_queue is not None else None
+        if wait is None:
+            return False
+        if wait > 0:
+            self.log(f"Queue done. Waiting {self._format_duration(wait)} for "
+                     f"{len(self.retry_queue)} scheduled retr{'y' if len(self.retry_queue) == 1 else 'ies'}...")
+            self._wait(wait, "retry")
+        return True
+
+    def _wait(self, seconds, kind):
+        """Waits up to `seconds`, returning early on STOP."""
+        started = self.clock.monotonic()
+        deadline = started + seconds
+        with self._state:
+            while self._running:
+                remaining = deadline - self.clock.monotonic()
+                if remaining <= 0:
+                    break
+                self.clock.wait(self._state, remaining)
+        self._record_state(kind, self.clock.monotonic() - started)
+
+    def _wait_while_paused(self):
+        started = self.clock.monotonic()
+        with self._state:
+            while self._paused and self._running:
+                self._state.wait()
+        self._record_state("paused", self.clock.monotonic() - started)
+
+    def _record_state(self, kind, seconds):
+        self.rate_controller.record_wait(kind, seconds)
+        METRICS.record(METRICS.state_seconds, "inc", seconds, phase=kind, state=kind, account=self._account())
+
+    def _record_send(self, seconds, count=1):
+        self.rate_controller.record_send(seconds, count)
+        account = self._account()
+        METRICS.record(METRICS.state_seconds, "inc", seconds, state="sending", account=account)
+        for _ in range(count):
+            METRICS.record(METRICS.send_seconds, "observe", seconds / count, phase="send", account=account)
+
+    def _account(self):
+        return getattr(self.client, 'session_name', None) or "default"
+
+    @staticmethod
+    def _format_duration(seconds):
+        if seconds < 60:
+            return f"{seconds:.1f}s"
+        minutes, secs = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
+            return f"{hours}h {minutes:02d}m"
+        return f"{minutes}m {secs:02d}s"
+
+    def _next_message(self, item):
+        """Returns (text, attachment or None, template number) of the next template in the rotation."""
+        position = self.template_index % len(self.templates)
+        template = self.templates[position]
+        self.template_index += 1
+        return template.render(item), template.media, template.number or position + 1
+
+    def _upload_media(self):
+        """
+        Puts the templates' attachments into the bridge's media cache before
+        the first send, so messages only carry their hash. A run whose
+        attachments can't be uploaded stops here, before sending anything.
+        """
+        media = [template.media for template in self.templates if template.media is not None]
+        if not media:
+            return
+        success, error = self.client.ensure_media(media)
+        if success:
+            self.log(f"Attachments ready on the bridge: {', '.join(m.filename for m in media)}")
+        else:
+            self.log(f"Cannot upload attachments, stopping: {error}")
+            self.running = False
+
+    def _drop_suppressed(self, window):
+        """Skips contacts that opted out after the CSV was loaded (they count as failed)."""
+        if self.suppression is None:
+            return window
+        kept = []
+        for item in window:
+            if self.suppression.contains(item['phone']):
+                self._record_result(item, False, OPTED_OUT)
+            else:
+                kept.append(item)
+        return kept
+
+    def _send_one(self, item):
+        phone = item['phone']
+        message, media, template = self._next_message(item)
+
+        if self._is_retry(item):
+            self.log(f"Retrying {item['name']} ({phone}), attempt {item['_attempts']}...")
+        else:
+            self.log(f"Sending to {item['name']} ({phone})...")
+
+        # 3. Send
+        if self.journal and not self._is_retry(item):
+            self.journal.sending(item, self.template_index - 1)
+        started = self.clock.monotonic()
+        if self._async_jobs():
+            # The worker applies the delay itself, so no spacing on the bridge.
+            results = self.client.send_jobs([{'id': 0, 'number': phone, 'message': message, 'media': media}],
+                                            send_seconds=self.send_estimate, stopped=self._stopped)
+            if not results:
+                self._release_unsent([item])
+                return
+            _, success, response = results[0]
+        else:
+            success, response = self.client.send_message(phone, message, media)
+        elapsed = self.clock.monotonic() - started
+        self._update_send_estimate(elapsed)
+        self._record_send(elapsed)
+        attempts = len(self.client.last_attempts)
+        if attempts > 1:
+            self.log(f"Bridge needed {attempts} attempts ({self.client.last_latency:.2f}s last)")
+
+        self._record_result(item, success, response, template)
+
+    def _send_window(self, window):
+        batch = []
+        templates = []
+        for offset, item in enumerate(window):
+            message, media, template = self._next_message(item)
+            batch.append({
+                'id': self.current + offset,
+                'number': item['phone'],
+                'message': message,
+                'media': media
+            })
+            templates.append(template)
+            if self.journal and not self._is_retry(item):
+                self.journal.sending(item, self.template_index - 1)
+
+        self.log(f"Sending batch of {len(batch)} (#{self.current + 1}-#{self.current + len(batch)})...")
+        delay_min, delay_max = self.rate_controller.delay_min, self.rate_controller.delay_max
+        started = self.clock.monotonic()
+        if self._async_jobs():
+            # Outcomes are recorded as the bridge confirms them.
+            items = {entry['id']: (item, template) for entry, item, template in zip(batch, window, templates)}
+
+            def on_result(entry_id, success, response):
+                item, template = items.pop(entry_id)
+                self._record_result(item, success, response, template)
+
+            results = self.client.send_jobs(batch, delay_min, delay_max, on_result=on_result,
+                                            send_seconds=self.send_estimate, stopped=self._stopped)
+        else:
+            items = None
+            results = self.client.send_batch(batch, delay_min, delay_max)
+        elapsed = self.clock.monotonic() - started
+        # Only the send part of the window counts towards the estimate,
+        # the spacing applied by the bridge is accounted as delay.
+        spacing = min(elapsed, (len(batch) - 1) * (delay_min + delay_max) / 2)
+        self._update_send_estimate((elapsed - spacing) / len(batch))
+        self._record_send(elapsed - spacing, len(batch))
+        self._record_state("delay", spacing)
+
+        if items is not None:
+            if items and not self.running:
+                # Cancelled on the bridge by STOP before they went out.
+                self._release_unsent([item for item, _ in items.values()])
+                return
+            for item, template in items.values():
+                self._record_result(item, False, "No result returned by bridge", template)
+            return
+        by_id = {entry_id: (success, response) for entry_id, success, response in results}
+        for entry, item, template in zip(batch, window, templates):
+            success, response = by_id.get(entry['id'], (False, "No result returned by bridge"))
+            self._record_result(item, success, response, template)
+
+    def _update_send_estimate(self, seconds):
+        # Exponential moving average of how long one send takes.
+        self.send_estimate = 0.8 * self.send_estimate + 0.2 * seconds
+
+    def _record_result(self, item, success, response, template=None):
+        phone = item['phone']
+        retry = self._is_retry(item)
+        if self.journal and not retry:
+            self.journal.finished(item, success)
+        if success:
+            METRICS.record(METRICS.messages, "inc", 1, result="sent", reason="", account=self._account())
+            self.log(f"SUCCESS: {phone}")
+            if self.csv_manager:
+                self.csv_manager.log_worked(item, template)
+        else:
+            METRICS.record(METRICS.messages, "inc", 1, result="failed", reason=failure_class(response),
+                           account=self._account())
+            delay = self.retry_queue.add(item, response, self.clock.time()) if self.retry_queue is not None else None
+            if delay is not None:
+                # Only the final outcome goes to failed.csv.
+                self.log(f"FAILED: {phone} - {response}. Retrying in {self._format_duration(delay)}.")
+            else:
+                self.log(f"FAILED: {phone} - {response}")
+                if retry:
+                    response = f"{response} (after {item['_attempts']} attempts)"
+                if self.csv_manager:
+                    self.csv_manager.log_failed(item, str(response), template)
+        if self.retry_queue is not None:
+            self.retry_queue.save(min_interval=5)
+
+        # 4. Update Progress (retries are not part of the queue size)
+        if not retry:
+            self.current += 1
+            if self.total:
+                self.callbacks['on_progress'](self.current / self.total)
+
+    def _release_unsent(self, items):
+        # Messages a stop cancelled before they were sent: RESUME (or the
+        # next run, for retries) sends them again.
+        for item in items:
+            if self.journal and not self._is_retry(item):
+                self.journal.unsent(item)
+        retries = [item for item in items if self._is_retry(item)]
+        if retries and self.retry_queue is not None:
+            self.retry_queue.requeue(retries, self.clock.time())
+        self.log(f"Stopped: {len(items)} queued message(s) cancelled on the bridge, not sent.")
+
+    def _stopped(self):
+        return not self.running
+
+    @staticmethod
+    def _is_retry(item):
+        return '_attempts' in item
+
+    def _async_jobs(self):
+        return bool(self.config.get('async_jobs', True))
+
+    def _batch_size(self):
+        try:
+            return max(1, int(self.config.get('batch_size', 1)))
+        except (ValueError, TypeError):
+            return 1
+
     def log(self, msg):
         if self.callbacks['on_log']:
             self.callbacks['on_log'](msg)
 
     def stop(self):
-        self.running = False
\ No newline at end of file
+        self.running = False  # wakes any pending wait immediately
\ No newline at end of file
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# The app uses flat imports from src/ (python src/main.py); the fake
+# bridge lives with the benchmarks.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+@pytest.fixture
+def make_csv_manager(tmp_path):
+    """CSVManager factory with every file it writes inside tmp_path."""
+    managers = []
+
+    def make(**kwargs):
+        from csv_manager import CSVManager
+
+        files = dict(worked_file="worked.csv", failed_file="failed.csv", spool_file="queue.spool",
+                     sent_db="worked.db", rejects_file="rejects.csv", suppressed_db="suppressed.db",
+                     results_db="results.db")
+        files = {key: str(tmp_path / name) for key, name in files.items()}
+        files.update(kwargs)
+        manager = CSVManager(**files)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.close()
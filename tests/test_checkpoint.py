@@ -0,0 +1,14 @@
+from checkpoint import ResumeState, _apply
+
+def test_unsent_messages_are_resent_on_resume():
+    state = ResumeState({'spool_offset': 0, 'total': 3})
+    for offset, next_offset in ((0, 10), (10, 20), (20, 30)):
+        _apply(state, {'t': 'send', 'o': offset, 'n': next_offset, 'tpl': 0})
+    _apply(state, {'t': 'done', 'o': 0, 'n': 10, 'ok': True})
+    _apply(state, {'t': 'unsent', 'o': 10})
+    _apply(state, {'t': 'unsent', 'o': 20})
+
+    assert state.watermark == 10
+    assert state.inflight == {}
+    assert state.settle_inflight() == []
+    assert state.remaining == 2
@@ -0,0 +1,73 @@
+import csv
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from csv_manager import PhoneSet, normalize_phones
+from sent_store import canonical_phone
+
+def _write_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+def test_national_history_matches_input_with_a_country_code(tmp_path, make_csv_manager):
+    # worked.csv from before phones were normalized.
+    _write_csv(tmp_path / "worked.csv", ['name', 'phone', 'timestamp'],
+               [["Old", "01012345678", "2025-01-01 10:00:00"], ["Abroad", "3460012345", "2025-01-01 10:01:00"]])
+    source = _write_csv(tmp_path / "contacts.csv", ['name', 'phone'],
+                        [["A", "201012345678"], ["B", "01012345678"], ["C", "+3460012345"], ["D", "01099999999"]])
+
+    queue, skipped = make_csv_manager().load_and_filter(source, default_country_code='20')
+
+    assert skipped == 2  # A through the alias, C through its original key; B repeats A
+    assert queue.stats['duplicates'] == 1
+    assert [item['phone'] for item in queue] == ["201099999999"]
+
+def test_country_code_aliases_keep_the_original_keys(tmp_path, make_csv_manager):
+    store = make_csv_manager().sent_store
+    store.add_many([("Old", "01012345678", None), ("Intl", "3460012345", None), ("New", "201000000001", None)])
+
+    assert store.add_country_code_aliases("+20") == 2
+    assert store.add_country_code_aliases("20") == 0
+    assert store.filter_sent(["201012345678", "01012345678", "203460012345", "3460012345", "201000000001"]) == {
+        "201012345678", "01012345678", "203460012345", "3460012345", "201000000001"}
+
+@pytest.mark.parametrize("raw, expected, reason", [
+    ("+34 600 12 345", "3460012345", ""),
+    ("0034600123456", "34600123456", ""),
+    ("3460012345.0", "3460012345", ""),   # Excel float
+    ("+3460012345.00", "3460012345", ""),
+    ("3460.012345", "3460012345", ""),
+    ("600abc123", "600123", "contains letters"),
+    ("12345", "12345", "too short"),
+    ("", "", "empty"),
+])
+def test_normalize_phones(raw, expected, reason):
+    digits, reasons = normalize_phones(pd.Series([raw]))
+
+    assert (digits[0], reasons[0]) == (expected, reason)
+    if not reason:
+        assert canonical_phone(raw) == expected
+
+def test_normalize_phones_with_a_country_code():
+    digits, reasons = normalize_phones(pd.Series(["01012345678", "1012345678.0", "+3460012345", "201012345678"]),
+                                       default_country_code="+20")
+
+    assert list(digits) == ["201012345678", "201012345678", "3460012345", "201012345678"]
+    assert not any(reasons)
+
+def test_phone_set_membership_across_merged_runs():
+    phones = PhoneSet()
+    for start in range(0, 70, 10):
+        phones.add(np.arange(start, start + 10, dtype=np.int64) * 7 + 34600000000)
+    assert len(phones) == 70
+    assert len(phones._runs) < 7  # runs of similar size were merged
+
+    numbers = np.array([34600000000, 34600000483, 34600000001, 34600000490, 1], dtype=np.int64)
+    assert phones.contains(numbers).tolist() == [True, True, False, False, False]
+    assert phones.contains(np.arange(70, dtype=np.int64) * 7 + 34600000000).all()
+    assert not PhoneSet().contains(numbers).any()
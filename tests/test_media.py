@@ -0,0 +1,66 @@
+import hashlib
+
+import pytest
+
+from fake_bridge import FakeBridge
+from media import MediaFile
+from node_client import NodeClient
+
+@pytest.fixture
+def bridge():
+    bridge = FakeBridge().start()
+    yield bridge
+    bridge.stop()
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / "offer.png"
+    path.write_bytes(b"\x89PNG" + bytes(range(256)) * 100)
+    return MediaFile(str(path))
+
+def _client(bridge):
+    return NodeClient(bridge.url, backoff_base=0.01, max_retries=1)
+
+def test_media_file_is_identified_by_its_content(media):
+    data = open(media.path, 'rb').read()
+    assert media.sha256 == hashlib.sha256(data).hexdigest()
+    assert media.size == len(data)
+    assert media.mimetype == "image/png"
+    assert media.filename == "offer.png"
+
+def test_ensure_media_uploads_only_once(bridge, media):
+    client = _client(bridge)
+    assert client.ensure_media([media, media]) == (True, None)
+    assert client.ensure_media([media]) == (True, None)
+    assert bridge.uploads == 1
+
+def test_send_reuploads_evicted_media_and_resends_once(bridge, media):
+    client = _client(bridge)
+    client.ensure_media([media])
+    bridge.forget_media()
+
+    success, _ = client.send_message("201000000001", "Caption", media)
+
+    assert success
+    assert bridge.uploads == 2
+    assert bridge.sent == 1
+
+def test_job_submission_reuploads_evicted_media(bridge, media):
+    client = _client(bridge)
+    client.ensure_media([media])
+    bridge.forget_media()
+
+    results = client.send_jobs([{'id': 1, 'number': "201000000001", 'message': "Caption", 'media': media}])
+
+    assert [(item_id, success) for item_id, success, _ in results] == [(1, True)]
+    assert bridge.uploads == 2
+
+def test_failed_reupload_sends_nothing(bridge, media):
+    bridge.upload_media = lambda sha256, data: (500, {'status': 'error', 'message': 'Disk full'})
+    client = _client(bridge)
+
+    success, error = client.send_message("201000000001", "Caption", media)
+
+    assert not success and error.startswith("Attachment upload failed:")
+    assert client.last_attempts[-1]['status'] == 409
+    assert bridge.sent == 0
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from fake_bridge import FakeBridge
+from node_client import NodeClient
+
+@pytest.fixture
+def slow_bridge():
+    bridge = FakeBridge(latency=0.5).start()
+    yield bridge
+    bridge.stop()
+
+def _client(bridge, **kwargs):
+    return NodeClient(bridge.url, read_timeout=0.2, backoff_base=0.01, **kwargs)
+
+def test_send_message_does_not_retry_a_read_timeout(slow_bridge):
+    client = _client(slow_bridge)
+    success, error = client.send_message("201000000001", "Hello")
+    time.sleep(0.6)
+
+    assert not success and error.startswith("Timeout")
+    assert len(client.last_attempts) == 1
+    assert slow_bridge.sent == 1
+
+def test_submit_jobs_does_not_retry_a_read_timeout(slow_bridge):
+    slow_bridge.latency = 0
+    original = slow_bridge.submit_jobs
+
+    def slow_submit(session, body):
+        time.sleep(0.5)
+        return original(session, body)
+
+    slow_bridge.submit_jobs = slow_submit
+    client = _client(slow_bridge)
+    accepted, error, _ = client.submit_jobs([{'id': 1, 'number': "201000000001", 'message': "Hello"}])
+    time.sleep(0.6)
+
+    assert not accepted and error.startswith("Timeout")
+    assert len(client.last_attempts) == 1
+    assert len(slow_bridge.jobs) == 1
+
+def _items(count):
+    return [{'id': n, 'number': f"20100000000{n}", 'message': "Hello"} for n in range(count)]
+
+def test_send_jobs_confirm_timeout_grows_with_the_window():
+    bridge = FakeBridge(honor_delays=True).start()
+    try:
+        client = NodeClient(bridge.url)
+        results = client.send_jobs(_items(3), 0.4, 0.4, confirm_timeout=0.5, send_seconds=0.05)
+    finally:
+        bridge.stop()
+
+    assert sorted(success for _, success, _ in results) == [True, True, True]
+
+def test_send_jobs_stop_cancels_queued_jobs():
+    bridge = FakeBridge(honor_delays=True).start()
+    outcomes = []
+    try:
+        client = NodeClient(bridge.url)
+        results = client.send_jobs(_items(5), 0.3, 0.3, on_result=lambda *result: outcomes.append(result),
+                                   stopped=lambda: bool(outcomes))
+        time.sleep(1.0)
+    finally:
+        bridge.stop()
+
+    assert results == outcomes
+    assert 1 <= len(results) <= 2
+    assert all(success for _, success, _ in results)
+    assert bridge.sent == len(results)
+    assert sum(job['state'] == 'cancelled' for job in bridge.jobs.values()) == 5 - len(results)
+
+def test_send_failure_is_not_retried_and_keeps_the_bridge_error():
+    bridge = FakeBridge(fail_rate=1.0).start()
+    try:
+        client = NodeClient(bridge.url, backoff_base=0.01)
+        success, error = client.send_message("201000000001", "Hello")
+    finally:
+        bridge.stop()
+
+    assert not success
+    assert error == "HTTP Error: 500 Error sending message: Simulated failure"
+    assert len(client.last_attempts) == 1
+    assert bridge.failed == 1
+
+def test_send_retries_while_the_bridge_is_not_ready():
+    bridge = FakeBridge().start()
+    original = bridge.send_message
+    answers = [(503, {'status': 'error', 'message': 'WhatsApp client is not ready'})] * 2
+
+    bridge.send_message = lambda session, body: answers.pop() if answers else original(session, body)
+    try:
+        client = NodeClient(bridge.url, backoff_base=0.01)
+        success, _ = client.send_message("201000000001", "Hello")
+    finally:
+        bridge.stop()
+
+    assert success
+    assert [attempt['status'] for attempt in client.last_attempts] == [503, 503, 200]
+    assert bridge.sent == 1
@@ -0,0 +1,50 @@
+import pytest
+
+from rate_controller import TokenBucket, RateController
+
+def test_bucket_refills_continuously_up_to_capacity():
+    bucket = TokenBucket(10, 60, now=0)
+    bucket.consume(10, now=0)
+
+    assert bucket.time_until_available(1, now=0) == pytest.approx(6)
+    assert bucket.time_until_available(1, now=6) == 0
+    assert bucket.time_until_available(5, now=6) == pytest.approx(24)
+    # Idle time beyond a full period does not bank extra tokens.
+    assert bucket.time_until_available(10, now=1000) == 0
+    assert bucket.tokens == 10
+
+def test_bucket_tolerates_float_remainders():
+    bucket = TokenBucket(1, 1, now=0)
+    bucket.consume(1, now=0)
+
+    # Ten refills of 0.1s add up to a hair less than one token.
+    now = 0.0
+    for _ in range(10):
+        now += 0.1
+        bucket.time_until_available(1, now=now)
+    assert bucket.tokens < 1
+    assert bucket.time_until_available(1, now=now) == 0
+
+def test_window_larger_than_capacity_waits_for_a_full_bucket():
+    bucket = TokenBucket(5, 60, now=0)
+    bucket.consume(5, now=0)
+
+    assert bucket.time_until_available(20, now=0) == pytest.approx(60)
+
+def test_controller_reports_the_limiting_cap():
+    class Clock:
+        seconds = 0.0
+
+        def monotonic(self):
+            return self.seconds
+
+    clock = Clock()
+    controller = RateController.from_config({'delay_min': 1, 'delay_max': 2, 'max_per_minute': 2,
+                                             'max_per_hour': '', 'max_per_day': 'x'}, clock=clock)
+    assert [bucket.name for bucket in controller.buckets] == ["minute"]
+
+    controller.consume(2)
+    wait, limiter = controller.time_until_allowed()
+    assert limiter == "minute" and wait == pytest.approx(30)
+    clock.seconds = 30
+    assert controller.time_until_allowed() == (0.0, None)
@@ -0,0 +1,85 @@
+import csv
+
+from fake_bridge import FakeBridge
+from node_client import NodeClient
+from registration import RegistrationCache, RegistrationChecker, DAY
+
+NOW = 1_800_000_000.0
+
+def test_cache_ttl_depends_on_the_answer(tmp_path):
+    cache = RegistrationCache(str(tmp_path / "registration.db"), ttl_days=30, negative_ttl_days=7)
+    cache.store_many({"201000000001": True, "201000000002": False}, now=NOW)
+    phones = ["201000000001", "201000000002", "201000000003"]
+
+    assert cache.lookup_many(phones, now=NOW + 6 * DAY) == {"201000000001": True, "201000000002": False}
+    assert cache.lookup_many(phones, now=NOW + 8 * DAY) == {"201000000001": True}
+    assert cache.lookup_many(phones, now=NOW + 31 * DAY) == {}
+
+def test_evict_drops_expired_then_oldest(tmp_path):
+    cache = RegistrationCache(str(tmp_path / "registration.db"), max_entries=2)
+    cache.store_many({"201000000001": False}, now=NOW)
+    cache.store_many({"201000000002": True}, now=NOW + 1)
+    cache.store_many({"201000000003": True}, now=NOW + 2)
+    cache.store_many({"201000000004": True}, now=NOW + 3)
+
+    assert cache.evict(now=NOW + 8 * DAY) == 2
+    assert cache.lookup_many(["201000000001", "201000000002", "201000000003", "201000000004"],
+                             now=NOW + 8 * DAY) == {"201000000003": True, "201000000004": True}
+
+class StubClient:
+    def __init__(self, answers):
+        self.answers = answers
+        self.asked = []
+
+    def check_numbers(self, numbers):
+        self.asked.extend(numbers)
+        return True, {number: self.answers.get(number) for number in numbers}
+
+def test_checker_uses_the_cache_and_never_caches_missing_answers(tmp_path):
+    cache = RegistrationCache(str(tmp_path / "registration.db"))
+    client = StubClient({"201000000001": True, "201000000002": False})
+    phones = ["201000000001", "201000000002", "201000000003"]
+
+    assert RegistrationChecker(client, cache, batch_size=2).unregistered(phones) == {"201000000002"}
+    checker = RegistrationChecker(client, cache)
+    assert checker.unregistered(phones) == {"201000000002"}
+
+    # Only the number WhatsApp gave no answer for is asked again.
+    assert client.asked == phones + ["201000000003"]
+    assert (checker.cached, checker.checked, checker.unknown) == (2, 1, 1)
+
+def test_unreachable_bridge_keeps_every_number(tmp_path):
+    cache = RegistrationCache(str(tmp_path / "registration.db"))
+    bridge = FakeBridge().start()
+    bridge.stop()
+    checker = RegistrationChecker(NodeClient(bridge.url, max_retries=0), cache, batch_size=2)
+
+    assert checker.unregistered([f"20100000000{n}" for n in range(5)]) == set()
+    assert not checker.available
+    assert checker.unknown == 5
+    assert cache.count() == 0
+
+def test_load_and_filter_prunes_unregistered_numbers(tmp_path, make_csv_manager):
+    source = tmp_path / "contacts.csv"
+    phones = [f"2010{n:08d}" for n in range(200)]
+    with open(source, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'phone'])
+        writer.writerows([f"Contact {n}", phone] for n, phone in enumerate(phones))
+
+    bridge = FakeBridge(unregistered=0.3).start()
+    try:
+        checker = RegistrationChecker(NodeClient(bridge.url), RegistrationCache(str(tmp_path / "registration.db")))
+        queue, _ = make_csv_manager().load_and_filter(str(source), checker=checker)
+        _, expected = NodeClient(bridge.url).check_numbers(phones)
+    finally:
+        bridge.stop()
+
+    unregistered = {phone for phone, exists in expected.items() if not exists}
+    assert 0 < len(unregistered) < len(phones)
+    assert queue.stats['unregistered'] == len(unregistered)
+    assert {item['phone'] for item in queue} == set(phones) - unregistered
+    with open(tmp_path / "rejects.csv", newline='', encoding='utf-8') as f:
+        rejected = [row for row in csv.DictReader(f)]
+    assert {row['phone'] for row in rejected} == unregistered
+    assert {row['reason'] for row in rejected} == {'not on WhatsApp'}
@@ -0,0 +1,86 @@
+import csv
+import os
+
+from result_store import ResultStore, format_report
+from retry_queue import RetryQueue
+
+NOT_READY = "HTTP Error: 503 WhatsApp client is not ready"
+INVALID = "Number not registered on WhatsApp"
+
+def _log_round(manager, round_number, worked=100, failed=40):
+    template = round_number % 3 + 1
+    for n in range(worked):
+        manager.log_worked({'name': f"Contact {n}", 'phone': f"2010{round_number:02d}{n:06d}"}, template)
+    for n in range(failed):
+        reason = NOT_READY if n % 2 else INVALID
+        manager.log_failed({'name': f"Contact {n}", 'phone': f"2011{round_number:02d}{n:06d}"}, reason, template)
+    manager.close()
+
+def _segments(path):
+    return [p for p in (path, f"{path}.1", f"{path}.2") if os.path.exists(p)]
+
+def _rows(paths):
+    rows = []
+    for path in paths:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            assert next(reader)[:2] == ['name', 'phone']  # every segment starts with a header
+            rows.extend(reader)
+    return rows
+
+def test_rollups_cover_rows_of_rotated_and_deleted_segments(tmp_path, make_csv_manager):
+    manager = make_csv_manager(max_log_bytes=6000, log_backups=1)
+    for round_number in range(6):
+        _log_round(manager, round_number)
+
+    store = manager.result_store
+    stats = store.stats()
+    assert not os.path.exists(manager.worked_file + ".2")
+    assert len(_rows(_segments(manager.worked_file))) < 600  # the oldest segments are gone...
+    assert store.count() == 840  # ...but every result is in the store
+    assert (stats['sent'], stats['failed']) == (600, 240)
+    assert stats['templates'] == [(1, 200, 80), (2, 200, 80), (3, 200, 80)]
+    assert dict(stats['classes']) == {'http': 120, 'invalid_number': 120}
+    assert {(text, count) for text, _, count in stats['reasons']} == {(NOT_READY, 120), (INVALID, 120)}
+    assert [(sent, failed) for _, sent, failed in stats['days']] == [(600, 240)]
+    assert "Template 1" in format_report(stats)
+
+def test_rollups_match_the_raw_rows(tmp_path, make_csv_manager):
+    manager = make_csv_manager(max_log_bytes=6000, log_backups=1)
+    for round_number in range(3):
+        _log_round(manager, round_number)
+
+    conn = manager.result_store._conn
+    raw = conn.execute("SELECT template, SUM(sent), SUM(1 - sent) FROM results GROUP BY template").fetchall()
+    assert raw == manager.result_store.stats()['templates']
+
+def test_legacy_csv_history_is_imported_once(tmp_path, make_csv_manager):
+    with open(tmp_path / "worked.csv", 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows([['name', 'phone', 'timestamp'], ["Old", "201000000001", "2026-01-05 10:00:00"]])
+    with open(tmp_path / "failed.csv", 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows([['name', 'phone', 'reason', 'timestamp'],
+                                 ["Old", "201000000002", INVALID, "2026-01-05 10:01:00.5"]])
+
+    manager = make_csv_manager()
+    assert manager.result_store.count() == 2
+    manager.close()
+    manager.result_store.close()
+
+    reopened = ResultStore(str(tmp_path / "results.db"))
+    assert reopened.import_csv(str(tmp_path / "worked.csv"), str(tmp_path / "failed.csv")) == 0
+    stats = reopened.stats()
+    assert stats['templates'] == [(0, 1, 1)]
+    assert stats['days'] == [("2026-01-05", 1, 1)]
+    assert reopened.stats(days=30)['sent'] == 0
+
+def test_retry_import_continues_across_a_rotation(tmp_path, make_csv_manager):
+    manager = make_csv_manager(max_log_bytes=6000, log_backups=1)
+    retry_queue = RetryQueue(str(tmp_path / "retry.json"))
+    _log_round(manager, 0)
+    assert retry_queue.import_failed_csv(manager.failed_file) == (20, 20)
+
+    _log_round(manager, 1)
+    _log_round(manager, 2)
+    assert os.path.exists(manager.failed_file + ".1")
+    # Only the rows added since the first import, from both segments.
+    assert retry_queue.import_failed_csv(manager.failed_file) == (40, 40)
@@ -0,0 +1,63 @@
+import pytest
+
+from retry_queue import RetryQueue, classify, TRANSIENT, PERMANENT
+
+@pytest.mark.parametrize("reason", [
+    "Connection Error: Node.js server is not reachable.",
+    "HTTP Error: 503 WhatsApp client is not ready",
+    "HTTP Error: 429 Send queue is full",
+    "HTTP Error: 502 Bad Gateway",
+    "HTTP Error: 500 Error sending message: WhatsApp is disconnected",
+    "Attachment upload failed: Connection Error: Node.js server is not reachable.",
+    "Attachment upload failed: Timeout: Node.js server took too long.",
+])
+def test_transient_failures(reason):
+    assert classify(reason) == TRANSIENT
+
+@pytest.mark.parametrize("reason", [
+    # The bridge may already have sent or queued these.
+    "Timeout: Node.js server took too long.",
+    "Unconfirmed: no outcome after 660s",
+    # A sendText exception arrives as a plain 500 with WhatsApp's reason.
+    "HTTP Error: 500 Error sending message: Number not registered",
+    "HTTP Error: 500 Error sending message: Simulated failure",
+    "HTTP Error: 400 Missing \"number\" or \"message\" in request body",
+    "Opted out (suppression list)",
+    "",
+])
+def test_permanent_failures(reason):
+    assert classify(reason) == PERMANENT
+
+def test_timed_out_send_is_not_rescheduled(tmp_path):
+    queue = RetryQueue(str(tmp_path / "retry.json"))
+    item = {'name': "A", 'phone': "201000000001"}
+
+    assert queue.add(item, "Timeout: Node.js server took too long.", now=0) is None
+    assert 60 <= queue.add(item, "HTTP Error: 503 WhatsApp client is not ready", now=0) <= 72
+    assert len(queue) == 1
+
+def test_failed_rows_keep_their_template_columns(tmp_path, make_csv_manager):
+    manager = make_csv_manager()
+    manager.log_failed({'name': "A", 'phone': "201000000001", 'city': "Cairo", 'plan': "Pro", '_row': 3},
+                       "HTTP Error: 503 WhatsApp client is not ready")
+    manager.log_failed({'name': "B", 'phone': "201000000002", 'city': "Giza"},
+                       "Connection Error: Node.js server is not reachable.")
+    manager.close()
+
+    queue = RetryQueue(str(tmp_path / "retry.json"))
+    assert queue.import_failed_csv(manager.failed_file) == (2, 0)
+    entries = sorted(queue.pop_due(10), key=lambda entry: entry['phone'])
+    assert entries[0]['city'] == "Cairo" and entries[0]['plan'] == "Pro"
+    assert '_row' not in entries[0]
+    queue.requeue(entries)
+    assert queue.columns() == ['name', 'phone', 'city']
+
+def test_legacy_failed_rows_have_only_name_and_phone(tmp_path):
+    path = tmp_path / "failed.csv"
+    path.write_text("name,phone,failure_reason,timestamp,template\n"
+                    "A,201000000001,HTTP Error: 503 WhatsApp client is not ready,2026-01-01,\n", encoding='utf-8')
+    queue = RetryQueue(str(tmp_path / "retry.json"))
+    queue.add({'name': "B", 'phone': "201000000002", 'city': "Giza"}, "HTTP Error: 429 Send queue is full", now=0)
+
+    assert queue.import_failed_csv(str(path)) == (1, 0)
+    assert queue.columns() == ['name', 'phone']
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+
+from scheduler import Scheduler
+from simulator import VirtualClock
+from worker import AutomationWorker
+
+MONDAY = datetime(2026, 10, 19)
+
+def _scheduler(schedule_map):
+    scheduler = Scheduler()
+    scheduler.update_config(schedule_map)
+    return scheduler
+
+def _at(day, hour, minute, second=0):
+    return MONDAY.replace(day=MONDAY.day + day, hour=hour, minute=minute, second=second)
+
+def test_session_end_minute_is_included():
+    scheduler = _scheduler({'Mon': [{'start': '09:00', 'end': '12:00'}]})
+
+    assert not scheduler.is_allowed(_at(0, 8, 59, 59))[0]
+    assert scheduler.is_allowed(_at(0, 9, 0))[0]
+    assert scheduler.is_allowed(_at(0, 12, 0, 59))[0]
+    assert not scheduler.is_allowed(_at(0, 12, 1))[0]
+    assert scheduler.seconds_until_open(_at(0, 8, 0)) == 3600
+    assert scheduler.seconds_until_close(_at(0, 12, 0)) == 60
+    assert scheduler.session_at(_at(0, 10, 0)) == (_at(0, 9, 0), _at(0, 12, 1))
+    assert scheduler.session_at(_at(0, 13, 0)) is None
+
+def test_overlapping_sessions_merge():
+    scheduler = _scheduler({'Tue': [{'start': '09:00', 'end': '11:00'}, {'start': '10:30', 'end': '12:00'}]})
+
+    assert scheduler.seconds_until_close(_at(1, 9, 0)) == 3 * 3600 + 60
+
+def test_session_runs_past_midnight():
+    scheduler = _scheduler({'Wed': [{'start': '22:00', 'end': '02:00'}]})
+
+    assert scheduler.is_allowed(_at(3, 1, 0))[0]
+    assert scheduler.seconds_until_close(_at(2, 23, 0)) == 3 * 3600 + 60
+
+def test_sunday_night_wraps_into_monday():
+    scheduler = _scheduler({'Sun': [{'start': '23:00', 'end': '01:00'}]})
+
+    assert scheduler.is_allowed(_at(0, 0, 30))[0]
+    assert scheduler.seconds_until_close(_at(6, 23, 30)) == 5460
+    # Monday 02:00 waits for Sunday 23:00.
+    assert scheduler.seconds_until_open(_at(0, 2, 0)) == (6 * 24 + 21) * 3600
+
+def test_whole_week_never_closes():
+    scheduler = _scheduler({day: [{'start': '00:00', 'end': '23:59'}]
+                            for day in ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")})
+
+    assert scheduler.seconds_until_close(_at(3, 12, 0)) == float('inf')
+
+def test_no_sessions():
+    scheduler = _scheduler({})
+
+    assert scheduler.seconds_until_open(MONDAY) is None
+    assert scheduler.seconds_until_close(MONDAY) == 0
+
+@pytest.mark.parametrize("now, expected", [
+    (_at(0, 9, 0), 10),        # the whole window fits
+    (_at(0, 9, 59), 4),        # 120s left: 4 * 2s + 3 * 30s
+    (_at(0, 10, 0, 58), 1),    # 2s left: one message
+])
+def test_window_shrinks_to_the_remaining_session(now, expected):
+    scheduler = _scheduler({'Mon': [{'start': '09:00', 'end': '10:00'}]})
+    worker = AutomationWorker([], [], scheduler, {'delay_min': 10, 'delay_max': 30},
+                              {'on_log': None}, clock=VirtualClock(now))
+
+    assert worker._wait_for_window(10) == expected
+
+def test_window_waits_when_nothing_fits():
+    scheduler = _scheduler({'Mon': [{'start': '09:00', 'end': '10:00'}]})
+    clock = VirtualClock(_at(0, 10, 0, 59))
+    worker = AutomationWorker([], [], scheduler, {'delay_min': 10, 'delay_max': 30},
+                              {'on_log': None}, clock=clock)
+
+    assert worker._wait_for_window(10) == 0
+    assert clock.now() == _at(0, 10, 1)
@@ -0,0 +1,54 @@
+import threading
+from datetime import datetime
+
+from scheduler import Scheduler
+from simulator import VirtualClock, SimulationLimit, simulate, synthetic_contacts
+from templates import compile_templates
+
+START = datetime(2026, 10, 19, 8, 0)
+
+def _run(clock, sleeps, errors):
+    try:
+        for seconds in sleeps:
+            clock.sleep(seconds)
+    except SimulationLimit as e:
+        errors.append(str(e))
+    finally:
+        clock.leave()
+
+def test_each_participant_leaves_once_at_the_horizon():
+    clock = VirtualClock(START, participants=2, horizon=100)
+    errors = []
+    threads = [threading.Thread(target=_run, args=(clock, sleeps, errors), daemon=True)
+               for sleeps in ([50, 60], [60, 10, 10])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert clock._active == 0
+    assert len(errors) == 1
+    assert clock.monotonic() == 80
+
+def test_multi_account_simulation_stops_at_the_horizon():
+    scheduler = Scheduler()
+    scheduler.update_config({day: [{'start': '09:00', 'end': '10:00'}]
+                             for day in ("Mon", "Tue", "Wed", "Thu", "Fri")})
+    config = {'delay_min': 30, 'delay_max': 60, 'batch_size': 1, 'async_jobs': False}
+    accounts = [{'session': 'a', 'delay_min': 30, 'delay_max': 60},
+                {'session': 'b', 'delay_min': 30, 'delay_max': 60}]
+    templates = compile_templates(["Hello {name}", "", ""], ['name', 'phone'])
+    result = {}
+
+    def target():
+        result.update(simulate(synthetic_contacts(5000), templates, scheduler, config, accounts,
+                               start=START, seed=1, horizon_days=2))
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+
+    assert not thread.is_alive()
+    assert result['error'] and "horizon" in result['error']
+    assert 0 < result['sent'] < 5000
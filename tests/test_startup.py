@@ -0,0 +1,26 @@
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+# A cold headless start must stay well under a second.
+IMPORT_BUDGET_SECONDS = 0.5
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import cli
+seconds = time.perf_counter() - started
+print(json.dumps({'seconds': seconds, 'modules': sorted(sys.modules)}))
+"""
+
+def test_headless_entry_point_imports_fast_without_heavy_modules():
+    # Best of three, so a busy machine doesn't fail the budget.
+    runs = [json.loads(subprocess.run([sys.executable, "-c", PROBE], cwd=SRC, capture_output=True,
+                                      text=True, check=True).stdout) for _ in range(3)]
+    modules = set(runs[0]['modules'])
+
+    assert min(run['seconds'] for run in runs) < IMPORT_BUDGET_SECONDS
+    for heavy in ('pandas', 'customtkinter', 'tkinter', 'gui', 'requests'):
+        assert heavy not in modules
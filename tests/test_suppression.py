@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from fake_bridge import FakeBridge
+from node_client import NodeClient
+from suppression import SuppressionList, InboundWatcher, parse_keywords
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "suppressed.db")
+
+@pytest.mark.parametrize("text", ["STOP", " stop! ", "Stop  All", "unsubscribe.", "إلغاء"])
+def test_opt_out_replies(db_path, text):
+    assert SuppressionList(db_path).is_opt_out(text)
+
+@pytest.mark.parametrize("text", ["don't stop sending me offers", "stopp", "", None, "Thanks"])
+def test_other_replies_do_not_opt_out(db_path, text):
+    assert not SuppressionList(db_path).is_opt_out(text)
+
+def test_custom_keywords_replace_the_defaults(db_path):
+    suppression = SuppressionList(db_path, keywords=parse_keywords("basta, no more"))
+    assert suppression.is_opt_out("No more!")
+    assert not suppression.is_opt_out("stop")
+
+def test_opt_outs_persist_across_restarts(db_path):
+    suppression = SuppressionList(db_path)
+    added = suppression.process_inbound([
+        {'from': "201000000001@c.us", 'body': "STOP", 'session': "sales1"},
+        {'from': "201000000002@c.us", 'body': "Hello"},
+        {'from': "201000000001@c.us", 'body': "stop"},
+    ])
+    suppression.close()
+
+    assert added == [("201000000001", "STOP")]
+    reopened = SuppressionList(db_path)
+    assert len(reopened) == 1
+    assert reopened.contains("+20 100 000 0001")
+    assert reopened.contains("00201000000001")
+    assert not reopened.contains("201000000002")
+    assert list(reopened.contains_many(np.array([201000000002, 201000000001], dtype=np.int64))) == [False, True]
+
+def test_add_many_merges_with_existing_entries(db_path):
+    suppression = SuppressionList(db_path)
+    suppression.add("201000000005", "manual")
+    assert suppression.add_many(["201000000003", "201000000005", "not a number", "201000000004"], "import") == 2
+    assert list(suppression._numbers) == [201000000003, 201000000004, 201000000005]
+
+def test_inbound_watcher_processes_each_reply_once(db_path):
+    bridge = FakeBridge().start()
+    try:
+        bridge.receive("201000000001@c.us", "STOP")
+        bridge.receive("201000000002@c.us", "Hi")
+        watcher = InboundWatcher(SuppressionList(db_path), NodeClient(bridge.url, max_retries=0), limit=1)
+        assert watcher.poll() == 1
+        assert watcher.poll() == 0
+
+        bridge.receive("201000000003@c.us", "Unsubscribe")
+        # A restarted app continues from the saved read position.
+        restarted = InboundWatcher(SuppressionList(db_path), NodeClient(bridge.url, max_retries=0))
+        assert restarted.poll() == 1
+    finally:
+        bridge.stop()
+
+    assert len(restarted.suppression) == 2
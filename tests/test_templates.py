@@ -0,0 +1,45 @@
+import re
+
+import pytest
+
+from templates import CompiledTemplate, TemplateError, compile_templates
+
+COLUMNS = ['Name', 'phone', 'City ']
+
+def test_render_fills_columns_case_insensitively():
+    template = CompiledTemplate("Hi {Name}, {{{city}}} {{ok}}", COLUMNS)
+
+    assert template.fields == ['name', 'city']
+    assert template.render({'name': "Ana", 'city': "Cairo"}) == "Hi Ana, {Cairo} {ok}"
+
+def test_missing_or_empty_values_render_blank():
+    template = CompiledTemplate("{name}|{city}", COLUMNS)
+
+    assert template.render({'name': None}) == "|"
+    assert template.render({'name': 0, 'city': 12}) == "|12"
+
+@pytest.mark.parametrize("source, message", [
+    ("Hi {surname}", "Unknown variable {surname}"),
+    ("Hi {0}", "Invalid placeholder"),
+    ("Hi {}", "Invalid placeholder"),
+    ("Hi {name.upper}", "Invalid placeholder"),
+    ("Hi {name[0]}", "Invalid placeholder"),
+    ("Hi {name:>10}", "Formatting options"),
+    ("Hi {name!r}", "Formatting options"),
+    ("Hi {name", "Malformed template"),
+])
+def test_invalid_templates_are_rejected(source, message):
+    with pytest.raises(TemplateError, match=re.escape(message)):
+        CompiledTemplate(source, COLUMNS)
+
+def test_without_columns_any_variable_is_accepted():
+    assert CompiledTemplate("{anything}").fields == ['anything']
+
+def test_compile_templates_skips_empty_and_names_the_bad_one():
+    compiled = compile_templates(["Hello {name}", "  ", "Bye {phone}"], COLUMNS)
+    assert [template.number for template in compiled] == [1, 3]
+
+    with pytest.raises(TemplateError, match="Template 2: Unknown variable"):
+        compile_templates(["Hello {name}", "Hi {plan}"], COLUMNS)
+    with pytest.raises(TemplateError, match="All templates are empty"):
+        compile_templates(["", " "], COLUMNS)